@@ -0,0 +1,70 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.db.session import Base
+import app.models  # noqa: F401 - đăng ký mọi model vào Base.metadata
+
+config = context.config
+
+# Khi chạy từ ứng dụng (run_migrations) thì giữ cấu hình logging của ứng dụng
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Bảng/cột full-text search do migration 0003 quản lý, không có trong model
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return not (name.startswith("issues_fts") or name.startswith("comments_fts"))
+    if type_ == "column":
+        return name != "search_vector"
+    if type_ == "index":
+        return not name.endswith("_search_vector")
+    return True
+
+def get_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or settings.DATABASE_URL
+
+def run_migrations_offline():
+    """
+    Sinh SQL mà không cần kết nối database (alembic upgrade --sql)
+    """
+    url = get_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        render_as_batch=url.startswith("sqlite"),
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    connectable = create_engine(get_url())
+    with connectable.connect() as connection:
+        _run_with_connection(connection)
+    connectable.dispose()
+
+def _run_with_connection(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite không hỗ trợ ALTER đầy đủ, dùng batch mode (tạo lại bảng)
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
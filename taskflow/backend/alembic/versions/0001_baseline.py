@@ -0,0 +1,158 @@
+"""Baseline: schema hiện tại của các model
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+- Database mới: tạo toàn bộ bảng
+- Database cũ (tạo bằng Base.metadata.create_all trước khi có migration):
+  chỉ tạo bảng/cột/index còn thiếu, không đụng tới dữ liệu hiện có
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Snapshot schema tại baseline, độc lập với app.models để migration không đổi theo model
+metadata = sa.MetaData()
+
+users = sa.Table(
+    "users", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("username", sa.String),
+    sa.Column("email", sa.String),
+    sa.Column("hashed_password", sa.String),
+    sa.Column("full_name", sa.String, nullable=True),
+    sa.Column("role", sa.String, nullable=True),
+    sa.Column("created_at", sa.DateTime),
+    sa.Index("ix_users_id", "id"),
+    sa.Index("ix_users_username", "username", unique=True),
+    sa.Index("ix_users_email", "email", unique=True),
+)
+
+projects = sa.Table(
+    "projects", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String),
+    sa.Column("description", sa.Text, nullable=True),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("owner_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Index("ix_projects_id", "id"),
+    sa.Index("ix_projects_name", "name"),
+)
+
+issues = sa.Table(
+    "issues", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("title", sa.String),
+    sa.Column("description", sa.Text, nullable=True),
+    sa.Column("status", sa.String),
+    sa.Column("priority", sa.String),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id")),
+    sa.Column("owner_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Column("assignee_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+    sa.Column("creator_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+    sa.Column("updated_at", sa.DateTime, nullable=True),
+    sa.Index("ix_issues_id", "id"),
+    sa.Index("ix_issues_title", "title"),
+    sa.Index("ix_issues_created_at_id", "created_at", "id"),
+    sa.Index("ix_issues_project_created_at_id", "project_id", "created_at", "id"),
+)
+
+issue_counters = sa.Table(
+    "issue_counters", metadata,
+    sa.Column("user_id", sa.Integer, primary_key=True),
+    sa.Column("project_id", sa.Integer, primary_key=True),
+    sa.Column("status", sa.String, primary_key=True),
+    sa.Column("priority", sa.String, primary_key=True),
+    sa.Column("count", sa.Integer, nullable=False),
+)
+
+comments = sa.Table(
+    "comments", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("content", sa.Text, nullable=False),
+    sa.Column("issue_id", sa.Integer, sa.ForeignKey("issues.id")),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("updated_at", sa.DateTime),
+    sa.Index("ix_comments_id", "id"),
+)
+
+attachments = sa.Table(
+    "attachments", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("filename", sa.String, nullable=False),
+    sa.Column("file_path", sa.String, nullable=False),
+    sa.Column("file_size", sa.Integer),
+    sa.Column("content_hash", sa.String(64), nullable=True),
+    sa.Column("mime_type", sa.String),
+    sa.Column("issue_id", sa.Integer, sa.ForeignKey("issues.id")),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Column("created_at", sa.DateTime),
+    sa.Index("ix_attachments_id", "id"),
+    sa.Index("ix_attachments_content_hash", "content_hash"),
+)
+
+activity_logs = sa.Table(
+    "activity_logs", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("action", sa.String, nullable=False),
+    sa.Column("entity_type", sa.String, nullable=False),
+    sa.Column("entity_id", sa.Integer),
+    sa.Column("details", sa.JSON, nullable=True),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Column("created_at", sa.DateTime),
+    sa.Index("ix_activity_logs_id", "id"),
+)
+
+labels = sa.Table(
+    "labels", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String),
+    sa.Column("color", sa.String),
+    sa.Column("description", sa.String, nullable=True),
+    sa.Column("created_at", sa.DateTime),
+    sa.Column("updated_at", sa.DateTime),
+    sa.Column("created_by", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+    sa.Index("ix_labels_id", "id"),
+    sa.Index("ix_labels_name", "name", unique=True),
+)
+
+issue_labels = sa.Table(
+    "issue_labels", metadata,
+    sa.Column("issue_id", sa.Integer, sa.ForeignKey("issues.id"), primary_key=True),
+    sa.Column("label_id", sa.Integer, sa.ForeignKey("labels.id"), primary_key=True),
+    sa.Column("created_at", sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            table.create(bind)
+            continue
+
+        # Bảng đã có: bổ sung cột mới (luôn nullable nên an toàn với dữ liệu cũ)
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                op.add_column(table.name, sa.Column(column.name, column.type, nullable=True))
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind)
+
+
+def downgrade() -> None:
+    for table in reversed(metadata.sorted_tables):
+        table.drop(op.get_bind(), checkfirst=True)
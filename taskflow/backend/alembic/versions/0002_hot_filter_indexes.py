@@ -0,0 +1,40 @@
+"""Index cho các bộ lọc hay dùng
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- issues: lọc theo project/status, assignee, creator rồi sắp xếp theo (created_at, id)
+- activity_logs: theo entity (entity_type, entity_id), theo user và theo thời gian
+- comments, attachments: lấy theo issue_id
+- issue_labels: tra ngược issues theo label_id (khóa chính bắt đầu bằng issue_id)
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_issues_project_status_created_at_id", "issues", ["project_id", "status", "created_at", "id"]),
+    ("ix_issues_assignee_created_at_id", "issues", ["assignee_id", "created_at", "id"]),
+    ("ix_issues_creator_created_at_id", "issues", ["creator_id", "created_at", "id"]),
+    ("ix_issues_status_priority", "issues", ["status", "priority"]),
+    ("ix_activity_logs_entity_created_at", "activity_logs", ["entity_type", "entity_id", "created_at"]),
+    ("ix_activity_logs_user_created_at", "activity_logs", ["user_id", "created_at"]),
+    ("ix_activity_logs_created_at", "activity_logs", ["created_at"]),
+    ("ix_comments_issue_created_at", "comments", ["issue_id", "created_at"]),
+    ("ix_attachments_issue_id", "attachments", ["issue_id"]),
+    ("ix_issue_labels_label_id", "issue_labels", ["label_id", "issue_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
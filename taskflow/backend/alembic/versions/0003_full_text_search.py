@@ -0,0 +1,97 @@
+"""Full-text search cho issues và comments
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+- SQLite: bảng ảo FTS5 (external content) issues_fts/comments_fts, đồng bộ bằng trigger
+- PostgreSQL: cột tsvector generated (search_vector) + GIN index, database tự cập nhật
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# unicode61 + remove_diacritics 2: "loi" khớp với "lỗi"
+SQLITE_TOKENIZER = "unicode61 remove_diacritics 2"
+
+SQLITE_FTS = {
+    # bảng fts: (bảng gốc, các cột được index)
+    "issues_fts": ("issues", ["title", "description"]),
+    "comments_fts": ("comments", ["content"]),
+}
+
+POSTGRES_VECTORS = {
+    "issues": "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+              "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+    "comments": "to_tsvector('simple', coalesce(content, ''))",
+}
+
+
+def _sqlite_upgrade():
+    for fts, (table, columns) in SQLITE_FTS.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column_list}, content='{table}', content_rowid='id', tokenize='{SQLITE_TOKENIZER}')"
+        )
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        """)
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        """)
+        # Index dữ liệu hiện có
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _sqlite_downgrade():
+    for fts, (table, _) in SQLITE_FTS.items():
+        for action in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{action}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+def _postgres_upgrade():
+    for table, expression in POSTGRES_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+
+
+def _postgres_downgrade():
+    for table in POSTGRES_VECTORS:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _sqlite_upgrade()
+    elif dialect == "postgresql":
+        _postgres_upgrade()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _sqlite_downgrade()
+    elif dialect == "postgresql":
+        _postgres_downgrade()
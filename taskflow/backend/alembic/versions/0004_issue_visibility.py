@@ -0,0 +1,43 @@
+"""Bảng quyền xem issue tính sẵn (issue_visibility)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+- Mỗi dòng (user_id, issue_id) là một issue user thường được xem (creator hoặc assignee)
+- Kiểm tra quyền chỉ còn tra khóa chính thay vì OR trên hai cột của issues
+- Ứng dụng đồng bộ bảng khi tạo/gán/xóa issue (app.core.visibility)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "issue_visibility",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("issue_id", sa.Integer(), sa.ForeignKey("issues.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id", "issue_id"),
+    )
+    op.create_index("ix_issue_visibility_user_project", "issue_visibility", ["user_id", "project_id"])
+    op.create_index("ix_issue_visibility_issue_id", "issue_visibility", ["issue_id"])
+
+    # Tính cho dữ liệu hiện có (UNION bỏ trùng khi creator cũng là assignee)
+    op.execute("""
+        INSERT INTO issue_visibility (user_id, issue_id, project_id)
+        SELECT creator_id, id, project_id FROM issues WHERE creator_id IS NOT NULL
+        UNION
+        SELECT assignee_id, id, project_id FROM issues WHERE assignee_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_issue_visibility_issue_id", table_name="issue_visibility")
+    op.drop_index("ix_issue_visibility_user_project", table_name="issue_visibility")
+    op.drop_table("issue_visibility")
@@ -0,0 +1,51 @@
+"""Cột project_id cho activity_logs (timeline của project)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+- Timeline của project đọc theo index (project_id, created_at, id) thay vì
+  nạp mọi issue của project rồi lọc activity bằng IN (...)
+- Backfill: activity của issue còn tồn tại lấy project hiện tại của issue,
+  issue đã xóa lấy project_id đã ghi trong details
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# project_id trong details (JSON) của log "deleted"
+DETAILS_PROJECT_ID = {
+    "sqlite": "CAST(json_extract(details, '$.project_id') AS INTEGER)",
+    "postgresql": "CAST(CAST(details AS json) ->> 'project_id' AS INTEGER)",
+}
+
+
+def upgrade() -> None:
+    op.add_column("activity_logs", sa.Column("project_id", sa.Integer(), nullable=True))
+    op.create_index(
+        "ix_activity_logs_project_created_at_id", "activity_logs", ["project_id", "created_at", "id"]
+    )
+
+    op.execute("""
+        UPDATE activity_logs SET project_id = (
+            SELECT issues.project_id FROM issues WHERE issues.id = activity_logs.entity_id
+        )
+        WHERE entity_type = 'issue'
+    """)
+    details_project_id = DETAILS_PROJECT_ID.get(op.get_bind().dialect.name)
+    if details_project_id:
+        op.execute(f"""
+            UPDATE activity_logs SET project_id = {details_project_id}
+            WHERE entity_type = 'issue' AND project_id IS NULL AND details IS NOT NULL
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_activity_logs_project_created_at_id", table_name="activity_logs")
+    # SQLite cần batch (tạo lại bảng) để xóa cột
+    with op.batch_alter_table("activity_logs") as batch:
+        batch.drop_column("project_id")
@@ -0,0 +1,101 @@
+"""Số issues dùng mỗi label (labels.usage_count)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+- /labels/popular và kiểm tra "label đang được dùng" đọc usage_count (có index)
+  thay vì join + group by trên issue_labels
+- Trigger trên issue_labels cập nhật usage_count trong cùng câu lệnh INSERT/DELETE,
+  nên mọi đường ghi (ORM, insert nhiều dòng, xóa issue/project) đều được tính
+- Chỉ có trigger cho SQLite và PostgreSQL
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+INCREMENT = "UPDATE labels SET usage_count = usage_count + 1 WHERE id = new.label_id;"
+DECREMENT = "UPDATE labels SET usage_count = usage_count - 1 WHERE id = old.label_id;"
+
+SQLITE_TRIGGERS = {
+    "issue_labels_usage_insert": ("AFTER INSERT", INCREMENT),
+    "issue_labels_usage_delete": ("AFTER DELETE", DECREMENT),
+    "issue_labels_usage_update": ("AFTER UPDATE OF label_id", DECREMENT + "\n" + INCREMENT),
+}
+
+
+def _sqlite_upgrade():
+    for name, (timing, body) in SQLITE_TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {timing} ON issue_labels BEGIN
+                {body}
+            END
+        """)
+
+
+def _sqlite_downgrade():
+    for name in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def _postgres_upgrade():
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION issue_labels_usage() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                {DECREMENT}
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                {INCREMENT}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER issue_labels_usage
+        AFTER INSERT OR DELETE OR UPDATE OF label_id ON issue_labels
+        FOR EACH ROW EXECUTE FUNCTION issue_labels_usage()
+    """)
+
+
+def _postgres_downgrade():
+    op.execute("DROP TRIGGER IF EXISTS issue_labels_usage ON issue_labels")
+    op.execute("DROP FUNCTION IF EXISTS issue_labels_usage()")
+
+
+def upgrade() -> None:
+    op.add_column(
+        "labels", sa.Column("usage_count", sa.Integer(), nullable=False, server_default="0")
+    )
+    op.create_index("ix_labels_usage_count_id", "labels", ["usage_count", "id"])
+
+    # Tính cho dữ liệu hiện có
+    op.execute("""
+        UPDATE labels SET usage_count = (
+            SELECT COUNT(*) FROM issue_labels WHERE issue_labels.label_id = labels.id
+        )
+    """)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _sqlite_upgrade()
+    elif dialect == "postgresql":
+        _postgres_upgrade()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _sqlite_downgrade()
+    elif dialect == "postgresql":
+        _postgres_downgrade()
+
+    op.drop_index("ix_labels_usage_count_id", table_name="labels")
+    # SQLite cần batch (tạo lại bảng) để xóa cột
+    with op.batch_alter_table("labels") as batch:
+        batch.drop_column("usage_count")
@@ -0,0 +1,47 @@
+"""Tên label chuẩn hóa cho tìm kiếm typeahead (labels.name_normalized)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+- ILIKE '%term%' trên labels.name không dùng được index, quét bảng mỗi lần gõ phím
+- name_normalized (chữ thường, bỏ dấu) + index: tìm theo tiền tố là một khoảng trên index
+- Ứng dụng cập nhật cột khi gán name (app.core.labeling)
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def normalize_label_name(name):
+    # Bản sao của app.core.labeling.normalize_label_name tại thời điểm viết migration
+    if name is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", name.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def upgrade() -> None:
+    op.add_column("labels", sa.Column("name_normalized", sa.String(), nullable=True))
+    op.create_index("ix_labels_name_normalized", "labels", ["name_normalized"])
+
+    # Tính bằng Python: lower() của SQLite chỉ xử lý ký tự ASCII
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, name FROM labels WHERE name IS NOT NULL")).all()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE labels SET name_normalized = :name_normalized WHERE id = :id"),
+            [{"id": row.id, "name_normalized": normalize_label_name(row.name)} for row in rows]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_labels_name_normalized", table_name="labels")
+    # Không dùng batch (tạo lại bảng labels): trigger của 0006 trên issue_labels tham chiếu
+    # labels nên SQLite từ chối đổi tên bảng; DROP COLUMN có từ SQLite 3.35
+    op.drop_column("labels", "name_normalized")
@@ -0,0 +1,39 @@
+"""Đếm tham chiếu blob của attachments (bảng blobs)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+- Trước đây xóa attachment đếm lại attachments theo content_hash sau khi commit rồi mới xóa file:
+  upload cùng nội dung xen vào giữa sẽ trỏ tới file vừa bị xóa
+- Dòng blobs(content_hash, refcount) được khóa khi thêm/xóa attachment, file chỉ bị xóa
+  khi refcount về 0 trong cùng transaction (app.core.blobs)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("content_hash"),
+    )
+
+    # Tính cho dữ liệu hiện có
+    op.execute("""
+        INSERT INTO blobs (content_hash, refcount)
+        SELECT content_hash, COUNT(*) FROM attachments
+        WHERE content_hash IS NOT NULL
+        GROUP BY content_hash
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("blobs")
@@ -1,132 +1,115 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.db.session import get_db
-from app.models.models import ActivityLog, User, Issue, Project
+from app.db.session import get_async_db
+from app.models.models import User
 from app.schemas.schemas import ActivityResponse, ActivityStatsResponse
 from app.core.security import get_current_user, is_manager_or_admin, is_admin
+from app.core.auth_cache import CurrentUser
+from app.core.visibility import ensure_issue_access, project_access_query, raise_for_access
 from app.core.activity_logger import (
     get_recent_activities, 
     get_user_activities, 
     get_entity_activities,
+    get_project_activities,
     search_activities,
     get_activity_stats
 )
+from app.core.cache import response_cache, ACTIVITY_TAG
+from app.core.pagination import next_page, NEXT_CURSOR_HEADER
+from app.core.export import iter_activity_rows, csv_chunks, ndjson_chunks, json_chunks, gzip_chunks
 
 router = APIRouter()
 
 @router.get("/activities", response_model=List[ActivityResponse])
-def get_activities(
+async def get_activities(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ admin/manager xem được tất cả
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ admin/manager xem được tất cả
 ):
     """
     Lấy danh sách hoạt động gần đây (yêu cầu quyền admin/manager)
     """
-    activities = get_recent_activities(db, limit=limit, skip=skip)
+    activities = await db.run_sync(get_recent_activities, limit=limit, skip=skip)
     return activities
 
 @router.get("/activities/my", response_model=List[ActivityResponse])
-def get_my_activities(
+async def get_my_activities(
     skip: int = Query(0, ge=0),
     limit: int = Query(30, ge=1, le=50),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy hoạt động của user hiện tại
     """
-    activities = get_user_activities(db, user_id=current_user.id, limit=limit)
+    activities = await db.run_sync(get_user_activities, user_id=current_user.id, limit=limit)
     return activities
 
 @router.get("/activities/user/{user_id}", response_model=List[ActivityResponse])
-def get_user_activities_endpoint(
+async def get_user_activities_endpoint(
     user_id: int,
     limit: int = Query(30, ge=1, le=50),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ admin/manager xem được người khác
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ admin/manager xem được người khác
 ):
     """
     Lấy hoạt động của một user cụ thể
     """
     # Kiểm tra user tồn tại
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Không tìm thấy user")
     
-    activities = get_user_activities(db, user_id=user_id, limit=limit)
+    activities = await db.run_sync(get_user_activities, user_id=user_id, limit=limit)
     return activities
 
 @router.get("/activities/issue/{issue_id}", response_model=List[ActivityResponse])
-def get_issue_activities(
+async def get_issue_activities(
     issue_id: int,
     limit: int = Query(20, ge=1, le=50),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy hoạt động của một issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
-    if not issue:
-        raise HTTPException(status_code=404, detail="Không tìm thấy issue")
+    # Kiểm tra issue tồn tại và quyền xem trong một truy vấn
+    await ensure_issue_access(db, current_user, issue_id, forbidden="Bạn không có quyền xem hoạt động của issue này")
     
-    # Kiểm tra quyền
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền xem hoạt động của issue này"
-            )
-    
-    activities = get_entity_activities(db, entity_type="issue", entity_id=issue_id, limit=limit)
+    activities = await db.run_sync(get_entity_activities, entity_type="issue", entity_id=issue_id, limit=limit)
     return activities
 
 @router.get("/activities/project/{project_id}", response_model=List[ActivityResponse])
-def get_project_activities(
+async def get_project_activities_endpoint(
     project_id: int,
+    response: Response,
     limit: int = Query(30, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Lấy hoạt động của một project
+    Lấy hoạt động của một project (mới nhất trước)
+    - Truyền cursor (lấy từ header X-Next-Cursor) để xem các trang cũ hơn
     """
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Không tìm thấy project")
-    
-    # Admin/manager xem được tất cả, users khác cần kiểm tra quyền
-    if current_user.role not in ["admin", "manager"]:
-        # Lấy tất cả issues của project
-        issues = db.query(Issue).filter(Issue.project_id == project_id).all()
-        issue_ids = [issue.id for issue in issues]
-        
-        # Kiểm tra xem user có liên quan đến issues nào không
-        user_issues = [issue for issue in issues if 
-                      issue.creator_id == current_user.id or 
-                      issue.assignee_id == current_user.id]
-        
-        if not user_issues:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền xem hoạt động của project này"
-            )
-    
-    # Lấy activities liên quan đến issues của project
-    activities = db.query(ActivityLog).filter(
-        ActivityLog.entity_type == "issue",
-        ActivityLog.entity_id.in_([issue.id for issue in 
-                                  db.query(Issue).filter(Issue.project_id == project_id).all()])
-    ).order_by(ActivityLog.created_at.desc()).limit(limit).all()
+    # Kiểm tra project tồn tại và user liên quan tới ít nhất một issue trong project
+    found, visible = (await db.execute(project_access_query(current_user, project_id))).one()
+    raise_for_access(found, visible, "Không tìm thấy project", "Bạn không có quyền xem hoạt động của project này")
     
+    # Đọc theo cột project_id đã lưu trên activity, không cần nạp issues của project
+    activities, next_cursor = next_page(
+        await db.run_sync(get_project_activities, project_id=project_id, limit=limit, cursor=cursor), limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return activities
 
 @router.get("/activities/search", response_model=List[ActivityResponse])
-def search_activities_endpoint(
+async def search_activities_endpoint(
     user_id: Optional[int] = None,
     action: Optional[str] = None,
     entity_type: Optional[str] = None,
@@ -134,14 +117,14 @@ def search_activities_endpoint(
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_admin)  # Chỉ admin mới được search
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_admin)  # Chỉ admin mới được search
 ):
     """
     Tìm kiếm hoạt động với các bộ lọc (chỉ admin)
     """
-    activities = search_activities(
-        db=db,
+    activities = await db.run_sync(
+        search_activities,
         user_id=user_id,
         action=action,
         entity_type=entity_type,
@@ -153,85 +136,53 @@ def search_activities_endpoint(
     return activities
 
 @router.get("/activities/stats", response_model=ActivityStatsResponse)
-def get_activities_stats(
+async def get_activities_stats(
     days: int = Query(7, ge=1, le=30),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ admin/manager
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ admin/manager
 ):
     """
     Lấy thống kê hoạt động
+    - Cache theo số ngày, vô hiệu mỗi khi có activity mới được ghi
     """
-    stats = get_activity_stats(db, days=days)
-    return stats
+    async def load():
+        return await db.run_sync(get_activity_stats, days=days)
+    return await response_cache.get_or_load(f"activity_stats:{days}", load, tags=[ACTIVITY_TAG])
 
 @router.get("/activities/export")
 def export_activities(
-    format: str = Query("json", regex="^(json|csv)$"),
+    format: str = Query("json", regex="^(json|csv|ndjson)$"),
     days: int = Query(7, ge=1, le=365),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_admin)  # Chỉ admin mới được export
+    gzip: bool = Query(False),
+    current_user: CurrentUser = Depends(is_admin)  # Chỉ admin mới được export
 ):
     """
     Export hoạt động ra file
+    - Stream dữ liệu theo từng lô, bộ nhớ không phụ thuộc khoảng thời gian
+    - gzip=true: nén khi đang stream
     """
-    from datetime import datetime, timedelta
-    import csv
-    from io import StringIO
-    
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    activities = db.query(ActivityLog).filter(
-        ActivityLog.created_at >= start_date,
-        ActivityLog.created_at <= end_date
-    ).order_by(ActivityLog.created_at.desc()).all()
+    rows = iter_activity_rows(start_date, end_date)
+    if format == "csv":
+        chunks = csv_chunks(rows)
+        media_type = "text/csv"
+    elif format == "ndjson":
+        chunks = ndjson_chunks(rows)
+        media_type = "application/x-ndjson"
+    else:
+        chunks = json_chunks(rows, start_date, end_date)
+        media_type = "application/json"
     
-    if format == "json":
-        import json
-        activities_data = []
-        for activity in activities:
-            activities_data.append({
-                "id": activity.id,
-                "action": activity.action,
-                "entity_type": activity.entity_type,
-                "entity_id": activity.entity_id,
-                "user_id": activity.user_id,
-                "details": activity.details,
-                "created_at": activity.created_at.isoformat()
-            })
-        
-        return {
-            "export_date": datetime.utcnow().isoformat(),
-            "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
-            "total_records": len(activities),
-            "activities": activities_data
-        }
+    filename = f"activities_{end_date.date()}.{format}"
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
     
-    elif format == "csv":
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(["ID", "Action", "Entity Type", "Entity ID", "User ID", "Details", "Created At"])
-        
-        # Write data
-        for activity in activities:
-            details_str = str(activity.details) if activity.details else ""
-            writer.writerow([
-                activity.id,
-                activity.action,
-                activity.entity_type,
-                activity.entity_id,
-                activity.user_id,
-                details_str,
-                activity.created_at.isoformat()
-            ])
-        
-        output.seek(0)
-        
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=activities_{datetime.utcnow().date()}.csv"}
-        )
\ No newline at end of file
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -1,16 +1,30 @@
 import os
-import shutil
-import uuid
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from app.db.session import get_db
-from app.models.models import Attachment, Issue, User
-from app.schemas.schemas import AttachmentResponse, AttachmentCreate
+from app.db.session import get_async_db
+from app.models.models import Attachment, Issue
+from app.schemas.schemas import AttachmentResponse
 from app.core.security import get_current_user, is_manager_or_admin
+from app.core.auth_cache import CurrentUser
+from app.db.loaders import FLAT
+from app.db.query_budget import query_budget
 from app.core.activity_logger import log_activity
+from app.core.downloads import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    file_download_response,
+    is_not_modified,
+    not_modified_response
+)
+from app.core.thumbnails import supports_thumbnail, thumbnail_path, thumbnail_worker
+from app.core import blobs  # noqa: F401 - đăng ký ORM event đếm tham chiếu blob
+from app.core.storage import FileTooLarge, blob_path, discard_upload, receive_upload, remove_file, store_blob
+from app.core.visibility import can_view_loaded_issue, ensure_issue_access, issue_visible_flag
 
 router = APIRouter()
 
@@ -40,18 +54,39 @@ def validate_file(file: UploadFile) -> bool:
         return False
     return True
 
+async def get_visible_attachment(
+    db: AsyncSession,
+    attachment_id: int,
+    current_user: CurrentUser,
+    forbidden: str = "Bạn không có quyền download file này"
+) -> Attachment:
+    """
+    Lấy attachment và kiểm tra quyền xem issue của nó trong một truy vấn
+    """
+    row = (await db.execute(
+        select(Attachment, issue_visible_flag(current_user, Attachment.issue_id))
+        .where(Attachment.id == attachment_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Không tìm thấy attachment")
+    attachment, visible = row
+    
+    if not visible:
+        raise HTTPException(status_code=403, detail=forbidden)
+    return attachment
+
 @router.post("/issues/{issue_id}/attachments", response_model=AttachmentResponse)
 async def upload_attachment(
     issue_id: int,
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Upload file đính kèm cho issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.get(Issue, issue_id)
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
@@ -63,12 +98,11 @@ async def upload_attachment(
         )
     
     # Nếu là member, kiểm tra có liên quan đến issue không
-    if current_user.role == "member":
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền upload file cho issue này"
-            )
+    if not can_view_loaded_issue(current_user, issue):
+        raise HTTPException(
+            status_code=403, 
+            detail="Bạn không có quyền upload file cho issue này"
+        )
     
     # Kiểm tra file
     if not validate_file(file):
@@ -77,36 +111,41 @@ async def upload_attachment(
             detail="Loại file không được hỗ trợ"
         )
     
-    # Đọc file content để kiểm tra kích thước
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > MAX_FILE_SIZE:
+    # Nhận file theo từng chunk, kiểm tra kích thước và tính hash trong lúc ghi
+    try:
+        stored = await receive_upload(file, UPLOAD_DIR, MAX_FILE_SIZE)
+    except FileTooLarge:
         raise HTTPException(
             status_code=400, 
             detail=f"File quá lớn. Kích thước tối đa: {MAX_FILE_SIZE // (1024*1024)}MB"
         )
+    file_size = stored.size
     
-    # Tạo tên file duy nhất
-    unique_filename = f"{uuid.uuid4().hex}{get_file_extension(file.filename)}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    
-    # Lưu file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file_content)
-    
-    # Lưu thông tin vào database
+    # Lưu thông tin vào database, file_path trỏ tới blob theo nội dung
     db_attachment = Attachment(
         filename=file.filename,
-        file_path=file_path,
+        file_path=blob_path(UPLOAD_DIR, stored.sha256),
         file_size=file_size,
+        content_hash=stored.sha256,
         mime_type=file.content_type,
         issue_id=issue_id,
         user_id=current_user.id
     )
     db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
+    try:
+        # Flush tăng refcount và khóa dòng blob (app.core.blobs), chuyển file vào store rồi mới commit:
+        # attachment đã commit luôn có file, và không transaction xóa nào xóa blob giữa chừng
+        await db.flush()
+        await store_blob(stored, UPLOAD_DIR)
+        await db.commit()
+    except BaseException:
+        # Nếu file đã vào store mà commit lỗi thì blob thừa lại (không ai tham chiếu), không mất dữ liệu
+        await discard_upload(stored)
+        raise
+    await db.refresh(db_attachment)
+    
+    # Tạo thumbnail ở thread nền cho ảnh
+    thumbnail_worker.submit(db_attachment.file_path, db_attachment.mime_type)
     
     # Log activity
     log_activity(
@@ -124,83 +163,69 @@ async def upload_attachment(
     
     return db_attachment
 
-@router.get("/issues/{issue_id}/attachments", response_model=List[AttachmentResponse])
-def get_issue_attachments(
+@router.get("/issues/{issue_id}/attachments", response_model=List[AttachmentResponse], dependencies=[Depends(query_budget(3))])
+async def get_issue_attachments(
     issue_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy danh sách attachments của issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
-    if not issue:
-        raise HTTPException(status_code=404, detail="Không tìm thấy issue")
+    # Kiểm tra issue tồn tại và quyền xem trong một truy vấn
+    await ensure_issue_access(db, current_user, issue_id, forbidden="Bạn không có quyền xem attachments của issue này")
     
-    # Kiểm tra quyền
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền xem attachments của issue này"
-            )
-    
-    attachments = db.query(Attachment).filter(Attachment.issue_id == issue_id).all()
-    return attachments
+    attachments = await db.scalars(select(Attachment).options(*FLAT).where(Attachment.issue_id == issue_id))
+    return attachments.all()
 
 @router.get("/attachments/{attachment_id}", response_model=AttachmentResponse)
-def get_attachment(
+async def get_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy thông tin attachment
     """
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
-    if not attachment:
-        raise HTTPException(status_code=404, detail="Không tìm thấy attachment")
-    
-    # Lấy issue để kiểm tra quyền
-    issue = db.query(Issue).filter(Issue.id == attachment.issue_id).first()
-    
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền xem attachment này"
-            )
-    
-    return attachment
+    return await get_visible_attachment(db, attachment_id, current_user, forbidden="Bạn không có quyền xem attachment này")
 
 @router.get("/attachments/{attachment_id}/download")
-def download_attachment(
+async def download_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Download file attachment
+    - ETag theo content hash, trả 304 khi client đã có bản mới nhất (If-None-Match / If-Modified-Since)
+    - Hỗ trợ Range để tải tiếp hoặc tải một phần
     """
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
-    if not attachment:
-        raise HTTPException(status_code=404, detail="Không tìm thấy attachment")
+    attachment = await get_visible_attachment(db, attachment_id, current_user)
+    
+    if attachment.content_hash:
+        # Blob theo nội dung không đổi: kiểm tra điều kiện mà không cần chạm tới file
+        etag = f'"{attachment.content_hash}"'
+        last_modified = attachment.created_at
+        cache_control = IMMUTABLE_CACHE_CONTROL
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified, cache_control)
     
     # Kiểm tra file tồn tại
-    if not os.path.exists(attachment.file_path):
+    try:
+        stat_result = await run_in_threadpool(os.stat, attachment.file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File không tồn tại trên server")
     
-    # Lấy issue để kiểm tra quyền
-    issue = db.query(Issue).filter(Issue.id == attachment.issue_id).first()
+    if not attachment.content_hash:
+        # File cũ lưu theo uuid: ETag theo thời gian sửa và kích thước
+        etag = f'"{int(stat_result.st_mtime)}-{stat_result.st_size}"'
+        last_modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+        cache_control = REVALIDATE_CACHE_CONTROL
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified, cache_control)
     
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền download file này"
-            )
-    
-    # Log download activity
+    # Log download activity (ghi nền qua activity sink)
     log_activity(
         db=db,
         user_id=current_user.id,
@@ -212,23 +237,72 @@ def download_attachment(
         }
     )
     
-    return FileResponse(
+    return file_download_response(
+        request,
         path=attachment.file_path,
+        stat_result=stat_result,
         filename=attachment.filename,
-        media_type=attachment.mime_type
+        media_type=attachment.mime_type,
+        etag=etag,
+        last_modified=last_modified,
+        cache_control=cache_control
+    )
+
+@router.get("/attachments/{attachment_id}/thumbnail")
+async def get_attachment_thumbnail(
+    attachment_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Lấy thumbnail của attachment dạng ảnh (cạnh dài tối đa THUMBNAIL_SIZE)
+    - Thumbnail được tạo khi upload, nếu chưa có thì tạo ngay
+    """
+    attachment = await get_visible_attachment(db, attachment_id, current_user)
+    if not supports_thumbnail(attachment.mime_type):
+        raise HTTPException(status_code=404, detail="Attachment không có thumbnail")
+    
+    if attachment.content_hash:
+        etag = f'"{attachment.content_hash}-thumb-{thumbnail_worker.size}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{attachment.id}-thumb-{thumbnail_worker.size}"'
+        cache_control = REVALIDATE_CACHE_CONTROL
+    last_modified = attachment.created_at
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified, cache_control)
+    
+    if not await run_in_threadpool(os.path.exists, attachment.file_path):
+        raise HTTPException(status_code=404, detail="File không tồn tại trên server")
+    path = await thumbnail_worker.get(attachment.file_path, attachment.mime_type)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Không tạo được thumbnail")
+    
+    stat_result = await run_in_threadpool(os.stat, path)
+    return file_download_response(
+        request,
+        path=path,
+        stat_result=stat_result,
+        filename=f"{Path(attachment.filename).stem}.thumb{Path(path).suffix}",
+        media_type="image/jpeg" if path.endswith(".jpg") else "image/png",
+        etag=etag,
+        last_modified=last_modified,
+        cache_control=cache_control,
+        content_disposition_type="inline"
     )
 
 @router.delete("/attachments/{attachment_id}")
-def delete_attachment(
+async def delete_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Xóa attachment
     - Chỉ admin, manager hoặc người upload mới được xóa
     """
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+    attachment = await db.get(Attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Không tìm thấy attachment")
     
@@ -244,16 +318,19 @@ def delete_attachment(
     filename = attachment.filename
     issue_id = attachment.issue_id
     
-    # Xóa file trên disk
-    if os.path.exists(attachment.file_path):
-        try:
-            os.remove(attachment.file_path)
-        except Exception as e:
-            print(f"Lỗi khi xóa file: {e}")
+    file_path = attachment.file_path
+    content_hash = attachment.content_hash
+    mime_type = attachment.mime_type
+    
+    # Xóa record trong database; blob theo nội dung được giảm refcount trong cùng transaction,
+    # file được xóa ở thread nền sau commit khi không còn attachment nào dùng (app.core.blobs)
+    await db.delete(attachment)
+    await db.commit()
     
-    # Xóa record trong database
-    db.delete(attachment)
-    db.commit()
+    # File cũ lưu theo uuid không dùng chung: xóa cả file và thumbnail
+    if content_hash is None:
+        await remove_file(file_path)
+        await remove_file(thumbnail_path(file_path, mime_type))
     
     # Log activity
     log_activity(
@@ -271,22 +348,24 @@ def delete_attachment(
     return {"message": "Attachment đã được xóa thành công"}
 
 @router.get("/attachments/stats")
-def get_attachments_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ admin/manager
+async def get_attachments_stats(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ admin/manager
 ):
     """
     Thống kê attachments
     """
-    total_attachments = db.query(Attachment).count()
-    total_size = db.query(Attachment.file_size).all()
-    total_size_bytes = sum([size[0] for size in total_size if size[0]])
+    total_attachments, total_size_bytes = (await db.execute(
+        select(func.count(Attachment.id), func.coalesce(func.sum(Attachment.file_size), 0))
+    )).one()
     
     # Thống kê theo mime type
-    mime_stats = db.query(
-        Attachment.mime_type,
-        db.func.count(Attachment.id).label('count')
-    ).group_by(Attachment.mime_type).all()
+    mime_stats = (await db.execute(
+        select(
+            Attachment.mime_type,
+            func.count(Attachment.id).label('count')
+        ).group_by(Attachment.mime_type)
+    )).all()
     
     return {
         "total_attachments": total_attachments,
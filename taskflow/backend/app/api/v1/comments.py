@@ -1,43 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
-from app.models.models import Comment, Issue, User
+from app.db.session import get_async_db
+from app.models.models import Comment, Issue
 from app.schemas.schemas import CommentCreate, CommentUpdate, Comment as CommentSchema
 from app.core.security import get_current_user
-from app.core.websocket_manager import manager
+from app.core.auth_cache import CurrentUser
+from app.core.visibility import can_view_loaded_issue, ensure_issue_access
+from app.db.loaders import FLAT
+from app.db.query_budget import query_budget
+from app.core.websocket_manager import manager, issue_topic
 
 router = APIRouter()
 
-@router.get("/issues/{issue_id}/comments", response_model=List[CommentSchema])
-def read_comments(
+@router.get("/issues/{issue_id}/comments", response_model=List[CommentSchema], dependencies=[Depends(query_budget(3))])
+async def read_comments(
     issue_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Kiểm tra issue có tồn tại không
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
-    if not issue:
-        raise HTTPException(status_code=404, detail="Issue not found")
-    
-    # Kiểm tra quyền truy cập issue (tương tự như trong issue endpoints)
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not enough permissions")
+    # Kiểm tra issue tồn tại và quyền truy cập issue trong một truy vấn
+    await ensure_issue_access(db, current_user, issue_id, forbidden="Not enough permissions", not_found="Issue not found")
     
-    comments = db.query(Comment).filter(Comment.issue_id == issue_id).offset(skip).limit(limit).all()
-    return comments
+    comments = await db.scalars(
+        select(Comment).options(*FLAT).where(Comment.issue_id == issue_id).offset(skip).limit(limit)
+    )
+    return comments.all()
 
 @router.post("/issues/{issue_id}/comments", response_model=CommentSchema)
 async def create_comment(
     issue_id: int,
     comment: CommentCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.get(Issue, issue_id)
     if not issue:
         raise HTTPException(status_code=404, detail="Issue not found")
     
@@ -46,9 +46,8 @@ async def create_comment(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     # Nếu là member, kiểm tra xem có phải là creator hoặc assignee không
-    if current_user.role == "member":
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not enough permissions")
+    if not can_view_loaded_issue(current_user, issue):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     
     db_comment = Comment(
         content=comment.content,
@@ -56,8 +55,8 @@ async def create_comment(
         user_id=current_user.id
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
     
     # Gửi thông báo qua WebSocket
     await manager.broadcast({
@@ -68,7 +67,7 @@ async def create_comment(
             "user_id": current_user.id,
             "content": comment.content[:100]  # Gửi một phần nội dung
         }
-    })
+    }, topics=[issue_topic(issue_id)])
     
     return db_comment
 
@@ -76,10 +75,10 @@ async def create_comment(
 async def update_comment(
     comment_id: int,
     comment: CommentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    db_comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    db_comment = await db.get(Comment, comment_id)
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -91,8 +90,8 @@ async def update_comment(
     for key, value in update_data.items():
         setattr(db_comment, key, value)
     
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
     
     await manager.broadcast({
         "type": "comment_updated",
@@ -101,17 +100,17 @@ async def update_comment(
             "issue_id": db_comment.issue_id,
             "user_id": current_user.id
         }
-    })
+    }, topics=[issue_topic(db_comment.issue_id)])
     
     return db_comment
 
 @router.delete("/comments/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    db_comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    db_comment = await db.get(Comment, comment_id)
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -120,15 +119,15 @@ async def delete_comment(
         # Nếu là manager, cần kiểm tra xem có phải là manager của project chứa issue này không
         if current_user.role == "manager":
             # Lấy issue của comment
-            issue = db.query(Issue).filter(Issue.id == db_comment.issue_id).first()
+            issue = await db.get(Issue, db_comment.issue_id)
             # Giả sử chúng ta có bảng Project với trường manager_id, nếu không thì bỏ qua
             # Ở đây tạm thời coi rằng manager có thể xóa comment trong project họ quản lý
             # Nhưng trong model hiện tại chưa có, nên tạm thời chỉ cho phép admin và người tạo
             pass
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    db.delete(db_comment)
-    db.commit()
+    await db.delete(db_comment)
+    await db.commit()
     
     await manager.broadcast({
         "type": "comment_deleted",
@@ -137,6 +136,6 @@ async def delete_comment(
             "issue_id": db_comment.issue_id,
             "user_id": current_user.id
         }
-    })
+    }, topics=[issue_topic(db_comment.issue_id)])
     
     return {"message": "Comment deleted successfully"}
\ No newline at end of file
@@ -1,54 +1,193 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from app.db.session import get_db
-from app.models.models import Issue, User
-from app.models.label import Label, issue_labels
-from app.schemas.schemas import Label as LabelSchema
+from app.db.session import get_async_db
+from app.models.models import Issue
+from app.models.label import Label
+from app.schemas.schemas import Label as LabelSchema, IssueLabelsBulkRequest, IssueLabelsBulkResponse
 from app.core.security import get_current_user, is_manager_or_admin
-from app.core.activity_logger import log_activity
-from app.core.websocket_manager import manager
+from app.core.auth_cache import CurrentUser
+from app.db.query_budget import query_budget
+from app.core.activity_logger import log_activity, log_activities
+from app.core.websocket_manager import manager, issue_topics
+from app.core.visibility import can_view_loaded_issue, project_access_query, raise_for_access
+from app.core.cache import response_cache, ISSUES_TAG, LABELS_TAG, LABEL_USAGE_TAG
+from app.core.labeling import (
+    issue_label_ids, label_name_filter, link_labels, project_label_ids, resolve_labels, unique_ids, unlink_labels
+)
 
 router = APIRouter()
 
-@router.get("/issues/{issue_id}/labels", response_model=List[LabelSchema])
-def get_issue_labels(
+# Số issues tối đa trong một request /issues/labels/bulk
+MAX_BULK_ISSUES = 1000
+
+@router.get("/issues/{issue_id}/labels", response_model=List[LabelSchema], dependencies=[Depends(query_budget(3))])
+async def get_issue_labels(
     issue_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy danh sách labels của issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.scalar(
+        select(Issue).where(Issue.id == issue_id).options(selectinload(Issue.labels))
+    )
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
     # Kiểm tra quyền
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền xem labels của issue này"
-            )
+    if not can_view_loaded_issue(current_user, issue):
+        raise HTTPException(
+            status_code=403, 
+            detail="Bạn không có quyền xem labels của issue này"
+        )
     
     return issue.labels
 
+@router.post("/issues/{issue_id}/labels/batch")
+async def add_multiple_labels_to_issue(
+    issue_id: int,
+    label_ids: List[int],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)
+):
+    """
+    Thêm nhiều labels vào issue cùng lúc
+    - Khai báo trước /issues/{issue_id}/labels/{label_id} để "batch" không bị hiểu là label_id
+    - Label không tồn tại hoặc đã gắn thì bỏ qua
+    """
+    issue = await db.get(Issue, issue_id)
+    if not issue:
+        raise HTTPException(status_code=404, detail="Không tìm thấy issue")
+    
+    labels = await resolve_labels(db, label_ids)
+    new_links = await link_labels(db, [issue_id], labels.keys())
+    added_labels = [labels[label_id].name for _, label_id in new_links]
+    
+    if added_labels:
+        await db.commit()
+        await response_cache.invalidate(LABEL_USAGE_TAG)
+        
+        # Log activity
+        log_activity(
+            db=db,
+            user_id=current_user.id,
+            action="added_labels_batch",
+            entity_type="issue",
+            entity_id=issue_id,
+            details={
+                "label_ids": label_ids,
+                "label_names": added_labels,
+                "count": len(added_labels)
+            },
+            project_id=issue.project_id
+        )
+        
+        return {"message": f"Đã thêm {len(added_labels)} labels vào issue", "labels": added_labels}
+    else:
+        return {"message": "Không có label nào được thêm"}
+
+@router.post("/issues/labels/bulk", response_model=IssueLabelsBulkResponse)
+async def bulk_update_issue_labels(
+    payload: IssueLabelsBulkRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)
+):
+    """
+    Gắn và/hoặc gỡ một tập labels trên nhiều issues cùng lúc (phân loại hàng loạt)
+    - Kiểm tra issues, labels và các cặp đã gắn bằng một truy vấn mỗi loại
+    - Gắn bằng INSERT nhiều dòng (mỗi câu tối đa LINK_INSERT_BATCH cặp), gỡ bằng một DELETE, chung một transaction
+    """
+    issue_ids = unique_ids(payload.issue_ids)
+    add_ids, remove_ids = unique_ids(payload.add), unique_ids(payload.remove)
+    if not issue_ids or not (add_ids or remove_ids):
+        raise HTTPException(status_code=400, detail="Cần ít nhất một issue và một label để gắn hoặc gỡ")
+    if len(issue_ids) > MAX_BULK_ISSUES:
+        raise HTTPException(status_code=400, detail=f"Tối đa {MAX_BULK_ISSUES} issues mỗi lần")
+    if set(add_ids) & set(remove_ids):
+        raise HTTPException(status_code=400, detail="Một label không thể vừa gắn vừa gỡ")
+    
+    issue_rows = {row.id: row for row in await db.execute(
+        select(Issue.id, Issue.project_id, Issue.creator_id, Issue.assignee_id).where(Issue.id.in_(issue_ids))
+    )}
+    issue_projects = {issue_id: row.project_id for issue_id, row in issue_rows.items()}
+    missing = [issue_id for issue_id in issue_ids if issue_id not in issue_projects]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy issue: {missing}")
+    
+    labels = await resolve_labels(db, add_ids + remove_ids)
+    missing = [label_id for label_id in add_ids + remove_ids if label_id not in labels]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy label: {missing}")
+    
+    added = await link_labels(db, issue_ids, add_ids)
+    removed = await unlink_labels(db, issue_ids, remove_ids)
+    await db.commit()
+    
+    if not added and not removed:
+        return IssueLabelsBulkResponse(issues=len(issue_ids), added=0, removed=0)
+    await response_cache.invalidate(LABEL_USAGE_TAG)
+    
+    # Một activity cho mỗi issue có thay đổi
+    changes = {}
+    for issue_id, label_id in added:
+        changes.setdefault(issue_id, {"added": [], "removed": []})["added"].append(label_id)
+    for issue_id, label_id in removed:
+        changes.setdefault(issue_id, {"added": [], "removed": []})["removed"].append(label_id)
+    log_activities(
+        db=db,
+        user_id=current_user.id,
+        entries=[
+            {
+                "action": "labels_changed",
+                "entity_type": "issue",
+                "entity_id": issue_id,
+                "details": change,
+                "project_id": issue_projects[issue_id]
+            }
+            for issue_id, change in changes.items()
+        ]
+    )
+    
+    # Một sự kiện cho cả batch: bản đầy đủ cho project, creator/assignee chỉ thấy issue của mình
+    def bulk_event(issue_ids=None):
+        return {
+            "type": "issue_labels_bulk",
+            "data": {
+                "issue_ids": [issue_id for issue_id in changes if issue_ids is None or issue_id in issue_ids],
+                "added_label_ids": add_ids,
+                "removed_label_ids": remove_ids,
+                "updated_by": current_user.username
+            }
+        }
+    await manager.broadcast_issues(
+        bulk_event,
+        {issue_projects[issue_id] for issue_id in changes},
+        {issue_id: (issue_rows[issue_id].creator_id, issue_rows[issue_id].assignee_id) for issue_id in changes}
+    )
+    
+    return IssueLabelsBulkResponse(issues=len(issue_ids), added=len(added), removed=len(removed))
+
 @router.post("/issues/{issue_id}/labels/{label_id}")
 async def add_label_to_issue(
     issue_id: int,
     label_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin
 ):
     """
     Thêm label vào issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.scalar(
+        select(Issue).where(Issue.id == issue_id).options(selectinload(Issue.labels))
+    )
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
-    label = db.query(Label).filter(Label.id == label_id).first()
+    label = await db.get(Label, label_id)
     if not label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
@@ -58,7 +197,8 @@ async def add_label_to_issue(
     
     # Thêm label
     issue.labels.append(label)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate(LABEL_USAGE_TAG)
     
     # Log activity
     log_activity(
@@ -71,7 +211,8 @@ async def add_label_to_issue(
             "label_id": label_id,
             "label_name": label.name,
             "issue_title": issue.title
-        }
+        },
+        project_id=issue.project_id
     )
     
     # Broadcast
@@ -83,7 +224,7 @@ async def add_label_to_issue(
             "label_name": label.name,
             "added_by": current_user.username
         }
-    })
+    }, topics=issue_topics(issue))
     
     return {"message": f"Đã thêm label '{label.name}' vào issue"}
 
@@ -91,17 +232,19 @@ async def add_label_to_issue(
 async def remove_label_from_issue(
     issue_id: int,
     label_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin
 ):
     """
     Xóa label khỏi issue
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.scalar(
+        select(Issue).where(Issue.id == issue_id).options(selectinload(Issue.labels))
+    )
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
-    label = db.query(Label).filter(Label.id == label_id).first()
+    label = await db.get(Label, label_id)
     if not label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
@@ -111,7 +254,8 @@ async def remove_label_from_issue(
     
     # Xóa label
     issue.labels.remove(label)
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate(LABEL_USAGE_TAG)
     
     # Log activity
     log_activity(
@@ -124,7 +268,8 @@ async def remove_label_from_issue(
             "label_id": label_id,
             "label_name": label.name,
             "issue_title": issue.title
-        }
+        },
+        project_id=issue.project_id
     )
     
     # Broadcast
@@ -136,88 +281,59 @@ async def remove_label_from_issue(
             "label_name": label.name,
             "removed_by": current_user.username
         }
-    })
+    }, topics=issue_topics(issue))
     
     return {"message": f"Đã xóa label '{label.name}' khỏi issue"}
 
-@router.post("/issues/{issue_id}/labels/batch")
-async def add_multiple_labels_to_issue(
-    issue_id: int,
-    label_ids: List[int],
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)
-):
-    """
-    Thêm nhiều labels vào issue cùng lúc
-    """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
-    if not issue:
-        raise HTTPException(status_code=404, detail="Không tìm thấy issue")
-    
-    added_labels = []
-    for label_id in label_ids:
-        label = db.query(Label).filter(Label.id == label_id).first()
-        if label and label not in issue.labels:
-            issue.labels.append(label)
-            added_labels.append(label.name)
-    
-    if added_labels:
-        db.commit()
-        
-        # Log activity
-        log_activity(
-            db=db,
-            user_id=current_user.id,
-            action="added_labels_batch",
-            entity_type="issue",
-            entity_id=issue_id,
-            details={
-                "label_ids": label_ids,
-                "label_names": added_labels,
-                "count": len(added_labels)
-            }
-        )
-        
-        return {"message": f"Đã thêm {len(added_labels)} labels vào issue", "labels": added_labels}
-    else:
-        return {"message": "Không có label nào được thêm"}
-
-@router.get("/labels/search")
-def search_labels_by_issue(
+@router.get("/labels/search", response_model=List[LabelSchema])
+async def search_labels_by_issue(
     issue_id: Optional[int] = None,
     project_id: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    match: str = Query("contains", regex="^(contains|prefix)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Tìm kiếm labels với bộ lọc
+    - search không phân biệt hoa thường và dấu; match=prefix cho ô gợi ý label (dùng index)
     """
-    from sqlalchemy import func
-    
-    query = db.query(Label)
+    query = select(Label)
     
     if search:
-        query = query.filter(Label.name.ilike(f"%{search}%"))
+        query = query.where(label_name_filter(search, match))
     
     if issue_id:
         # Lấy labels không có trong issue (để thêm vào)
-        issue = db.query(Issue).filter(Issue.id == issue_id).first()
-        if issue:
-            current_label_ids = [label.id for label in issue.labels]
-            if current_label_ids:
-                query = query.filter(~Label.id.in_(current_label_ids))
+        query = query.where(Label.id.not_in(issue_label_ids(issue_id)))
     
     if project_id:
-        # Lấy labels của các issues trong project
-        from app.models.models import Issue
-        issue_ids = [issue.id for issue in db.query(Issue).filter(Issue.project_id == project_id).all()]
-        if issue_ids:
-            # Lấy label_ids từ các issues trong project
-            stmt = select([issue_labels.c.label_id]).where(issue_labels.c.issue_id.in_(issue_ids))
-            result = db.execute(stmt).fetchall()
-            project_label_ids = set([row[0] for row in result])
-            if project_label_ids:
-                query = query.filter(Label.id.in_(project_label_ids))
-    
-    return query.order_by(Label.name).limit(50).all()
\ No newline at end of file
+        # Lấy labels của các issues trong project (subquery, không nạp danh sách issue về Python)
+        query = query.where(Label.id.in_(project_label_ids(project_id)))
+    
+    labels = await db.scalars(query.order_by(Label.name).limit(50))
+    return labels.all()
+
+@router.get("/projects/{project_id}/labels", response_model=List[LabelSchema], dependencies=[Depends(query_budget(2))])
+async def get_project_labels(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Labels đang được dùng trong project (bộ lọc ở sidebar của board)
+    - Một truy vấn kiểm tra quyền, một truy vấn labels (cache chung cho mọi user xem được project)
+    """
+    found, visible = (await db.execute(project_access_query(current_user, project_id))).one()
+    raise_for_access(found, visible, "Không tìm thấy project", "Bạn không có quyền xem project này")
+    
+    async def load():
+        labels = await db.scalars(
+            select(Label).where(Label.id.in_(project_label_ids(project_id))).order_by(Label.name)
+        )
+        return [LabelSchema.model_validate(label) for label in labels]
+    
+    # Gắn/gỡ label, xóa/chuyển issue và sửa label đều làm kết quả thay đổi
+    return await response_cache.get_or_load(
+        f"project_labels:{project_id}", load, tags=[LABELS_TAG, LABEL_USAGE_TAG, ISSUES_TAG]
+    )
@@ -1,100 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.models import Issue, Project, User
-from app.schemas.schemas import IssueCreate, IssueUpdate, Issue as IssueSchema, StatsResponse, IssueWithRelations
-from app.core.websocket_manager import manager
+from app.schemas.schemas import (
+    IssueCreate, IssueUpdate, Issue as IssueSchema, StatsResponse, IssueWithRelations, IssueWithLabels,
+    IssueBatchRequest, IssueBatchResponse
+)
+from app.db.loaders import ISSUE_FLAT, ISSUE_WITH_LABELS, ISSUE_WITH_RELATIONS
+from app.db.query_budget import query_budget
+from app.core.websocket_manager import manager, issue_topics
 from app.core.security import get_current_user, is_admin, is_manager_or_admin
-from app.core.activity_logger import log_activity
+from app.core.auth_cache import CurrentUser
+from app.core.activity_logger import log_activity, log_activities
+from app.core.pagination import apply_keyset, next_page, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.core.issue_counters import snapshot_issue, apply_issue_change, get_issue_stats
+from app.crud.crud_issue import crud_issue
+from app.core.visibility import can_view_loaded_issue, filter_visible_issues, issue_visible_flag, sees_all_issues, visible_issue_ids
+from app.core.cache import response_cache, ISSUES_TAG, PROJECTS_TAG, LABEL_USAGE_TAG, ACTIVITY_TAG
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/issues", response_model=List[IssueSchema])
-def read_issues(
-    skip: int = 0, 
-    limit: int = 100, 
+# Số thao tác tối đa trong một request /issues/batch
+MAX_BATCH_SIZE = 500
+
+@router.get("/issues", response_model=List[IssueWithLabels], dependencies=[Depends(query_budget(3))])
+async def read_issues(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     project_id: Optional[int] = None, 
     status: Optional[str] = None,
     assignee_id: Optional[int] = None,
     creator_id: Optional[int] = None,
     priority: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy danh sách issues với các bộ lọc
     - Chỉ users đã đăng nhập mới có thể truy cập
     - Có thể lọc theo project, status, assignee, creator, priority
+    - Truyền cursor (lấy từ header X-Next-Cursor) để phân trang keyset thay cho skip
+    - Kèm labels của từng issue (một truy vấn cho cả trang) để board không phải gọi thêm
     """
-    query = db.query(Issue)
+    query = select(Issue).options(*ISSUE_WITH_LABELS)
     
     # Áp dụng các bộ lọc
     if project_id:
-        query = query.filter(Issue.project_id == project_id)
+        query = query.where(Issue.project_id == project_id)
     
     if status:
-        query = query.filter(Issue.status == status)
+        query = query.where(Issue.status == status)
     
     if assignee_id:
-        query = query.filter(Issue.assignee_id == assignee_id)
+        query = query.where(Issue.assignee_id == assignee_id)
     
     if creator_id:
-        query = query.filter(Issue.creator_id == creator_id)
+        query = query.where(Issue.creator_id == creator_id)
     
     if priority:
-        query = query.filter(Issue.priority == priority)
+        query = query.where(Issue.priority == priority)
     
-    # Người dùng thường chỉ xem được issues của project họ tham gia
-    # Admin có thể xem tất cả
-    if current_user.role not in ["admin", "manager"]:
-        # Lọc chỉ những issues mà user là creator hoặc assignee
-        # Hoặc issues thuộc project mà user có quyền
-        query = query.filter(
-            (Issue.creator_id == current_user.id) | 
-            (Issue.assignee_id == current_user.id)
-        )
+    # Người dùng thường chỉ xem được issues mình tạo hoặc được gán (tra bảng issue_visibility)
+    # Admin/manager xem được tất cả
+    query = filter_visible_issues(query, current_user)
     
-    return query.order_by(Issue.created_at.desc()).offset(skip).limit(limit).all()
+    query = apply_keyset(query, Issue.created_at, Issue.id, skip=skip, limit=limit, cursor=cursor)
+    issues, next_cursor = next_page((await db.scalars(query)).all(), limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return issues
 
-@router.get("/issues/{issue_id}", response_model=IssueWithRelations)
-def read_issue(
+@router.get("/issues/{issue_id}", response_model=IssueWithRelations, dependencies=[Depends(query_budget(2))])
+async def read_issue(
     issue_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy thông tin chi tiết của một issue
     - Kiểm tra quyền truy cập
     - Trả về cả thông tin creator và assignee
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.scalar(
+        select(Issue).where(Issue.id == issue_id).options(*ISSUE_WITH_RELATIONS)
+    )
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
     # Kiểm tra quyền truy cập
-    if current_user.role not in ["admin", "manager"]:
-        if issue.creator_id != current_user.id and issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền truy cập issue này"
-            )
+    if not can_view_loaded_issue(current_user, issue):
+        raise HTTPException(
+            status_code=403, 
+            detail="Bạn không có quyền truy cập issue này"
+        )
     
     return issue
 
 @router.post("/issues", response_model=IssueSchema)
 async def create_issue(
     issue: IssueCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Tạo issue mới
     - Tự động gán creator_id = current_user.id
     - Kiểm tra project tồn tại
     """
-    project = db.query(Project).filter(Project.id == issue.project_id).first()
+    project = await db.get(Project, issue.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Không tìm thấy project")
     
@@ -111,8 +129,11 @@ async def create_issue(
     
     db_issue = Issue(**issue_data)
     db.add(db_issue)
-    db.commit()
-    db.refresh(db_issue)
+    await db.flush()
+    await db.run_sync(apply_issue_change, None, snapshot_issue(db_issue))
+    await db.commit()
+    await response_cache.invalidate(ISSUES_TAG)
+    await db.refresh(db_issue)
     
     # Log activity
     log_activity(
@@ -125,7 +146,8 @@ async def create_issue(
             "title": db_issue.title,
             "project_id": db_issue.project_id,
             "status": db_issue.status
-        }
+        },
+        project_id=db_issue.project_id
     )
     
     # Broadcast qua WebSocket
@@ -138,7 +160,7 @@ async def create_issue(
             "creator": current_user.username,
             "project_id": db_issue.project_id
         }
-    })
+    }, topics=issue_topics(db_issue))
     
     return db_issue
 
@@ -146,29 +168,31 @@ async def create_issue(
 async def update_issue(
     issue_id: int, 
     issue: IssueUpdate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Cập nhật issue
     - Chỉ creator, assignee, admin hoặc manager mới được update
     - Tự động cập nhật updated_at
     """
-    db_issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    db_issue = await db.get(Issue, issue_id)
     if not db_issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
     # Kiểm tra quyền
-    if current_user.role not in ["admin", "manager"]:
-        if db_issue.creator_id != current_user.id and db_issue.assignee_id != current_user.id:
-            raise HTTPException(
-                status_code=403, 
-                detail="Bạn không có quyền cập nhật issue này"
-            )
+    if not can_view_loaded_issue(current_user, db_issue):
+        raise HTTPException(
+            status_code=403, 
+            detail="Bạn không có quyền cập nhật issue này"
+        )
     
     # Lưu trạng thái cũ để log
     old_status = db_issue.status
     old_assignee = db_issue.assignee_id
+    old_snapshot = snapshot_issue(db_issue)
+    # Issue chuyển project hoặc đổi assignee thì board cũ và assignee cũ cũng cần nhận sự kiện
+    old_topics = set(issue_topics(db_issue))
     
     # Cập nhật dữ liệu
     update_data = issue.dict(exclude_unset=True)
@@ -177,9 +201,11 @@ async def update_issue(
     
     # Cập nhật thời gian sửa đổi
     db_issue.updated_at = datetime.utcnow()
+    await db.run_sync(apply_issue_change, old_snapshot, snapshot_issue(db_issue))
     
-    db.commit()
-    db.refresh(db_issue)
+    await db.commit()
+    await response_cache.invalidate(ISSUES_TAG)
+    await db.refresh(db_issue)
     
     # Log activity
     log_details = {}
@@ -194,7 +220,8 @@ async def update_issue(
         action="updated",
         entity_type="issue",
         entity_id=db_issue.id,
-        details=log_details if log_details else {"fields_updated": list(update_data.keys())}
+        details=log_details if log_details else {"fields_updated": list(update_data.keys())},
+        project_id=db_issue.project_id
     )
     
     # Broadcast qua WebSocket
@@ -206,21 +233,21 @@ async def update_issue(
             "updated_by": current_user.username,
             "changes": list(update_data.keys())
         }
-    })
+    }, topics=old_topics | set(issue_topics(db_issue)))
     
     return db_issue
 
 @router.delete("/issues/{issue_id}")
 async def delete_issue(
     issue_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Xóa issue
     - Chỉ admin, manager hoặc creator mới được xóa
     """
-    db_issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    db_issue = await db.get(Issue, issue_id)
     if not db_issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
@@ -242,11 +269,15 @@ async def delete_issue(
         details={
             "title": db_issue.title,
             "project_id": db_issue.project_id
-        }
+        },
+        same_transaction=True,
+        project_id=db_issue.project_id
     )
     
-    db.delete(db_issue)
-    db.commit()
+    await db.run_sync(apply_issue_change, snapshot_issue(db_issue), None)
+    await db.delete(db_issue)
+    await db.commit()
+    await response_cache.invalidate(ISSUES_TAG, LABEL_USAGE_TAG, ACTIVITY_TAG)
     
     # Broadcast qua WebSocket
     await manager.broadcast({
@@ -255,119 +286,266 @@ async def delete_issue(
             "id": issue_id,
             "deleted_by": current_user.username
         }
-    })
+    }, topics=issue_topics(db_issue))
     
     return {"message": "Issue đã được xóa thành công"}
 
+@router.post("/issues/batch", response_model=IssueBatchResponse)
+async def batch_issues(
+    batch: IssueBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Tạo, sửa (kể cả chuyển cột/chuyển project) và xóa nhiều issues trong một transaction
+    - Dùng khi kéo thả nhiều thẻ trên board thay cho N lần PUT /issues/{id}
+    - Quyền giống các endpoint đơn lẻ, kiểm tra bằng một truy vấn cho cả batch
+    - Một lỗi bất kỳ thì không có thay đổi nào được ghi
+    - Activity được ghi cùng transaction, WebSocket chỉ nhận một sự kiện issues_batch
+      (bản đầy đủ cho project, bản chỉ gồm issue của mình cho creator/assignee)
+    """
+    update_ids = [item.id for item in batch.update]
+    total = len(batch.create) + len(update_ids) + len(batch.delete)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Batch không có thao tác nào")
+    if total > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch tối đa {MAX_BATCH_SIZE} thao tác")
+    
+    target_ids = set(update_ids) | set(batch.delete)
+    if len(target_ids) != len(update_ids) + len(batch.delete):
+        raise HTTPException(status_code=400, detail="Mỗi issue chỉ được xuất hiện một lần trong batch")
+    
+    if batch.create and current_user.role not in ["admin", "manager", "member"]:
+        raise HTTPException(status_code=403, detail="Bạn không có quyền tạo issue")
+    
+    # Một truy vấn lấy các issue cần sửa/xóa kèm quyền xem của user
+    issues = {}
+    visible = {}
+    if target_ids:
+        rows = await db.execute(
+            select(Issue, issue_visible_flag(current_user, Issue.id)).where(Issue.id.in_(target_ids))
+        )
+        for issue, flag in rows:
+            issues[issue.id] = issue
+            visible[issue.id] = flag
+        
+        missing = sorted(target_ids - issues.keys())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Không tìm thấy issue: {missing}")
+        
+        # Sửa: creator/assignee hoặc admin/manager; xóa: creator hoặc admin/manager
+        forbidden = [issue_id for issue_id in update_ids if not visible[issue_id]]
+        forbidden += [
+            issue_id for issue_id in batch.delete
+            if not sees_all_issues(current_user) and issues[issue_id].creator_id != current_user.id
+        ]
+        if forbidden:
+            raise HTTPException(status_code=403, detail=f"Bạn không có quyền thay đổi issue: {sorted(forbidden)}")
+    
+    # Project của issue mới và project đích khi chuyển issue
+    project_ids = {item.project_id for item in batch.create}
+    project_ids |= {item.project_id for item in batch.update if item.project_id is not None}
+    if project_ids:
+        found = set(await db.scalars(select(Project.id).where(Project.id.in_(project_ids))))
+        missing = sorted(project_ids - found)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Không tìm thấy project: {missing}")
+    
+    # Trạng thái cũ để log và để board cũ / assignee cũ nhận sự kiện khi issue chuyển đi
+    project_ids = set()
+    viewers = {}
+    entries = []
+    updates = []
+    for item in batch.update:
+        db_issue = issues[item.id]
+        project_ids.add(db_issue.project_id)
+        viewers.setdefault(db_issue.id, set()).update((db_issue.creator_id, db_issue.assignee_id))
+        update_data = item.dict(exclude_unset=True, exclude={"id"})
+        details = {"fields_updated": list(update_data.keys())}
+        if "status" in update_data and update_data["status"] != db_issue.status:
+            details["status_changed"] = {"from": db_issue.status, "to": update_data["status"]}
+        if "assignee_id" in update_data and update_data["assignee_id"] != db_issue.assignee_id:
+            details["assignee_changed"] = {"from": db_issue.assignee_id, "to": update_data["assignee_id"]}
+        entries.append({"action": "updated", "entity_type": "issue", "entity_id": item.id, "details": details})
+        updates.append((db_issue, update_data))
+    
+    deleted = [issues[issue_id] for issue_id in batch.delete]
+    for db_issue in deleted:
+        project_ids.add(db_issue.project_id)
+        viewers.setdefault(db_issue.id, set()).update((db_issue.creator_id, db_issue.assignee_id))
+        entries.append({
+            "action": "deleted",
+            "entity_type": "issue",
+            "entity_id": db_issue.id,
+            "details": {"title": db_issue.title, "project_id": db_issue.project_id},
+            "project_id": db_issue.project_id
+        })
+    
+    def apply(session):
+        created = crud_issue.create_many(session, objs_in=batch.create, creator_id=current_user.id)
+        updated = crud_issue.update_many(session, updates=updates)
+        crud_issue.delete_many(session, db_objs=deleted)
+        return created, updated
+    
+    created, updated = await db.run_sync(apply)
+    
+    # project_id của activity sửa là project sau khi cập nhật (ghép theo id, không theo thứ tự)
+    updated_projects = {db_issue.id: db_issue.project_id for db_issue in updated}
+    for entry in entries:
+        if entry["action"] == "updated":
+            entry["project_id"] = updated_projects[entry["entity_id"]]
+    entries += [
+        {
+            "action": "created",
+            "entity_type": "issue",
+            "entity_id": db_issue.id,
+            "details": {"title": db_issue.title, "project_id": db_issue.project_id, "status": db_issue.status},
+            "project_id": db_issue.project_id
+        }
+        for db_issue in created
+    ]
+    log_activities(db=db, user_id=current_user.id, entries=entries, same_transaction=True)
+    
+    await db.commit()
+    await response_cache.invalidate(ISSUES_TAG, ACTIVITY_TAG, *([LABEL_USAGE_TAG] if deleted else []))
+    
+    # Một sự kiện cho cả batch (client tải lại các issue theo id)
+    for db_issue in created + updated:
+        project_ids.add(db_issue.project_id)
+        viewers.setdefault(db_issue.id, set()).update((db_issue.creator_id, db_issue.assignee_id))
+
+    def batch_event(issue_ids=None):
+        def keep(issue_id):
+            return issue_ids is None or issue_id in issue_ids
+        return {
+            "type": "issues_batch",
+            "data": {
+                "created": [{"id": i.id, "project_id": i.project_id, "status": i.status} for i in created if keep(i.id)],
+                "updated": [{"id": i.id, "project_id": i.project_id, "status": i.status} for i in updated if keep(i.id)],
+                "deleted": [issue_id for issue_id in batch.delete if keep(issue_id)],
+                "updated_by": current_user.username
+            }
+        }
+    await manager.broadcast_issues(batch_event, project_ids, viewers)
+    
+    return IssueBatchResponse(created=created, updated=updated, deleted=list(batch.delete))
+
 @router.get("/statistics", response_model=StatsResponse)
-def get_statistics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_statistics(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy thống kê
     - Admin xem được tất cả
     - Users khác chỉ xem được thống kê của issues họ liên quan
+    - Số liệu đọc từ bảng issue_counters thay vì đếm lại bảng issues
+    - Kết quả được cache (chung cho admin/manager, riêng cho từng user khác), vô hiệu khi issues/projects thay đổi
     """
-    if current_user.role in ["admin", "manager"]:
-        # Admin/manager xem tất cả
-        total_projects = db.query(Project).count()
-        total_issues = db.query(Issue).count()
-        
-        # Lấy issues gần đây
-        recent = db.query(Issue).order_by(Issue.created_at.desc()).limit(5).all()
-    else:
-        # Users thường chỉ xem issues của họ
-        total_projects = db.query(Project).count()  # Vẫn xem được số project
-        total_issues = db.query(Issue).filter(
-            (Issue.creator_id == current_user.id) | 
-            (Issue.assignee_id == current_user.id)
-        ).count()
+    async def load():
+        # Mọi user đều xem được số project
+        total_projects = await db.scalar(select(func.count()).select_from(Project))
+    
+        if sees_all_issues(current_user):
+            # Admin/manager xem tất cả
+            stats = await db.run_sync(get_issue_stats)
         
-        # Issues gần đây của user
-        recent = db.query(Issue).filter(
-            (Issue.creator_id == current_user.id) | 
-            (Issue.assignee_id == current_user.id)
-        ).order_by(Issue.created_at.desc()).limit(5).all()
-    
-    # Thống kê theo status
-    issues_by_status = {}
-    for status in ["To Do", "In Progress", "Done"]:
-        if current_user.role in ["admin", "manager"]:
-            issues_by_status[status] = db.query(Issue).filter(Issue.status == status).count()
+            # Lấy issues gần đây
+            recent = await db.scalars(
+                select(Issue).order_by(Issue.created_at.desc(), Issue.id.desc()).limit(5)
+            )
         else:
-            issues_by_status[status] = db.query(Issue).filter(
-                (Issue.status == status) & 
-                ((Issue.creator_id == current_user.id) | (Issue.assignee_id == current_user.id))
-            ).count()
-    
-    return StatsResponse(
-        total_projects=total_projects,
-        total_issues=total_issues,
-        issues_by_status=issues_by_status,
-        recent_issues=recent
-    )
+            # Users thường chỉ xem issues của họ
+            stats = await db.run_sync(get_issue_stats, user_id=current_user.id)
+        
+            # Issues gần đây của user
+            recent = await db.scalars(
+                filter_visible_issues(select(Issue), current_user).order_by(Issue.created_at.desc(), Issue.id.desc()).limit(5)
+            )
+    
+        return StatsResponse(
+            total_projects=total_projects,
+            recent_issues=recent.all(),
+            **stats
+        )
+    
+    cache_key = "statistics:all" if sees_all_issues(current_user) else f"statistics:user:{current_user.id}"
+    return await response_cache.get_or_load(cache_key, load, tags=[ISSUES_TAG, PROJECTS_TAG])
 
-@router.get("/my/issues", response_model=List[IssueSchema])
-def get_my_issues(
+@router.get("/my/issues", response_model=List[IssueSchema], dependencies=[Depends(query_budget(2))])
+async def get_my_issues(
+    response: Response,
     status: Optional[str] = None,
     priority: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy issues của user hiện tại (tạo ra hoặc được gán)
     """
-    query = db.query(Issue).filter(
-        (Issue.creator_id == current_user.id) | 
-        (Issue.assignee_id == current_user.id)
-    )
+    query = select(Issue).options(*ISSUE_FLAT).where(Issue.id.in_(visible_issue_ids(current_user.id)))
     
     if status:
-        query = query.filter(Issue.status == status)
+        query = query.where(Issue.status == status)
     
     if priority:
-        query = query.filter(Issue.priority == priority)
+        query = query.where(Issue.priority == priority)
     
-    return query.order_by(Issue.created_at.desc()).all()
+    query = apply_keyset(query, Issue.created_at, Issue.id, skip=skip, limit=limit, cursor=cursor)
+    issues, next_cursor = next_page((await db.scalars(query)).all(), limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return issues
 
-@router.get("/admin/issues", response_model=List[IssueSchema])
-def admin_get_all_issues(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    admin: User = Depends(is_admin)  # Chỉ admin mới truy cập được
+@router.get("/admin/issues", response_model=List[IssueSchema], dependencies=[Depends(query_budget(2))])
+async def admin_get_all_issues(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(is_admin)  # Chỉ admin mới truy cập được
 ):
     """
     Endpoint dành riêng cho admin để lấy tất cả issues
     """
-    return db.query(Issue).order_by(Issue.created_at.desc()).offset(skip).limit(limit).all()
+    query = apply_keyset(select(Issue).options(*ISSUE_FLAT), Issue.created_at, Issue.id, skip=skip, limit=limit, cursor=cursor)
+    issues, next_cursor = next_page((await db.scalars(query)).all(), limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return issues
 
 @router.patch("/issues/{issue_id}/assign")
 async def assign_issue(
     issue_id: int,
     assignee_id: int = Query(..., description="ID của user được gán"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin mới được gán issue
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin mới được gán issue
 ):
     """
     Gán issue cho user khác
     """
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.get(Issue, issue_id)
     if not issue:
         raise HTTPException(status_code=404, detail="Không tìm thấy issue")
     
     # Kiểm tra assignee có tồn tại không
-    assignee = db.query(User).filter(User.id == assignee_id).first()
+    assignee = await db.get(User, assignee_id)
     if not assignee:
         raise HTTPException(status_code=404, detail="Không tìm thấy user được gán")
     
     old_assignee = issue.assignee_id
+    old_snapshot = snapshot_issue(issue)
     issue.assignee_id = assignee_id
     issue.updated_at = datetime.utcnow()
+    await db.run_sync(apply_issue_change, old_snapshot, snapshot_issue(issue))
     
-    db.commit()
-    db.refresh(issue)
+    await db.commit()
+    await response_cache.invalidate(ISSUES_TAG)
+    await db.refresh(issue)
     
     # Log activity
     log_activity(
@@ -380,7 +558,8 @@ async def assign_issue(
             "old_assignee": old_assignee,
             "new_assignee": assignee_id,
             "assigner": current_user.username
-        }
+        },
+        project_id=issue.project_id
     )
     
     # Broadcast
@@ -392,6 +571,6 @@ async def assign_issue(
             "assignee_name": assignee.username,
             "assigned_by": current_user.username
         }
-    })
+    }, topics=issue_topics(issue))
     
     return {"message": f"Issue đã được gán cho {assignee.username}"}
\ No newline at end of file
@@ -1,44 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.label import Label
-from app.models.models import User, Issue
-from app.schemas.schemas import LabelCreate, LabelUpdate, Label as LabelSchema
+from app.models.models import Issue
+from app.schemas.schemas import LabelCreate, LabelUpdate, Label as LabelSchema, Issue as IssueSchema
 from app.core.security import get_current_user, is_manager_or_admin
+from app.core.auth_cache import CurrentUser
+from app.db.loaders import ISSUE_FLAT
+from app.db.query_budget import query_budget
 from app.core.activity_logger import log_activity
 from app.core.websocket_manager import manager
+from app.core.visibility import filter_visible_issues
+from app.core.labeling import label_name_filter
+from app.core.cache import response_cache, LABELS_TAG, LABEL_USAGE_TAG, ACTIVITY_TAG
 
 router = APIRouter()
 
-@router.get("/labels", response_model=List[LabelSchema])
-def get_labels(
+@router.get("/labels", response_model=List[LabelSchema], dependencies=[Depends(query_budget(2))])
+async def get_labels(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    match: str = Query("contains", regex="^(contains|prefix)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    Lấy danh sách labels
+    Lấy danh sách labels (cache theo tham số, vô hiệu khi labels thay đổi)
+    - search không phân biệt hoa thường và dấu; match=prefix cho ô gợi ý label (dùng index)
     """
-    query = db.query(Label)
-    
-    if search:
-        query = query.filter(Label.name.ilike(f"%{search}%"))
-    
-    return query.order_by(Label.name).offset(skip).limit(limit).all()
+    async def load():
+        query = select(Label)
+        order_by = Label.name
+        
+        if search:
+            query = query.where(label_name_filter(search, match))
+            if match == "prefix":
+                # Sắp xếp theo chính index đang đọc, không cần sort
+                order_by = Label.name_normalized
+        
+        labels = await db.scalars(query.order_by(order_by, Label.id).offset(skip).limit(limit))
+        return [LabelSchema.model_validate(label) for label in labels]
+    
+    cache_key = f"labels:{skip}:{limit}:{match}:{search or ''}"
+    return await response_cache.get_or_load(cache_key, load, tags=[LABELS_TAG])
+
+@router.get("/labels/popular")
+async def get_popular_labels(
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Lấy danh sách labels được sử dụng nhiều nhất
+    - Khai báo trước /labels/{label_id} để "popular" không bị hiểu là label_id
+    """
+    async def load():
+        # usage_count do trigger trên issue_labels cập nhật, đọc theo index thay vì group by
+        popular_labels = await db.scalars(
+            select(Label)
+            .where(Label.usage_count > 0)
+            .order_by(Label.usage_count.desc(), Label.id.desc())
+            .limit(limit)
+        )
+        
+        return [
+            {
+                "label": LabelSchema.model_validate(label),
+                "issue_count": label.usage_count
+            }
+            for label in popular_labels
+        ]
+    
+    return await response_cache.get_or_load(f"labels:popular:{limit}", load, tags=[LABELS_TAG, LABEL_USAGE_TAG])
 
 @router.get("/labels/{label_id}", response_model=LabelSchema)
-def get_label(
+async def get_label(
     label_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy thông tin chi tiết của label
     """
-    label = db.query(Label).filter(Label.id == label_id).first()
+    label = await db.get(Label, label_id)
     if not label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
@@ -47,14 +94,14 @@ def get_label(
 @router.post("/labels", response_model=LabelSchema)
 async def create_label(
     label: LabelCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin tạo label
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin tạo label
 ):
     """
     Tạo label mới
     """
     # Kiểm tra label đã tồn tại chưa
-    existing_label = db.query(Label).filter(Label.name == label.name).first()
+    existing_label = await db.scalar(select(Label).where(Label.name == label.name))
     if existing_label:
         raise HTTPException(status_code=400, detail="Label đã tồn tại")
     
@@ -63,8 +110,9 @@ async def create_label(
         created_by=current_user.id
     )
     db.add(db_label)
-    db.commit()
-    db.refresh(db_label)
+    await db.commit()
+    await response_cache.invalidate(LABELS_TAG)
+    await db.refresh(db_label)
     
     # Log activity
     log_activity(
@@ -82,13 +130,13 @@ async def create_label(
 async def update_label(
     label_id: int,
     label: LabelUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin sửa label
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin sửa label
 ):
     """
     Cập nhật label
     """
-    db_label = db.query(Label).filter(Label.id == label_id).first()
+    db_label = await db.get(Label, label_id)
     if not db_label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
@@ -96,15 +144,16 @@ async def update_label(
     
     # Kiểm tra nếu đổi tên thì tên mới có trùng không
     if "name" in update_data and update_data["name"] != db_label.name:
-        existing_label = db.query(Label).filter(Label.name == update_data["name"]).first()
+        existing_label = await db.scalar(select(Label).where(Label.name == update_data["name"]))
         if existing_label and existing_label.id != label_id:
             raise HTTPException(status_code=400, detail="Tên label đã tồn tại")
     
     for key, value in update_data.items():
         setattr(db_label, key, value)
     
-    db.commit()
-    db.refresh(db_label)
+    await db.commit()
+    await response_cache.invalidate(LABELS_TAG, LABEL_USAGE_TAG)
+    await db.refresh(db_label)
     
     # Log activity
     log_activity(
@@ -121,26 +170,20 @@ async def update_label(
 @router.delete("/labels/{label_id}")
 async def delete_label(
     label_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(is_manager_or_admin)  # Chỉ manager/admin xóa label
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(is_manager_or_admin)  # Chỉ manager/admin xóa label
 ):
     """
     Xóa label
     """
-    label = db.query(Label).filter(Label.id == label_id).first()
+    label = await db.get(Label, label_id)
     if not label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
-    # Kiểm tra label có đang được sử dụng không
-    from app.models.label import issue_labels
-    from sqlalchemy import select
+    # Kiểm tra label có đang được sử dụng không (usage_count đọc cùng label)
+    issue_count = label.usage_count
     
-    # Đếm số issues sử dụng label này
-    stmt = select([issue_labels.c.issue_id]).where(issue_labels.c.label_id == label_id)
-    result = db.execute(stmt).fetchall()
-    
-    if result:
-        issue_count = len(result)
+    if issue_count:
         raise HTTPException(
             status_code=400, 
             detail=f"Không thể xóa label đang được sử dụng bởi {issue_count} issues"
@@ -153,65 +196,36 @@ async def delete_label(
         action="deleted",
         entity_type="label",
         entity_id=label_id,
-        details={"name": label.name}
+        details={"name": label.name},
+        same_transaction=True
     )
     
-    db.delete(label)
-    db.commit()
+    await db.delete(label)
+    await db.commit()
+    await response_cache.invalidate(LABELS_TAG, LABEL_USAGE_TAG, ACTIVITY_TAG)
     
     return {"message": "Label đã được xóa thành công"}
 
-@router.get("/labels/{label_id}/issues")
-def get_issues_by_label(
+@router.get("/labels/{label_id}/issues", response_model=List[IssueSchema], dependencies=[Depends(query_budget(3))])
+async def get_issues_by_label(
     label_id: int,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Lấy danh sách issues có label cụ thể
     """
-    label = db.query(Label).filter(Label.id == label_id).first()
+    label = await db.get(Label, label_id)
     if not label:
         raise HTTPException(status_code=404, detail="Không tìm thấy label")
     
     # Lấy issues có label này
-    issues = db.query(Issue).join(Issue.labels).filter(Label.id == label_id)
+    issues = select(Issue).options(*ISSUE_FLAT).join(Issue.labels).where(Label.id == label_id)
     
     # Filter theo quyền
-    if current_user.role not in ["admin", "manager"]:
-        issues = issues.filter(
-            (Issue.creator_id == current_user.id) | 
-            (Issue.assignee_id == current_user.id)
-        )
+    issues = filter_visible_issues(issues, current_user)
     
-    return issues.offset(skip).limit(limit).all()
-
-@router.get("/labels/popular")
-def get_popular_labels(
-    limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Lấy danh sách labels được sử dụng nhiều nhất
-    """
-    from sqlalchemy import func
-    
-    popular_labels = db.query(
-        Label,
-        func.count(Issue.id).label('issue_count')
-    ).join(Label.issues)\
-     .group_by(Label.id)\
-     .order_by(func.count(Issue.id).desc())\
-     .limit(limit)\
-     .all()
-    
-    return [
-        {
-            "label": label[0],
-            "issue_count": label[1]
-        }
-        for label in popular_labels
-    ]
\ No newline at end of file
+    result = await db.scalars(issues.offset(skip).limit(limit))
+    return result.all()
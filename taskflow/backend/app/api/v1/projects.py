@@ -1,40 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.models import Project
 from app.schemas.schemas import ProjectCreate, ProjectUpdate, Project as ProjectSchema
+from app.core.issue_counters import drop_project_counters
+from app.core.cache import response_cache, PROJECTS_TAG, ISSUES_TAG, LABEL_USAGE_TAG
 
 router = APIRouter()
 
 @router.get("/projects", response_model=List[ProjectSchema])
-def read_projects(db: Session = Depends(get_db)):
-    return db.query(Project).all()
+async def read_projects(db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        projects = await db.scalars(select(Project))
+        return [ProjectSchema.model_validate(project) for project in projects]
+    return await response_cache.get_or_load("projects", load, tags=[PROJECTS_TAG])
 
 @router.post("/projects", response_model=ProjectSchema)
-def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
+async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_async_db)):
     db_project = Project(**project.dict())
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
+    await response_cache.invalidate(PROJECTS_TAG)
     return db_project
 
 @router.put("/projects/{project_id}", response_model=ProjectSchema)
-def update_project(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
-    db_project = db.query(Project).filter(Project.id == project_id).first()
+async def update_project(project_id: int, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_project = await db.get(Project, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
     for key, value in project.dict(exclude_unset=True).items():
         setattr(db_project, key, value)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
+    await response_cache.invalidate(PROJECTS_TAG)
     return db_project
 
 @router.delete("/projects/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(get_db)):
-    db_project = db.query(Project).filter(Project.id == project_id).first()
+async def delete_project(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_project = await db.get(Project, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(db_project)
-    db.commit()
-    return {"message": "Project deleted successfully"}
\ No newline at end of file
+    await db.run_sync(drop_project_counters, project_id)
+    await db.delete(db_project)
+    await db.commit()
+    # Xóa project kéo theo xóa issues (và nhãn gắn trên issues)
+    await response_cache.invalidate(PROJECTS_TAG, ISSUES_TAG, LABEL_USAGE_TAG)
+    return {"message": "Project deleted successfully"}
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.db.session import get_async_db
+from app.schemas.schemas import SearchResponse
+from app.core.security import get_current_user
+from app.core.auth_cache import CurrentUser
+from app.core.search import parse_search_query, search_issues, search_comments
+
+router = APIRouter()
+
+@router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: str = Query("all", regex="^(all|issues|comments)$"),
+    project_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Tìm kiếm toàn văn trong issues (title, description) và comments
+    - Kết quả sắp xếp theo độ liên quan, kèm snippet đánh dấu đoạn khớp bằng <mark>
+    - Từ cuối cùng được tìm theo tiền tố, thêm * sau một từ để tìm tiền tố cho từ đó
+    - Chỉ trả về issues/comments mà user được xem
+    """
+    terms = parse_search_query(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Từ khóa tìm kiếm không hợp lệ")
+    
+    issues = []
+    comments = []
+    if scope in ("all", "issues"):
+        issues = await search_issues(db, current_user, terms, project_id=project_id, limit=limit)
+    if scope in ("all", "comments"):
+        comments = await search_comments(db, current_user, terms, project_id=project_id, limit=limit)
+    return SearchResponse(query=q, issues=issues, comments=comments)
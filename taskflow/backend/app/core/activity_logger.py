@@ -1,28 +1,214 @@
+import logging
+import queue
+import threading
+import time
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.core.config import settings
+from app.core.pagination import apply_keyset
+from app.core.cache import response_cache, ACTIVITY_TAG
+from app.db.session import engine
 from app.models.models import ActivityLog
 from datetime import datetime
 
+logger = logging.getLogger("taskflow.activity")
+
+class ActivitySink:
+    """
+    Bộ đệm ghi activity log theo lô
+    - Request chỉ đưa bản ghi vào hàng đợi, không chờ ghi database
+    - Thread nền ghi cả lô bằng một INSERT executemany mỗi N bản ghi hoặc M mili giây
+    - Lô lỗi tạm thời (database bận) được thử lại; vẫn lỗi thì ghi từng bản ghi,
+      chỉ bỏ bản ghi hỏng (vd. user đã bị xóa) thay vì cả lô
+    - Hàng đợi nằm trong bộ nhớ và thread nền là daemon: close() khi shutdown ghi nốt,
+      nhưng process bị kill (SIGKILL, OOM, crash) thì các bản ghi còn trong hàng đợi bị mất
+    """
+    # Thử lại lô khi database lỗi tạm thời (giây chờ tăng dần: 0.2, 0.4)
+    WRITE_RETRIES = 3
+    RETRY_BACKOFF = 0.2
+
+    def __init__(self, db_engine: Engine, batch_size: int, flush_interval_ms: int):
+        self.engine = db_engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-sink", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, record: Dict[str, Any]):
+        if self._thread is None:
+            self.start()
+        self._queue.put(record)
+
+    def _collect(self, block: bool) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        with self.engine.begin() as conn:
+            conn.execute(insert(ActivityLog), rows)
+
+    def _insert_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Ghi lô, trả về số bản ghi đã ghi
+        - Lỗi tạm thời (OperationalError: database bị khóa, mất kết nối) thử lại tối đa WRITE_RETRIES lần
+        - Lỗi khác hoặc hết lượt thử: ghi từng bản ghi để chỉ bỏ bản ghi hỏng
+        """
+        for attempt in range(1, self.WRITE_RETRIES + 1):
+            try:
+                self._insert(batch)
+                return len(batch)
+            except OperationalError:
+                if attempt == self.WRITE_RETRIES:
+                    break
+                time.sleep(self.RETRY_BACKOFF * attempt)
+            except Exception:
+                break
+        logger.warning("Ghi lô %d activity log lỗi, ghi lại từng bản ghi", len(batch), exc_info=True)
+
+        written = 0
+        for record in batch:
+            try:
+                self._insert([record])
+                written += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Bỏ activity log không ghi được: %s", record)
+        return written
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                written = self._insert_batch(batch)
+                self.written += written
+                if written:
+                    # Thống kê activity đã cache không còn đúng
+                    response_cache.invalidate_threadsafe(ACTIVITY_TAG)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._write(self._collect(block=True))
+
+    def flush(self):
+        """
+        Ghi ngay mọi bản ghi đang chờ trong hàng đợi
+        - Chờ cả lô mà thread nền đã lấy ra nhưng chưa ghi xong
+        """
+        while True:
+            batch = self._collect(block=False)
+            if not batch:
+                break
+            self._write(batch)
+        self._queue.join()
+
+    def close(self):
+        """
+        Dừng thread nền và ghi nốt các bản ghi còn lại (gọi khi tắt ứng dụng)
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": self._queue.qsize(), "written": self.written, "failed": self.failed}
+
+activity_sink = ActivitySink(
+    engine,
+    batch_size=settings.ACTIVITY_FLUSH_BATCH_SIZE,
+    flush_interval_ms=settings.ACTIVITY_FLUSH_INTERVAL_MS,
+)
+
 def log_activity(
     db: Session,
     user_id: int,
     action: str,
     entity_type: str,
     entity_id: int,
-    details: Optional[Dict[str, Any]] = None
+    details: Optional[Dict[str, Any]] = None,
+    same_transaction: bool = False,
+    project_id: Optional[int] = None
 ):
     """
-    Ghi log hoạt động vào database
+    Ghi log hoạt động
+    - Mặc định đưa vào activity_sink để ghi theo lô, không commit trong request
+    - same_transaction=True: thêm vào session của caller, được commit cùng thay đổi chính
+    - project_id: project của issue, để activity hiện trên timeline của project
     """
-    log = ActivityLog(
+    record = dict(
         user_id=user_id,
         action=action,
         entity_type=entity_type,
         entity_id=entity_id,
-        details=details
+        details=details,
+        project_id=project_id,
+        created_at=datetime.utcnow()
     )
-    db.add(log)
-    db.commit()
+    if same_transaction:
+        db.add(ActivityLog(**record))
+    else:
+        activity_sink.enqueue(record)
+
+def log_activities(
+    db: Session,
+    user_id: int,
+    entries: List[Dict[str, Any]],
+    same_transaction: bool = False
+):
+    """
+    Ghi nhiều log cùng lúc (thao tác hàng loạt)
+    - entries: các dict gồm action, entity_type, entity_id và tùy chọn details, project_id
+    - same_transaction=True: thêm tất cả vào session của caller, được ghi bằng một INSERT nhiều dòng khi flush
+    """
+    now = datetime.utcnow()
+    records = [
+        dict(
+            user_id=user_id,
+            action=entry["action"],
+            entity_type=entry["entity_type"],
+            entity_id=entry["entity_id"],
+            details=entry.get("details"),
+            project_id=entry.get("project_id"),
+            created_at=now
+        )
+        for entry in entries
+    ]
+    if same_transaction:
+        db.add_all([ActivityLog(**record) for record in records])
+    else:
+        for record in records:
+            activity_sink.enqueue(record)
 
 def get_recent_activities(db: Session, limit: int = 50, skip: int = 0):
     """
@@ -53,6 +239,15 @@ def get_entity_activities(db: Session, entity_type: str, entity_id: int, limit:
         .order_by(ActivityLog.created_at.desc())\
         .limit(limit).all()
 
+def get_project_activities(db: Session, project_id: int, limit: int = 30, cursor: Optional[str] = None):
+    """
+    Lấy timeline của một project theo keyset (created_at, id), dư 1 bản ghi cho next_page
+    - Dùng index (project_id, created_at, id) nên chi phí chỉ phụ thuộc kích thước trang
+    """
+    query = select(ActivityLog).where(ActivityLog.project_id == project_id)
+    query = apply_keyset(query, ActivityLog.created_at, ActivityLog.id, limit=limit, cursor=cursor)
+    return db.scalars(query).all()
+
 def search_activities(
     db: Session,
     user_id: Optional[int] = None,
@@ -91,24 +286,23 @@ def get_activity_stats(db: Session, days: int = 7):
     Thống kê hoạt động trong N ngày gần nhất
     """
     from datetime import timedelta
-    import json
     
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
     # Hoạt động theo ngày
     daily_stats = db.query(
-        db.func.date(ActivityLog.created_at).label('date'),
-        db.func.count(ActivityLog.id).label('count')
+        func.date(ActivityLog.created_at).label('date'),
+        func.count(ActivityLog.id).label('count')
     ).filter(
         ActivityLog.created_at >= start_date,
         ActivityLog.created_at <= end_date
-    ).group_by(db.func.date(ActivityLog.created_at)).all()
+    ).group_by(func.date(ActivityLog.created_at)).all()
     
     # Hoạt động theo loại
     type_stats = db.query(
         ActivityLog.entity_type,
-        db.func.count(ActivityLog.id).label('count')
+        func.count(ActivityLog.id).label('count')
     ).filter(
         ActivityLog.created_at >= start_date,
         ActivityLog.created_at <= end_date
@@ -117,7 +311,7 @@ def get_activity_stats(db: Session, days: int = 7):
     # Hoạt động theo hành động
     action_stats = db.query(
         ActivityLog.action,
-        db.func.count(ActivityLog.id).label('count')
+        func.count(ActivityLog.id).label('count')
     ).filter(
         ActivityLog.created_at >= start_date,
         ActivityLog.created_at <= end_date
@@ -126,12 +320,12 @@ def get_activity_stats(db: Session, days: int = 7):
     # Top users hoạt động nhiều nhất
     top_users = db.query(
         ActivityLog.user_id,
-        db.func.count(ActivityLog.id).label('count')
+        func.count(ActivityLog.id).label('count')
     ).filter(
         ActivityLog.created_at >= start_date,
         ActivityLog.created_at <= end_date
     ).group_by(ActivityLog.user_id)\
-     .order_by(db.func.count(ActivityLog.id).desc())\
+     .order_by(func.count(ActivityLog.id).desc())\
      .limit(10).all()
     
     return {
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Hashable, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.core.config import settings
+from app.models.models import User
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Thông tin user đã xác thực, không gắn với session nên có thể cache giữa các request
+    """
+    id: int
+    username: str
+    email: Optional[str]
+    full_name: Optional[str]
+    role: Optional[str]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            created_at=user.created_at,
+        )
+
+class TTLLRUCache:
+    """
+    Cache có giới hạn số phần tử (LRU) và thời gian sống (TTL), an toàn giữa các thread
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Tăng sau mỗi lần xóa phần tử: set() với generation cũ bị bỏ qua
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None):
+        """
+        Lưu giá trị; generation: giá trị self.generation lúc bắt đầu đọc dữ liệu gốc
+        - Có phần tử bị xóa từ lúc đó (dữ liệu gốc có thể đã đổi) thì không lưu
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+# Cache user đã xác thực theo user_id
+# Mỗi process có cache riêng: thay đổi từ process khác có hiệu lực sau tối đa AUTH_CACHE_TTL giây
+user_cache = TTLLRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+def invalidate_user(user_id: int):
+    """
+    Xóa user khỏi cache (khi role hoặc thông tin user thay đổi)
+    """
+    user_cache.pop(user_id)
+
+# User thay đổi trong transaction chưa commit: id được ghi lại khi flush, xóa khỏi cache sau commit
+# (xóa lúc flush thì request khác có thể cache lại bản cũ trước khi commit xong)
+PENDING_KEY = "invalidate_users"
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # Áp dụng cho mọi thay đổi qua ORM (session sync lẫn async)
+    object_session(target).info.setdefault(PENDING_KEY, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop(PENDING_KEY, ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, event, exists, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+from app.core.thumbnails import thumbnail_path
+from app.db.session import engine
+from app.models.models import Attachment, Blob
+
+logger = logging.getLogger("taskflow.blobs")
+
+# Đếm tham chiếu blob theo content_hash, trong cùng transaction với attachment
+# - Thêm attachment: refcount + 1 (khóa dòng blob) trước khi chuyển file vào store, commit sau cùng
+# - Xóa attachment: refcount - 1; về 0 thì xóa dòng blob, còn file chỉ được ghi nhớ trong session.info
+# - Sau commit, BlobCleaner xóa file ở thread nền nếu blob vẫn không có ai dùng;
+#   rollback thì bỏ danh sách, file còn nguyên cho các attachment được giữ lại
+
+# Blob chờ xóa file của một session: content_hash -> (đường dẫn file, mime_type)
+PENDING_KEY = "blob_cleanup"
+
+def _acquire(connection, content_hash: str):
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = upsert(Blob).values(content_hash=content_hash, refcount=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["content_hash"],
+            set_={"refcount": Blob.refcount + 1}
+        )
+        connection.execute(stmt)
+        return
+
+    updated = connection.execute(
+        update(Blob).where(Blob.content_hash == content_hash).values(refcount=Blob.refcount + 1)
+    ).rowcount
+    if not updated:
+        connection.execute(insert(Blob).values(content_hash=content_hash, refcount=1))
+
+def _release(connection, content_hash: str) -> bool:
+    """
+    Bỏ một tham chiếu, trả về True nếu blob không còn attachment nào dùng
+    """
+    connection.execute(
+        update(Blob).where(Blob.content_hash == content_hash).values(refcount=Blob.refcount - 1)
+    )
+    refcount = connection.scalar(select(Blob.refcount).where(Blob.content_hash == content_hash))
+    if refcount is None:
+        # Không có dòng đếm (dữ liệu lệch): chỉ xóa khi chắc chắn không còn attachment nào
+        return not connection.scalar(select(exists().where(Attachment.content_hash == content_hash)))
+    if refcount > 0:
+        return False
+    connection.execute(delete(Blob).where(Blob.content_hash == content_hash))
+    return True
+
+def _claim_unused(connection, content_hash: str) -> bool:
+    """
+    Tạo dòng blob refcount 0 để giữ khóa trong lúc xóa file, trả về False nếu blob đã được dùng lại
+    - Upload cùng nội dung phải chờ transaction này kết thúc rồi mới ghi lại file
+    """
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = upsert(Blob).values(content_hash=content_hash, refcount=0)
+        return connection.execute(stmt.on_conflict_do_nothing(index_elements=["content_hash"])).rowcount == 1
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(Blob).values(content_hash=content_hash, refcount=0))
+        return True
+    except IntegrityError:
+        return False
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class BlobCleaner:
+    """
+    Thread nền xóa file của các blob không còn attachment nào dùng, sau khi transaction đã commit
+    - Không chạy trên event loop; một thread là đủ vì chỉ xóa file
+    """
+    def __init__(self, db_engine: Engine):
+        self.engine = db_engine
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.removed = 0
+        self.failed = 0
+
+    def submit(self, pending: Dict[str, Tuple[str, Optional[str]]]) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blob-cleanup")
+            return self._executor.submit(self._remove, pending)
+
+    def _remove(self, pending: Dict[str, Tuple[str, Optional[str]]]):
+        for content_hash, (file_path, mime_type) in pending.items():
+            try:
+                with self.engine.begin() as connection:
+                    if not _claim_unused(connection, content_hash):
+                        continue
+                    _remove_quietly(file_path)
+                    _remove_quietly(thumbnail_path(file_path, mime_type))
+                    connection.execute(delete(Blob).where(Blob.content_hash == content_hash))
+                self.removed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Không xóa được blob %s", content_hash)
+
+    def flush(self):
+        """
+        Chờ các lần xóa đã đưa vào hàng đợi chạy xong
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {"removed": self.removed, "failed": self.failed}
+
+blob_cleaner = BlobCleaner(engine)
+
+@event.listens_for(Attachment, "after_insert")
+def _blob_after_insert(mapper, connection, target):
+    if target.content_hash:
+        _acquire(connection, target.content_hash)
+
+@event.listens_for(Attachment, "after_delete")
+def _blob_after_delete(mapper, connection, target):
+    # Áp dụng cả khi attachment bị xóa theo issue/project (cascade qua ORM)
+    if target.content_hash and _release(connection, target.content_hash):
+        pending = object_session(target).info.setdefault(PENDING_KEY, {})
+        pending[target.content_hash] = (target.file_path, target.mime_type)
+
+@event.listens_for(Session, "after_commit")
+def _remove_after_commit(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        blob_cleaner.submit(pending)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+from fastapi.encoders import jsonable_encoder
+from app.core.auth_cache import TTLLRUCache
+from app.core.config import Settings, settings
+
+logger = logging.getLogger("taskflow.cache")
+
+# Tag của dữ liệu được cache, bị vô hiệu khi dữ liệu nguồn thay đổi
+PROJECTS_TAG = "projects"
+ISSUES_TAG = "issues"
+LABELS_TAG = "labels"
+LABEL_USAGE_TAG = "label_usage"
+ACTIVITY_TAG = "activity"
+
+class InMemoryCacheBackend:
+    """
+    Cache trong process (mặc định): LRU + TTL theo từng key, version của tag lưu trong dict
+    """
+    name = "memory"
+    thread_safe = True
+
+    def __init__(self, maxsize: int):
+        self._entries = TTLLRUCache(maxsize=maxsize, ttl=0)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries.set(key, value, ttl=ttl)
+
+    async def tag_versions(self, tags: Sequence[str]) -> List[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    async def bump(self, tags: Sequence[str]):
+        self.bump_now(tags)
+
+    def bump_now(self, tags: Sequence[str]):
+        # Gọi được từ thread khác (vd. thread ghi activity log)
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    async def close(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+class RedisCacheBackend:
+    """
+    Cache dùng chung giữa các worker/replica qua Redis
+    - Giá trị lưu dạng JSON với TTL (PX), version của tag là các key đếm INCR
+    """
+    name = "redis"
+    thread_safe = False
+
+    def __init__(self, url: str, prefix: str, client=None):
+        self.url = url
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(self.prefix + key, json.dumps(value), px=max(int(ttl * 1000), 1))
+
+    async def tag_versions(self, tags: Sequence[str]) -> List[int]:
+        if not tags:
+            return []
+        values = await self.client.mget([self._tag_key(tag) for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def bump(self, tags: Sequence[str]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self._tag_key(tag))
+            await pipe.execute()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {"url": self.url, "prefix": self.prefix}
+
+class ResponseCache:
+    """
+    Cache kết quả của các endpoint đọc nhiều
+    - Key gắn với version hiện tại của các tag: invalidate(tag) tăng version nên mọi key cũ
+      của tag đó không còn được đọc tới (tự hết hạn theo TTL/LRU)
+    - Single-flight: trong một process, các request cùng trượt cache một key chỉ chạy loader một lần
+    - Lỗi của backend không làm hỏng request: ghi log rồi đọc thẳng database
+    """
+    def __init__(self, backend, default_ttl: float):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def start(self):
+        # Event loop dùng cho invalidate_threadsafe
+        self._loop = asyncio.get_running_loop()
+
+    async def close(self):
+        await self.backend.close()
+        self._loop = None
+
+    @staticmethod
+    def _versioned_key(key: str, tags: Sequence[str], versions: List[int]) -> str:
+        if not tags:
+            return key
+        return key + "|" + ",".join(f"{tag}:{version}" for tag, version in zip(tags, versions))
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Trả về giá trị đã cache của key, trượt cache thì gọi loader rồi lưu lại
+        - Giá trị được chuyển sang dạng JSON (jsonable_encoder) trước khi lưu
+        """
+        tags = sorted(tags)
+        try:
+            full_key = self._versioned_key(key, tags, await self.backend.tag_versions(tags))
+            cached = await self.backend.get(full_key)
+        except Exception:
+            self.errors += 1
+            logger.exception("Không đọc được cache %s", key)
+            return jsonable_encoder(await loader())
+
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        pending = self._inflight.get(full_key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        # Tránh cảnh báo "exception was never retrieved" khi không có request nào chờ
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[full_key] = future
+        try:
+            value = jsonable_encoder(await loader())
+            try:
+                await self.backend.set(full_key, value, self.default_ttl if ttl is None else ttl)
+            except Exception:
+                self.errors += 1
+                logger.exception("Không ghi được cache %s", key)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            self._inflight.pop(full_key, None)
+
+    async def invalidate(self, *tags: str):
+        """
+        Vô hiệu mọi key gắn với các tag (gọi sau khi commit thay đổi)
+        """
+        if not tags:
+            return
+        try:
+            await self.backend.bump(tags)
+        except Exception:
+            self.errors += 1
+            logger.exception("Không vô hiệu được cache %s", tags)
+
+    def invalidate_threadsafe(self, *tags: str):
+        """
+        invalidate() cho code chạy ngoài event loop (vd. thread ghi activity log)
+        """
+        if self.backend.thread_safe:
+            self.backend.bump_now(tags)
+        elif self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.invalidate(*tags), self._loop)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+def create_cache_backend(config: Settings = settings):
+    """
+    Tạo backend cache theo cấu hình CACHE_BACKEND (memory | redis)
+    """
+    if config.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(url=config.REDIS_URL, prefix=config.CACHE_KEY_PREFIX)
+    if config.CACHE_BACKEND != "memory":
+        raise ValueError(f"CACHE_BACKEND không hợp lệ: {config.CACHE_BACKEND}")
+    return InMemoryCacheBackend(maxsize=config.CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(create_cache_backend(), default_ttl=settings.CACHE_DEFAULT_TTL)
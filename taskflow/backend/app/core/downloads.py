@@ -0,0 +1,198 @@
+import calendar
+import os
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+# Blob theo nội dung không bao giờ thay đổi nên client được cache lâu dài
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# File cũ (không có hash): client phải hỏi lại server trước khi dùng bản cache
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+class RangeNotSatisfiable(Exception):
+    """
+    Header Range không nằm trong kích thước file
+    """
+
+def http_date(value: datetime) -> str:
+    """
+    Định dạng datetime (UTC, có thể naive) theo chuẩn HTTP-date
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return formatdate(calendar.timegm(value.timetuple()), usegmt=True)
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # So sánh yếu theo RFC 9110: bỏ tiền tố W/
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Kiểm tra If-None-Match / If-Modified-Since, True nếu client đã có bản mới nhất
+    - If-None-Match được ưu tiên, khi có thì bỏ qua If-Modified-Since
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    since = _parse_http_date(if_modified_since)
+    if since is None:
+        return False
+    modified = _parse_http_date(http_date(last_modified))
+    return modified <= since
+
+def parse_range(request: Request, size: int, etag: str, last_modified: datetime) -> Optional[Tuple[int, int]]:
+    """
+    Đọc header Range, trả về (start, end) bao gồm cả end hoặc None nếu gửi cả file
+    - Chỉ hỗ trợ một khoảng "bytes=", nhiều khoảng hoặc sai cú pháp thì gửi cả file
+    - If-Range không khớp ETag/Last-Modified thì gửi cả file
+    """
+    header = request.headers.get("range")
+    if not header or request.method not in ("GET", "HEAD"):
+        return None
+
+    if_range = request.headers.get("if-range")
+    if if_range is not None:
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            if if_range != etag:
+                return None
+        elif if_range != http_date(last_modified):
+            return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if start >= size:
+                raise RangeNotSatisfiable()
+            if start > end:
+                return None
+        else:
+            # bytes=-N: N byte cuối cùng
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+class RangeFileResponse(FileResponse):
+    """
+    FileResponse chỉ gửi đoạn [start, end] của file với status 206
+    """
+    def __init__(self, path: str, start: int, end: int, size: int, **kwargs):
+        super().__init__(path, status_code=206, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        remaining = 0 if self.send_header_only else self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining != 0 or self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+def file_download_response(
+    request: Request,
+    path: str,
+    stat_result: os.stat_result,
+    filename: str,
+    media_type: Optional[str],
+    etag: str,
+    last_modified: datetime,
+    cache_control: str,
+    content_disposition_type: str = "attachment"
+) -> Response:
+    """
+    Tạo response download hỗ trợ Range: 200 cả file, 206 một đoạn hoặc 416
+    """
+    headers = {
+        "etag": etag,
+        "last-modified": http_date(last_modified),
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+    size = stat_result.st_size
+    try:
+        byte_range = parse_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        headers["content-range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(
+            path=path,
+            filename=filename,
+            media_type=media_type,
+            headers=headers,
+            stat_result=stat_result,
+            method=request.method,
+            content_disposition_type=content_disposition_type
+        )
+    return RangeFileResponse(
+        path,
+        start=byte_range[0],
+        end=byte_range[1],
+        size=size,
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result,
+        method=request.method,
+        content_disposition_type=content_disposition_type
+    )
+
+def not_modified_response(etag: str, last_modified: datetime, cache_control: str) -> Response:
+    return Response(status_code=304, headers={
+        "etag": etag,
+        "last-modified": http_date(last_modified),
+        "cache-control": cache_control,
+    })
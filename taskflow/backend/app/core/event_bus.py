@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+from typing import Callable, List, Optional, Tuple
+from app.core.config import Settings, settings
+
+logger = logging.getLogger("taskflow.event_bus")
+
+# Hàm phát sự kiện tới các WebSocket trong process: deliver(text, topics)
+DeliverFn = Callable[[str, Optional[List[str]]], None]
+
+class InMemoryEventBus:
+    """
+    Bus trong process (mặc định): phát sự kiện thẳng tới các connection của worker hiện tại
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._deliver: Optional[DeliverFn] = None
+        self.published = 0
+
+    async def start(self, deliver: DeliverFn):
+        self._deliver = deliver
+
+    async def publish(self, text: str, topics: Optional[List[str]] = None):
+        self.published += 1
+        if self._deliver is not None:
+            self._deliver(text, topics)
+
+    async def stop(self):
+        self._deliver = None
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "published": self.published}
+
+class RedisEventBus:
+    """
+    Bus qua Redis pub/sub để mọi worker/replica cùng nhận sự kiện
+    - Các sự kiện được gom thành batch (theo số lượng hoặc thời gian) rồi PUBLISH một lần
+    - Mỗi worker subscribe channel và phát lại sự kiện cho các connection của mình
+    """
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str,
+        channel: str,
+        batch_size: int = 100,
+        batch_interval_ms: int = 5,
+        client=None
+    ):
+        self.url = url
+        self.channel = channel
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval_ms / 1000
+        self._client = client
+        self._pubsub = None
+        self._deliver: Optional[DeliverFn] = None
+        self._pending: List[Tuple[str, Optional[List[str]]]] = []
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+        self.published = 0
+        self.batches = 0
+        self.received = 0
+        self.errors = 0
+
+    async def start(self, deliver: DeliverFn):
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url)
+        self._deliver = deliver
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._tasks = [
+            asyncio.create_task(self._reader()),
+            asyncio.create_task(self._flusher()),
+        ]
+
+    async def publish(self, text: str, topics: Optional[List[str]] = None):
+        self._pending.append((text, list(topics) if topics is not None else None))
+        self.published += 1
+        self._wakeup.set()
+
+    async def _flusher(self):
+        while True:
+            await self._wakeup.wait()
+            # Chờ thêm một khoảng ngắn để gom các sự kiện đến liền nhau
+            if len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.batch_interval)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            payload = json.dumps([{"m": text, "t": topics} for text, topics in batch])
+            try:
+                await self._client.publish(self.channel, payload)
+                self.batches += 1
+            except Exception:
+                # Redis lỗi: ít nhất các client của worker này vẫn nhận được sự kiện
+                self.errors += 1
+                logger.exception("Không publish được sự kiện lên Redis")
+                for text, topics in batch:
+                    self._deliver(text, topics)
+
+    async def _reader(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    for item in json.loads(message["data"]):
+                        self.received += 1
+                        self._deliver(item["m"], item["t"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.exception("Lỗi khi đọc sự kiện từ Redis, thử lại sau 1 giây")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        await self._flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+        await self._client.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "channel": self.channel,
+            "published": self.published,
+            "batches": self.batches,
+            "received": self.received,
+            "pending": len(self._pending),
+            "errors": self.errors,
+        }
+
+def create_event_bus(config: Settings = settings):
+    """
+    Tạo event bus theo cấu hình EVENT_BUS_BACKEND (memory | redis)
+    """
+    if config.EVENT_BUS_BACKEND == "redis":
+        return RedisEventBus(
+            url=config.REDIS_URL,
+            channel=config.EVENT_BUS_CHANNEL,
+            batch_size=config.EVENT_BUS_BATCH_SIZE,
+            batch_interval_ms=config.EVENT_BUS_BATCH_INTERVAL_MS,
+        )
+    if config.EVENT_BUS_BACKEND != "memory":
+        raise ValueError(f"EVENT_BUS_BACKEND không hợp lệ: {config.EVENT_BUS_BACKEND}")
+    return InMemoryEventBus()
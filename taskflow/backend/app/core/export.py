@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Tuple
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.models import ActivityLog
+
+# Số dòng lấy từ cursor mỗi lần và kích thước tối thiểu của một chunk gửi đi
+EXPORT_YIELD_PER = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+CSV_HEADER = ["ID", "Action", "Entity Type", "Entity ID", "User ID", "Details", "Created At"]
+
+def iter_activity_rows(start_date: datetime, end_date: datetime, yield_per: int = EXPORT_YIELD_PER) -> Iterator[Tuple]:
+    """
+    Đọc activity log trong khoảng thời gian theo từng lô qua server-side cursor
+    - Dùng session riêng vì generator chạy sau khi handler đã trả response
+    - Chỉ lấy cột cần thiết, không tạo ORM object
+    """
+    stmt = select(
+        ActivityLog.id,
+        ActivityLog.action,
+        ActivityLog.entity_type,
+        ActivityLog.entity_id,
+        ActivityLog.user_id,
+        ActivityLog.details,
+        ActivityLog.created_at,
+    ).where(
+        ActivityLog.created_at >= start_date,
+        ActivityLog.created_at <= end_date
+    ).order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())
+
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=yield_per))
+        for row in result:
+            yield tuple(row)
+
+def _row_to_dict(row: Tuple) -> Dict[str, Any]:
+    row_id, action, entity_type, entity_id, user_id, details, created_at = row
+    return {
+        "id": row_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "user_id": user_id,
+        "details": details,
+        "created_at": created_at.isoformat(),
+    }
+
+def _buffered(pieces: Iterable[str], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Gom các mảnh nhỏ thành chunk khoảng chunk_size byte trước khi gửi
+    """
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+def csv_chunks(rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """
+    Ghi CSV từng dòng, bộ nhớ không phụ thuộc số dòng
+    """
+    def pieces():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(CSV_HEADER)
+        for row_id, action, entity_type, entity_id, user_id, details, created_at in rows:
+            writer.writerow([
+                row_id,
+                action,
+                entity_type,
+                entity_id,
+                user_id,
+                str(details) if details else "",
+                created_at.isoformat()
+            ])
+            if output.tell() >= EXPORT_CHUNK_SIZE:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+    return _buffered(pieces())
+
+def ndjson_chunks(rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """
+    Mỗi activity là một dòng JSON
+    """
+    return _buffered(json.dumps(_row_to_dict(row), ensure_ascii=False) + "\n" for row in rows)
+
+def json_chunks(rows: Iterable[Tuple], start_date: datetime, end_date: datetime) -> Iterator[bytes]:
+    """
+    Giữ định dạng JSON cũ nhưng ghi dần mảng activities
+    - total_records đặt cuối object vì chỉ biết sau khi đọc hết
+    """
+    def pieces():
+        header = {
+            "export_date": datetime.utcnow().isoformat(),
+            "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
+        }
+        yield json.dumps(header, ensure_ascii=False)[:-1] + ', "activities": ['
+        total = 0
+        for row in rows:
+            yield ("," if total else "") + json.dumps(_row_to_dict(row), ensure_ascii=False)
+            total += 1
+        yield f'], "total_records": {total}}}'
+    return _buffered(pieces())
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Nén gzip từng chunk khi đang stream
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,175 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.models import Issue, IssueCounter
+
+# user_id dùng cho thống kê toàn hệ thống
+GLOBAL_SCOPE = 0
+
+# Các status luôn có mặt trong kết quả thống kê (kể cả khi bằng 0)
+DEFAULT_STATUSES = ["To Do", "In Progress", "Done"]
+
+def snapshot_issue(issue: Issue) -> Dict:
+    """
+    Chụp lại các trường ảnh hưởng tới thống kê của một issue
+    """
+    return {
+        "project_id": issue.project_id or 0,
+        "status": issue.status or "",
+        "priority": issue.priority or "",
+        "creator_id": issue.creator_id,
+        "assignee_id": issue.assignee_id,
+    }
+
+def _scopes(snapshot: Dict):
+    """
+    Các phạm vi thống kê mà issue được tính vào: toàn hệ thống, creator và assignee
+    """
+    users = {GLOBAL_SCOPE}
+    for user_id in (snapshot["creator_id"], snapshot["assignee_id"]):
+        if user_id:
+            users.add(user_id)
+    return users
+
+def _deltas(old: Optional[Dict], new: Optional[Dict]) -> Counter:
+    deltas = Counter()
+    for snapshot, sign in ((old, -1), (new, 1)):
+        if snapshot is None:
+            continue
+        for user_id in _scopes(snapshot):
+            key = (user_id, snapshot["project_id"], snapshot["status"], snapshot["priority"])
+            deltas[key] += sign
+    return deltas
+
+def _bump(db: Session, key: Tuple[int, int, str, str], delta: int):
+    """
+    Cộng delta vào một dòng thống kê (upsert nguyên tử trong transaction hiện tại)
+    """
+    user_id, project_id, status, priority = key
+    values = dict(user_id=user_id, project_id=project_id, status=status, priority=priority, count=delta)
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(IssueCounter).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "project_id", "status", "priority"],
+            set_={"count": IssueCounter.count + stmt.excluded.count}
+        )
+        db.execute(stmt)
+        return
+
+    updated = db.query(IssueCounter).filter(
+        IssueCounter.user_id == user_id,
+        IssueCounter.project_id == project_id,
+        IssueCounter.status == status,
+        IssueCounter.priority == priority
+    ).update({IssueCounter.count: IssueCounter.count + delta}, synchronize_session=False)
+    if not updated:
+        db.add(IssueCounter(**values))
+        db.flush()
+
+def apply_issue_change(db: Session, old: Optional[Dict], new: Optional[Dict]):
+    """
+    Cập nhật bảng thống kê khi issue được tạo (old=None), sửa, hoặc xóa (new=None)
+    - Không commit, thay đổi nằm chung transaction với thao tác trên issue
+    """
+    for key, delta in _deltas(old, new).items():
+        if delta:
+            _bump(db, key, delta)
+
+def apply_issue_changes(db: Session, changes: Iterable[Tuple[Optional[Dict], Optional[Dict]]]):
+    """
+    Như apply_issue_change cho nhiều issue: cộng dồn delta trước rồi mỗi dòng thống kê chỉ upsert một lần
+    """
+    deltas = Counter()
+    for old, new in changes:
+        deltas.update(_deltas(old, new))
+    for key, delta in deltas.items():
+        if delta:
+            _bump(db, key, delta)
+
+def drop_project_counters(db: Session, project_id: int):
+    """
+    Xóa thống kê của project (dùng khi xóa project kéo theo xóa issues)
+    """
+    db.query(IssueCounter).filter(IssueCounter.project_id == project_id)\
+        .delete(synchronize_session=False)
+
+def rebuild_issue_counters(db: Session):
+    """
+    Tính lại toàn bộ bảng thống kê từ bảng issues
+    """
+    db.query(IssueCounter).delete(synchronize_session=False)
+
+    columns = (
+        func.coalesce(Issue.project_id, 0),
+        func.coalesce(Issue.status, ""),
+        func.coalesce(Issue.priority, ""),
+    )
+    totals = Counter()
+
+    for row in db.query(*columns, func.count(Issue.id)).group_by(*columns).all():
+        totals[(GLOBAL_SCOPE, row[0], row[1], row[2])] += row[3]
+
+    for row in db.query(Issue.creator_id, *columns, func.count(Issue.id))\
+            .filter(Issue.creator_id.isnot(None))\
+            .group_by(Issue.creator_id, *columns).all():
+        totals[(row[0], row[1], row[2], row[3])] += row[4]
+
+    # Issue tự gán cho creator chỉ được tính một lần
+    for row in db.query(Issue.assignee_id, *columns, func.count(Issue.id))\
+            .filter(
+                Issue.assignee_id.isnot(None),
+                (Issue.creator_id.is_(None)) | (Issue.creator_id != Issue.assignee_id)
+            )\
+            .group_by(Issue.assignee_id, *columns).all():
+        totals[(row[0], row[1], row[2], row[3])] += row[4]
+
+    db.bulk_insert_mappings(IssueCounter, [
+        dict(user_id=key[0], project_id=key[1], status=key[2], priority=key[3], count=count)
+        for key, count in totals.items()
+    ])
+    db.commit()
+
+def ensure_issue_counters(db: Session):
+    """
+    Khởi tạo bảng thống kê cho database đã có dữ liệu từ trước
+    """
+    has_counters = db.query(IssueCounter.user_id).first() is not None
+    has_issues = db.query(Issue.id).first() is not None
+    if has_issues and not has_counters:
+        rebuild_issue_counters(db)
+
+def get_issue_stats(db: Session, user_id: int = GLOBAL_SCOPE) -> Dict:
+    """
+    Đọc thống kê issues của một phạm vi bằng một truy vấn duy nhất
+    """
+    rows = db.query(
+        IssueCounter.project_id,
+        IssueCounter.status,
+        IssueCounter.priority,
+        IssueCounter.count
+    ).filter(
+        IssueCounter.user_id == user_id,
+        IssueCounter.count > 0
+    ).all()
+
+    by_status = {status: 0 for status in DEFAULT_STATUSES}
+    by_priority = {}
+    by_project = {}
+    total = 0
+    for project_id, status, priority, count in rows:
+        total += count
+        by_status[status] = by_status.get(status, 0) + count
+        by_priority[priority] = by_priority.get(priority, 0) + count
+        by_project[project_id] = by_project.get(project_id, 0) + count
+
+    return {
+        "total_issues": total,
+        "issues_by_status": by_status,
+        "issues_by_priority": by_priority,
+        "issues_by_project": by_project,
+    }
@@ -0,0 +1,148 @@
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, delete, event, insert, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+from app.models.label import Label, issue_labels
+from app.models.models import Issue
+
+# -------- Tìm label theo tên (typeahead) --------
+
+# prefix: dùng index ix_labels_name_normalized | contains: khớp giữa tên, quét bảng
+LABEL_MATCH_MODES = ("contains", "prefix")
+
+def normalize_label_name(name: Optional[str]) -> Optional[str]:
+    """
+    Dạng so khớp của tên label: chữ thường, bỏ dấu ("Lỗi" -> "loi")
+    - Phải giống hàm cùng tên trong migration 0007
+    """
+    if name is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", name.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+@event.listens_for(Label.name, "set")
+def _sync_name_normalized(target, value, oldvalue, initiator):
+    # Mọi lần gán name qua ORM (tạo hoặc đổi tên) đều cập nhật name_normalized
+    target.name_normalized = normalize_label_name(value)
+
+def label_name_filter(search: str, match: str = "contains") -> ColumnElement:
+    """
+    Điều kiện lọc label theo tên, không phân biệt hoa thường và dấu
+    - prefix: khoảng [term, term kế tiếp) đọc theo index, LIKE 'term%' chỉ lọc lại trong khoảng đó
+    """
+    term = normalize_label_name(search)
+    if not term:
+        return true()
+    column = Label.name_normalized
+    if match == "prefix":
+        upper = term[:-1] + chr(ord(term[-1]) + 1)
+        return and_(column >= term, column < upper, column.startswith(term, autoescape=True))
+    return column.contains(term, autoescape=True)
+
+def project_label_ids(project_id: int) -> Select:
+    """
+    Subquery id các label đang gắn trên issues của project
+    - Đọc issues theo index (project_id, ...) rồi issue_labels theo khóa chính (issue_id, label_id)
+    """
+    return (
+        select(issue_labels.c.label_id)
+        .join(Issue, Issue.id == issue_labels.c.issue_id)
+        .where(Issue.project_id == project_id)
+    )
+
+def issue_label_ids(issue_id: int) -> Select:
+    """
+    Subquery id các label đang gắn trên issue
+    """
+    return select(issue_labels.c.label_id).where(issue_labels.c.issue_id == issue_id)
+
+# -------- Gắn/gỡ label theo tập hợp --------
+
+# Mỗi bước là một câu lệnh cho cả batch
+# thay vì một truy vấn cho từng (issue, label)
+
+def unique_ids(ids: Iterable[int]) -> List[int]:
+    """
+    Bỏ id trùng, giữ nguyên thứ tự
+    """
+    return list(dict.fromkeys(ids))
+
+async def resolve_labels(db: AsyncSession, label_ids: Iterable[int]) -> Dict[int, Label]:
+    """
+    Lấy các label theo id bằng một truy vấn IN
+    """
+    label_ids = unique_ids(label_ids)
+    if not label_ids:
+        return {}
+    labels = await db.scalars(select(Label).where(Label.id.in_(label_ids)))
+    return {label.id: label for label in labels}
+
+async def existing_links(
+    db: AsyncSession,
+    issue_ids: Iterable[int],
+    label_ids: Iterable[int]
+) -> Set[Tuple[int, int]]:
+    """
+    Các cặp (issue_id, label_id) đã được gắn, trong phạm vi issue_ids x label_ids
+    """
+    issue_ids, label_ids = unique_ids(issue_ids), unique_ids(label_ids)
+    if not issue_ids or not label_ids:
+        return set()
+    rows = await db.execute(
+        select(issue_labels.c.issue_id, issue_labels.c.label_id).where(
+            issue_labels.c.issue_id.in_(issue_ids),
+            issue_labels.c.label_id.in_(label_ids)
+        )
+    )
+    return {(issue_id, label_id) for issue_id, label_id in rows}
+
+# Số cặp mỗi INSERT nhiều dòng: 3 tham số mỗi dòng (kèm created_at), dưới giới hạn 999 tham số của SQLite cũ
+LINK_INSERT_BATCH = 300
+
+async def link_labels(
+    db: AsyncSession,
+    issue_ids: Iterable[int],
+    label_ids: Iterable[int]
+) -> List[Tuple[int, int]]:
+    """
+    Gắn mọi label vào mọi issue, bỏ qua các cặp đã có
+    - Một truy vấn tìm cặp đã có, một INSERT ... VALUES nhiều dòng cho mỗi LINK_INSERT_BATCH cặp mới
+    - Không commit; trả về các cặp mới được gắn
+    """
+    issue_ids, label_ids = unique_ids(issue_ids), unique_ids(label_ids)
+    existing = await existing_links(db, issue_ids, label_ids)
+    new_links = [
+        (issue_id, label_id)
+        for issue_id in issue_ids
+        for label_id in label_ids
+        if (issue_id, label_id) not in existing
+    ]
+    for start in range(0, len(new_links), LINK_INSERT_BATCH):
+        batch = new_links[start:start + LINK_INSERT_BATCH]
+        await db.execute(
+            insert(issue_labels).values(
+                [{"issue_id": issue_id, "label_id": label_id} for issue_id, label_id in batch]
+            )
+        )
+    return new_links
+
+async def unlink_labels(
+    db: AsyncSession,
+    issue_ids: Iterable[int],
+    label_ids: Iterable[int]
+) -> List[Tuple[int, int]]:
+    """
+    Gỡ mọi label khỏi mọi issue bằng một DELETE
+    - Không commit; trả về các cặp đã bị gỡ
+    """
+    issue_ids, label_ids = unique_ids(issue_ids), unique_ids(label_ids)
+    if not issue_ids or not label_ids:
+        return []
+    rows = await db.execute(
+        delete(issue_labels).where(
+            issue_labels.c.issue_id.in_(issue_ids),
+            issue_labels.c.label_id.in_(label_ids)
+        ).returning(issue_labels.c.issue_id, issue_labels.c.label_id)
+    )
+    return [(issue_id, label_id) for issue_id, label_id in rows]
@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Header trả về cursor của trang tiếp theo (body vẫn là danh sách như cũ)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Kích thước trang tối đa của các route phân trang (tham số limit)
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Mã hóa vị trí (created_at, id) thành cursor dạng chuỗi opaque
+    """
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Giải mã cursor, trả về 400 nếu cursor không hợp lệ
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+
+def keyset_filter(created_col, id_col, cursor: str):
+    """
+    Điều kiện lấy các bản ghi đứng sau cursor theo thứ tự (created_at DESC, id DESC)
+    """
+    created_at, row_id = decode_cursor(cursor)
+    return or_(
+        created_col < created_at,
+        and_(created_col == created_at, id_col < row_id)
+    )
+
+def apply_keyset(
+    stmt,
+    created_col,
+    id_col,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """
+    Phân trang theo keyset (created_at, id) khi có cursor, ngược lại dùng offset
+    - Lấy dư 1 bản ghi để biết còn trang sau hay không (xem next_page)
+    """
+    stmt = stmt.order_by(created_col.desc(), id_col.desc())
+    if cursor:
+        stmt = stmt.where(keyset_filter(created_col, id_col, cursor))
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(max(limit, 0) + 1)
+
+def next_page(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Cắt kết quả của apply_keyset về đúng limit và tính cursor cho trang tiếp theo
+    - next_cursor là None ở trang cuối; trang nào còn tiếp cũng có next_cursor,
+      kể cả khi client đang dùng skip, để client cũ có thể chuyển sang chế độ cursor
+    """
+    if limit <= 0:
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
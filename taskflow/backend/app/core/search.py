@@ -0,0 +1,196 @@
+import html
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.auth_cache import CurrentUser
+from app.core.visibility import sees_all_issues
+
+# Ký tự đánh dấu đoạn khớp trong snippet (vùng private use, không xuất hiện trong dữ liệu thật)
+# Sau khi escape HTML mới thay bằng <mark>...</mark>
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+MAX_TERMS = 10
+SNIPPET_TOKENS = 16
+
+_TERM_RE = re.compile(r"\w+\*?", re.UNICODE)
+
+def parse_search_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    Tách từ khóa thành các term (term, prefix)
+    - "abc*" là tìm theo tiền tố; term cuối luôn là tiền tố (gõ tới đâu tìm tới đó)
+    - Chỉ giữ ký tự chữ/số nên an toàn khi ghép vào cú pháp FTS5/tsquery
+    """
+    terms = []
+    for token in _TERM_RE.findall(query)[:MAX_TERMS]:
+        prefix = token.endswith("*")
+        terms.append((token.rstrip("*").lower(), prefix))
+    if terms:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+def fts5_query(terms: List[Tuple[str, bool]]) -> str:
+    return " ".join(f'"{term}"' + ("*" if prefix else "") for term, prefix in terms)
+
+def tsquery(terms: List[Tuple[str, bool]]) -> str:
+    return " & ".join(term + (":*" if prefix else "") for term, prefix in terms)
+
+def render_snippet(snippet: Optional[str]) -> str:
+    """
+    Escape HTML của snippet rồi đánh dấu đoạn khớp bằng <mark>
+    """
+    return html.escape(snippet or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+# Số ký tự mỗi bên đoạn khớp trong snippet của chế độ LIKE
+LIKE_SNIPPET_CHARS = 60
+
+def _like_pattern(term: str) -> str:
+    # Term chỉ gồm chữ/số và "_" (ký tự đại diện của LIKE) nên chỉ cần escape "_"
+    # Dùng "!" làm ký tự escape: "\\" trong chuỗi SQL khác nhau giữa các database
+    return "%" + term.replace("_", "!_") + "%"
+
+def _like_search(columns: List[Tuple[str, float]], terms: List[Tuple[str, bool]], params: dict) -> Tuple[str, str]:
+    """
+    Điều kiện và điểm liên quan cho database không có full-text search (quét bảng bằng LIKE)
+    - Mọi term phải khớp ít nhất một cột; điểm = tổng trọng số các cột khớp
+    """
+    conditions, scores = [], []
+    for index, (term, _) in enumerate(terms):
+        name = f"term_{index}"
+        params[name] = _like_pattern(term)
+        matches = [f"lower(coalesce({column}, '')) LIKE :{name} ESCAPE '!'" for column, _ in columns]
+        conditions.append("(" + " OR ".join(matches) + ")")
+        scores.extend(
+            f"CASE WHEN {match} THEN {weight} ELSE 0 END"
+            for match, (_, weight) in zip(matches, columns)
+        )
+    return " AND ".join(conditions), " + ".join(scores)
+
+def like_snippet(content: Optional[str], terms: List[Tuple[str, bool]]) -> str:
+    """
+    Snippet quanh đoạn khớp đầu tiên, đánh dấu các term bằng MARK_START/MARK_END
+    """
+    content = content or ""
+    lowered = content.lower()
+    positions = [position for position in (lowered.find(term) for term, _ in terms) if position >= 0]
+    if not positions:
+        return content[:2 * LIKE_SNIPPET_CHARS]
+    start = max(min(positions) - LIKE_SNIPPET_CHARS, 0)
+    window = content[start:start + 2 * LIKE_SNIPPET_CHARS + max(len(term) for term, _ in terms)]
+    pattern = re.compile("|".join(re.escape(term) for term, _ in terms), re.IGNORECASE)
+    marked = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, window)
+    return ("…" if start > 0 else "") + marked + ("…" if start + len(window) < len(content) else "")
+
+def _visibility_clause(user: CurrentUser, params: dict) -> str:
+    # Giống read_issues: admin/manager thấy tất cả, user khác tra bảng issue_visibility
+    if sees_all_issues(user):
+        return ""
+    params["user_id"] = user.id
+    return " AND i.id IN (SELECT issue_id FROM issue_visibility WHERE user_id = :user_id)"
+
+def _project_clause(project_id: Optional[int], params: dict) -> str:
+    if project_id is None:
+        return ""
+    params["project_id"] = project_id
+    return " AND i.project_id = :project_id"
+
+async def search_issues(
+    db: AsyncSession,
+    user: CurrentUser,
+    terms: List[Tuple[str, bool]],
+    project_id: Optional[int] = None,
+    limit: int = 20
+) -> List[dict]:
+    """
+    Tìm issues theo title/description, sắp xếp theo độ liên quan (title được ưu tiên)
+    """
+    params = {"limit": limit}
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        params["query"] = fts5_query(terms)
+        sql = f"""
+            SELECT i.id, i.title, i.project_id, i.status,
+                   snippet(issues_fts, -1, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet,
+                   -bm25(issues_fts, 10.0, 1.0) AS rank
+            FROM issues_fts JOIN issues i ON i.id = issues_fts.rowid
+            WHERE issues_fts MATCH :query
+        """
+    elif dialect == "postgresql":
+        params["query"] = tsquery(terms)
+        params["headline"] = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30, MinWords=10"
+        sql = """
+            SELECT i.id, i.title, i.project_id, i.status,
+                   ts_headline('simple', coalesce(i.title, '') || ' ' || coalesce(i.description, ''), q, :headline) AS snippet,
+                   ts_rank(i.search_vector, q) AS rank
+            FROM issues i, to_tsquery('simple', :query) q
+            WHERE i.search_vector @@ q
+        """
+    else:
+        # Database khác: không có index full-text, quét bảng bằng LIKE
+        condition, score = _like_search([("i.title", 10.0), ("i.description", 1.0)], terms, params)
+        sql = f"""
+            SELECT i.id, i.title, i.project_id, i.status,
+                   coalesce(i.title, '') || ' ' || coalesce(i.description, '') AS snippet,
+                   {score} AS rank
+            FROM issues i
+            WHERE {condition}
+        """
+
+    sql += _project_clause(project_id, params) + _visibility_clause(user, params)
+    sql += " ORDER BY rank DESC LIMIT :limit"
+    rows = (await db.execute(text(sql), params)).mappings().all()
+    if dialect not in ("sqlite", "postgresql"):
+        rows = [{**row, "snippet": like_snippet(row["snippet"], terms)} for row in rows]
+    return [{**row, "snippet": render_snippet(row["snippet"])} for row in rows]
+
+async def search_comments(
+    db: AsyncSession,
+    user: CurrentUser,
+    terms: List[Tuple[str, bool]],
+    project_id: Optional[int] = None,
+    limit: int = 20
+) -> List[dict]:
+    """
+    Tìm comments theo nội dung, chỉ trong các issue user được xem
+    """
+    params = {"limit": limit}
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        params["query"] = fts5_query(terms)
+        sql = f"""
+            SELECT c.id, c.issue_id, i.title AS issue_title,
+                   snippet(comments_fts, 0, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet,
+                   -bm25(comments_fts) AS rank
+            FROM comments_fts
+            JOIN comments c ON c.id = comments_fts.rowid
+            JOIN issues i ON i.id = c.issue_id
+            WHERE comments_fts MATCH :query
+        """
+    elif dialect == "postgresql":
+        params["query"] = tsquery(terms)
+        params["headline"] = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30, MinWords=10"
+        sql = """
+            SELECT c.id, c.issue_id, i.title AS issue_title,
+                   ts_headline('simple', c.content, q, :headline) AS snippet,
+                   ts_rank(c.search_vector, q) AS rank
+            FROM comments c JOIN issues i ON i.id = c.issue_id, to_tsquery('simple', :query) q
+            WHERE c.search_vector @@ q
+        """
+    else:
+        # Database khác: không có index full-text, quét bảng bằng LIKE
+        condition, score = _like_search([("c.content", 1.0)], terms, params)
+        sql = f"""
+            SELECT c.id, c.issue_id, i.title AS issue_title,
+                   c.content AS snippet,
+                   {score} AS rank
+            FROM comments c JOIN issues i ON i.id = c.issue_id
+            WHERE {condition}
+        """
+
+    sql += _project_clause(project_id, params) + _visibility_clause(user, params)
+    sql += " ORDER BY rank DESC LIMIT :limit"
+    rows = (await db.execute(text(sql), params)).mappings().all()
+    if dialect not in ("sqlite", "postgresql"):
+        rows = [{**row, "snippet": like_snippet(row["snippet"], terms)} for row in rows]
+    return [{**row, "snippet": render_snippet(row["snippet"])} for row in rows]
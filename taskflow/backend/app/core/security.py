@@ -1,11 +1,14 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.models.models import User
+from app.core.auth_cache import CurrentUser, user_cache
+from app.core.visibility import can_view_issue
 
 # Cấu hình JWT
 SECRET_KEY = "your-secret-key-change-in-production"  # Thay đổi trong môi trường production
@@ -14,18 +17,28 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_current_user(
-    db: Session = Depends(get_db), 
-    token: str = Depends(oauth2_scheme)
-):
+@dataclass(frozen=True)
+class TokenClaims:
     """
-    Lấy thông tin user từ JWT token
+    Các claim đã xác minh chữ ký trong JWT
     """
-    credentials_exception = HTTPException(
+    user_id: int
+    username: str
+    role: Optional[str]
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Không thể xác thực thông tin đăng nhập",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: Optional[str]) -> TokenClaims:
+    """
+    Giải mã và xác minh JWT, không truy cập database
+    """
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -33,21 +46,58 @@ def get_current_user(
         role: str = payload.get("role")
         
         if username is None or user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
+    return TokenClaims(user_id=user_id, username=username, role=role)
+
+async def authenticate_token(db: AsyncSession, token: Optional[str]) -> CurrentUser:
+    """
+    Giải mã JWT và lấy user tương ứng (dùng chung cho HTTP và WebSocket)
+    - Đọc từ cache theo user_id, chỉ truy vấn database khi cache miss
+    """
+    claims = decode_token(token)
     
-    return user
+    current_user = user_cache.get(claims.user_id)
+    if current_user is None:
+        # User bị sửa/xóa trong lúc đang đọc thì không cache bản vừa đọc (có thể đã cũ)
+        generation = user_cache.generation
+        user = await db.get(User, claims.user_id)
+        if user is None:
+            raise _credentials_exception()
+        current_user = CurrentUser.from_user(user)
+        user_cache.set(claims.user_id, current_user, generation=generation)
+    
+    return current_user
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), 
+    token: str = Depends(oauth2_scheme)
+) -> CurrentUser:
+    """
+    Lấy thông tin user từ JWT token
+    """
+    return await authenticate_token(db, token)
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    """
+    Lấy id và role trực tiếp từ JWT đã xác minh, không truy vấn database
+    - Role lấy từ token nên có thể cũ tối đa bằng thời hạn của token
+    """
+    return decode_token(token)
+
+async def can_access_issue(db: AsyncSession, user: CurrentUser, issue_id: int) -> bool:
+    """
+    User có quyền xem issue không (admin/manager hoặc creator/assignee)
+    """
+    return await can_view_issue(db, user, issue_id)
 
 def require_role(required_role: str):
     """
     Decorator để kiểm tra role của user
     """
-    def role_checker(current_user: User = Depends(get_current_user)):
+    async def role_checker(current_user: CurrentUser = Depends(get_current_user)):
         if current_user.role != required_role and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -56,7 +106,7 @@ def require_role(required_role: str):
         return current_user
     return role_checker
 
-def is_admin(current_user: User = Depends(get_current_user)):
+async def is_admin(current_user: CurrentUser = Depends(get_current_user)):
     """
     Kiểm tra user có phải là admin không
     """
@@ -67,7 +117,7 @@ def is_admin(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-def is_manager_or_admin(current_user: User = Depends(get_current_user)):
+async def is_manager_or_admin(current_user: CurrentUser = Depends(get_current_user)):
     """
     Kiểm tra user có phải là manager hoặc admin không
     """
@@ -78,7 +128,7 @@ def is_manager_or_admin(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-def is_member_or_above(current_user: User = Depends(get_current_user)):
+async def is_member_or_above(current_user: CurrentUser = Depends(get_current_user)):
     """
     Kiểm tra user có phải là member trở lên không
     """
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Kích thước mỗi lần đọc/ghi khi lưu file upload
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class FileTooLarge(Exception):
+    """
+    File upload vượt quá kích thước cho phép
+    """
+    def __init__(self, max_size: int):
+        super().__init__(f"File vượt quá {max_size} bytes")
+        self.max_size = max_size
+
+@dataclass
+class StoredFile:
+    path: str
+    size: int
+    sha256: str
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def blob_path(upload_dir: str, sha256: str) -> str:
+    """
+    Đường dẫn blob theo nội dung: upload_dir/ab/cd/<sha256>
+    """
+    return os.path.join(upload_dir, sha256[:2], sha256[2:4], sha256)
+
+async def receive_upload(
+    file: UploadFile,
+    upload_dir: str,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredFile:
+    """
+    Lưu file upload theo từng chunk vào file tạm trong upload_dir
+    - Kích thước và SHA-256 được tính trong cùng một lượt đọc
+    - Dừng và xóa file tạm ngay khi vượt max_size
+    - Ghi file chạy trong threadpool, không chặn event loop
+    - Trả về StoredFile với path là file tạm, chuyển vào store bằng store_blob
+    """
+    fd, tmp_path = await run_in_threadpool(
+        tempfile.mkstemp, dir=upload_dir, prefix=".upload-", suffix=".part"
+    )
+    out = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLarge(max_size)
+            hasher.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        await run_in_threadpool(out.close)
+    except BaseException:
+        out.close()
+        _remove_quietly(tmp_path)
+        raise
+
+    return StoredFile(path=tmp_path, size=size, sha256=hasher.hexdigest())
+
+def _store_blob(tmp_path: str, upload_dir: str, sha256: str) -> str:
+    path = blob_path(upload_dir, sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Nội dung đã có trong store: bỏ file tạm
+        _remove_quietly(tmp_path)
+    else:
+        # Đổi tên nguyên tử: không bao giờ có file ghi dở ở đường dẫn cuối
+        os.replace(tmp_path, path)
+    return path
+
+async def store_blob(stored: StoredFile, upload_dir: str) -> str:
+    """
+    Chuyển file tạm vào store theo nội dung, mỗi nội dung chỉ lưu một lần
+    """
+    return await run_in_threadpool(_store_blob, stored.path, upload_dir, stored.sha256)
+
+async def discard_upload(stored: StoredFile):
+    await run_in_threadpool(_remove_quietly, stored.path)
+
+async def remove_file(path: str):
+    await run_in_threadpool(_remove_quietly, path)
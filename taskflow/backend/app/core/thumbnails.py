@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow là dependency tùy chọn, thiếu thì không có thumbnail
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger("taskflow.thumbnails")
+
+THUMBNAIL_MIME_TYPES = {"image/jpeg", "image/png", "image/gif"}
+
+def thumbnail_path(blob_path: str, mime_type: Optional[str]) -> str:
+    """
+    Thumbnail được lưu cạnh blob: <blob>.thumb.jpg (ảnh JPEG) hoặc <blob>.thumb.png (giữ nền trong suốt)
+    """
+    extension = "jpg" if mime_type == "image/jpeg" else "png"
+    return f"{blob_path}.thumb.{extension}"
+
+def supports_thumbnail(mime_type: Optional[str]) -> bool:
+    return Image is not None and mime_type in THUMBNAIL_MIME_TYPES
+
+def generate_thumbnail(source: str, target: str, size: int):
+    """
+    Tạo thumbnail tối đa size x size (giữ tỉ lệ), ghi file tạm rồi đổi tên
+    """
+    tmp_path = f"{target}.{threading.get_ident()}.part"
+    try:
+        with Image.open(source) as image:
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if target.endswith(".jpg"):
+                image.convert("RGB").save(tmp_path, format="JPEG", quality=85, optimize=True)
+            else:
+                image.convert("RGBA").save(tmp_path, format="PNG", optimize=True)
+        os.replace(tmp_path, target)
+    except BaseException:
+        # Ảnh hỏng/cắt cụt có thể lỗi giữa chừng khi đang ghi: không để lại file .part
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+class ThumbnailWorker:
+    """
+    Pool thread nền tạo thumbnail cho ảnh, không chạy trên event loop
+    - Mỗi thumbnail chỉ được tạo một lần dù có nhiều yêu cầu cùng lúc
+    """
+    def __init__(self, size: int, max_workers: int):
+        self.size = size
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.failed = 0
+
+    def submit(self, blob_path: str, mime_type: Optional[str]) -> Optional[Future]:
+        """
+        Đưa việc tạo thumbnail vào pool, trả về Future hoặc None nếu không hỗ trợ
+        """
+        if not supports_thumbnail(mime_type):
+            return None
+        target = thumbnail_path(blob_path, mime_type)
+        with self._lock:
+            future = self._pending.get(target)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="thumbnail"
+                )
+            future = self._executor.submit(self._generate, blob_path, target)
+            self._pending[target] = future
+        return future
+
+    def _generate(self, blob_path: str, target: str) -> Optional[str]:
+        try:
+            if not os.path.exists(target):
+                generate_thumbnail(blob_path, target, self.size)
+                self.generated += 1
+            return target
+        except Exception:
+            self.failed += 1
+            logger.exception("Không tạo được thumbnail cho %s", blob_path)
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(target, None)
+
+    async def get(self, blob_path: str, mime_type: Optional[str]) -> Optional[str]:
+        """
+        Đường dẫn thumbnail, tạo ngay nếu chưa có (VD ảnh upload trước khi có tính năng này)
+        """
+        if not supports_thumbnail(mime_type):
+            return None
+        target = thumbnail_path(blob_path, mime_type)
+        if os.path.exists(target):
+            return target
+        future = self.submit(blob_path, mime_type)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": Image is not None,
+            "pending": len(self._pending),
+            "generated": self.generated,
+            "failed": self.failed,
+        }
+
+thumbnail_worker = ThumbnailWorker(
+    size=settings.THUMBNAIL_SIZE,
+    max_workers=settings.THUMBNAIL_WORKERS,
+)
@@ -0,0 +1,131 @@
+from typing import Optional, Set
+from fastapi import HTTPException
+from sqlalchemy import delete, event, exists, inspect, insert, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+from app.models.models import Issue, IssueVisibility, Project
+
+# Các role xem được mọi issue, không cần tra bảng issue_visibility
+PRIVILEGED_ROLES = ("admin", "manager")
+
+def sees_all_issues(user) -> bool:
+    return user.role in PRIVILEGED_ROLES
+
+# -------- Duy trì bảng issue_visibility --------
+
+def issue_viewer_ids(issue: Issue) -> Set[int]:
+    """
+    Những user (ngoài admin/manager) được xem issue: creator và assignee
+    """
+    return {user_id for user_id in (issue.creator_id, issue.assignee_id) if user_id is not None}
+
+def _write_visibility(connection, issue: Issue):
+    rows = [
+        {"user_id": user_id, "issue_id": issue.id, "project_id": issue.project_id}
+        for user_id in issue_viewer_ids(issue)
+    ]
+    if rows:
+        connection.execute(insert(IssueVisibility), rows)
+
+def _clear_visibility(connection, issue_id: int):
+    connection.execute(delete(IssueVisibility).where(IssueVisibility.issue_id == issue_id))
+
+# Cập nhật qua ORM event nên mọi đường ghi (router, crud, cascade khi xóa project)
+# đều được đồng bộ trong cùng transaction với thay đổi của issue
+
+@event.listens_for(Issue, "after_insert")
+def _visibility_after_insert(mapper, connection, target):
+    _write_visibility(connection, target)
+
+@event.listens_for(Issue, "after_update")
+def _visibility_after_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ("creator_id", "assignee_id", "project_id")):
+        return
+    _clear_visibility(connection, target.id)
+    _write_visibility(connection, target)
+
+@event.listens_for(Issue, "before_delete")
+def _visibility_before_delete(mapper, connection, target):
+    _clear_visibility(connection, target.id)
+
+# -------- Kiểm tra quyền --------
+
+def visible_issue_ids(user_id: int) -> Select:
+    """
+    Subquery id các issue user được xem (tra theo khóa chính (user_id, issue_id))
+    """
+    return select(IssueVisibility.issue_id).where(IssueVisibility.user_id == user_id)
+
+def issue_visibility_filter(user, issue_id_column: ColumnElement = Issue.id) -> Optional[ColumnElement]:
+    """
+    Điều kiện lọc issues user được xem, None nếu user xem được tất cả
+    """
+    if sees_all_issues(user):
+        return None
+    return issue_id_column.in_(visible_issue_ids(user.id))
+
+def filter_visible_issues(stmt: Select, user, issue_id_column: ColumnElement = Issue.id) -> Select:
+    """
+    Thêm điều kiện quyền xem vào câu truy vấn issues (hoặc bảng có cột issue_id)
+    """
+    condition = issue_visibility_filter(user, issue_id_column)
+    return stmt if condition is None else stmt.where(condition)
+
+def issue_visible_flag(user, issue_id) -> ColumnElement:
+    """
+    Biểu thức boolean "user được xem issue" để select kèm (vd. cùng attachment)
+    - issue_id là id cụ thể hoặc cột tham chiếu tới issues.id
+    """
+    if sees_all_issues(user):
+        return true()
+    return exists().where(
+        IssueVisibility.user_id == user.id,
+        IssueVisibility.issue_id == issue_id
+    )
+
+def can_view_loaded_issue(user, issue: Issue) -> bool:
+    """
+    Kiểm tra quyền với issue đã load sẵn, không cần truy vấn
+    """
+    return sees_all_issues(user) or user.id in issue_viewer_ids(issue)
+
+def issue_access_query(user, issue_id: int) -> Select:
+    """
+    Một truy vấn trả về (issue tồn tại, user được xem)
+    """
+    return select(exists().where(Issue.id == issue_id), issue_visible_flag(user, issue_id))
+
+def project_access_query(user, project_id: int) -> Select:
+    """
+    Một truy vấn trả về (project tồn tại, user được xem)
+    - User thường xem được project nếu liên quan tới ít nhất một issue trong project
+    """
+    visible = true() if sees_all_issues(user) else exists().where(
+        IssueVisibility.user_id == user.id,
+        IssueVisibility.project_id == project_id
+    )
+    return select(exists().where(Project.id == project_id), visible)
+
+async def can_view_issue(db: AsyncSession, user, issue_id: int) -> bool:
+    found, visible = (await db.execute(issue_access_query(user, issue_id))).one()
+    return bool(found and visible)
+
+def raise_for_access(found: bool, visible: bool, not_found: str, forbidden: str):
+    if not found:
+        raise HTTPException(status_code=404, detail=not_found)
+    if not visible:
+        raise HTTPException(status_code=403, detail=forbidden)
+
+async def ensure_issue_access(
+    db: AsyncSession,
+    user,
+    issue_id: int,
+    forbidden: str,
+    not_found: str = "Không tìm thấy issue"
+):
+    """
+    404 nếu issue không tồn tại, 403 nếu user không được xem (một truy vấn)
+    """
+    found, visible = (await db.execute(issue_access_query(user, issue_id))).one()
+    raise_for_access(found, visible, not_found, forbidden)
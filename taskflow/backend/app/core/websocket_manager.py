@@ -1,24 +1,299 @@
-from fastapi import WebSocket
-from typing import List
+import asyncio
 import json
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from fastapi import WebSocket
+from app.core.config import settings
+from app.core.event_bus import InMemoryEventBus
+
+# Chính sách khi hàng đợi gửi của một client bị đầy
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Tin nhắn thay thế cho các sự kiện bị gộp, client nhận được thì tải lại dữ liệu
+RESYNC_MESSAGE = json.dumps({"type": "resync", "data": {"reason": "slow_consumer"}})
+
+# Topic nhận mọi sự kiện (chỉ admin/manager được đăng ký)
+WILDCARD_TOPIC = "*"
+
+def project_topic(project_id: int) -> str:
+    return f"project:{project_id}"
+
+def issue_topic(issue_id: int) -> str:
+    return f"issue:{issue_id}"
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def issue_viewer_topics(issue) -> List[str]:
+    """
+    Topic riêng của những user (ngoài admin/manager) được xem issue: creator và assignee
+    """
+    return [user_topic(user_id) for user_id in {issue.creator_id, issue.assignee_id} if user_id is not None]
+
+def issue_topics(issue) -> List[str]:
+    """
+    Các topic nhận sự kiện của một issue
+    - project:{id}: board của project (chỉ admin/manager đăng ký được)
+    - issue:{id}: trang chi tiết issue; user:{id}: creator và assignee
+    """
+    return [project_topic(issue.project_id), issue_topic(issue.id)] + issue_viewer_topics(issue)
+
+def parse_topic(topic: str):
+    """
+    Tách topic dạng "project:{id}" / "issue:{id}" / "user:{id}", trả về (kind, id) hoặc None
+    """
+    if topic == WILDCARD_TOPIC:
+        return WILDCARD_TOPIC, None
+    kind, _, raw_id = topic.partition(":")
+    if kind not in ("project", "issue", "user") or not raw_id.isdigit():
+        return None
+    return kind, int(raw_id)
+
+class _Connection:
+    """
+    Một client WebSocket cùng hàng đợi gửi và task ghi riêng
+    """
+    def __init__(self, websocket: WebSocket, queue_size: int, user_id: Optional[int] = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.topics: Set[str] = set()
+        self.dropped = 0
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        slow_consumer_policy: Optional[str] = None,
+        send_timeout: Optional[float] = None
+    ):
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.slow_consumer_policy = slow_consumer_policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        if self.slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Chính sách không hợp lệ: {self.slow_consumer_policy}")
+
+        self.connections: Dict[WebSocket, _Connection] = {}
+        # Bus chuyển sự kiện giữa các worker, mặc định chỉ trong process
+        self.bus = InMemoryEventBus()
+        self._bus_started = False
+        # Index topic -> các connection đã đăng ký
+        self.subscriptions: Dict[str, Set[_Connection]] = {}
+
+        # Metrics
+        self.messages_broadcast = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.connections_reaped = 0
+        self._send_latencies = deque(maxlen=1000)
+
+    async def start_bus(self, bus=None):
+        """
+        Gắn và khởi động event bus (gọi khi ứng dụng khởi động)
+        """
+        if bus is not None:
+            self.bus = bus
+        await self.bus.start(self.deliver)
+        self._bus_started = True
+
+    async def stop_bus(self):
+        if self._bus_started:
+            await self.bus.stop()
+            self._bus_started = False
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.connections)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, user_id: Optional[int] = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        conn = _Connection(websocket, self.queue_size, user_id=user_id)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        self.connections[websocket] = conn
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for topic in conn.topics:
+            self._remove_subscriber(topic, conn)
+        conn.topics.clear()
+        if conn.writer and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        """
+        Đăng ký topic cho connection (quyền truy cập phải được kiểm tra trước)
+        """
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+        conn.topics.add(topic)
+        self.subscriptions.setdefault(topic, set()).add(conn)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+        conn.topics.discard(topic)
+        self._remove_subscriber(topic, conn)
+
+    def _remove_subscriber(self, topic: str, conn: _Connection):
+        subscribers = self.subscriptions.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(conn)
+        if not subscribers:
+            del self.subscriptions[topic]
+
+    async def send_personal(self, websocket: WebSocket, message: dict):
+        """
+        Gửi tin nhắn cho riêng một connection (qua hàng đợi của connection đó)
+        """
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            self._enqueue(conn, json.dumps(message))
+
+    async def broadcast(self, message: dict, topics: Optional[Iterable[str]] = None):
+        """
+        Phát sự kiện qua event bus tới mọi worker (kể cả worker hiện tại)
+        - topics=None: gửi cho mọi connection
+        - Có topics: chỉ gửi cho connection đăng ký một trong các topic đó hoặc "*"
+        - JSON chỉ serialize một lần cho mọi client
+        """
+        if not self._bus_started:
+            await self.start_bus()
+        text = json.dumps(message)
+        await self.bus.publish(text, list(topics) if topics is not None else None)
+
+    async def broadcast_issues(
+        self,
+        build_message: Callable[[Optional[Set[int]]], dict],
+        project_ids: Iterable[int],
+        viewers: Dict[int, Iterable[int]]
+    ):
+        """
+        Phát một sự kiện gồm nhiều issues mà không lộ issue cho user không được xem
+        - project:{id} nhận bản đầy đủ build_message(None)
+        - user:{id} nhận bản build_message(ids) chỉ gồm các issue user đó tạo hoặc được gán
+        - viewers: issue_id -> creator/assignee (cả trước và sau thay đổi)
+        """
+        await self.broadcast(build_message(None), topics={project_topic(project_id) for project_id in project_ids})
+        issues_by_user: Dict[int, Set[int]] = {}
+        for issue_id, user_ids in viewers.items():
+            for user_id in user_ids:
+                if user_id is not None:
+                    issues_by_user.setdefault(user_id, set()).add(issue_id)
+        for user_id, issue_ids in issues_by_user.items():
+            await self.broadcast(build_message(issue_ids), topics=[user_topic(user_id)])
+
+    def deliver(self, text: str, topics: Optional[Iterable[str]] = None):
+        """
+        Đưa tin nhắn đã serialize vào hàng đợi của các client quan tâm trong process này
+        - Việc gửi thực sự do writer task của từng connection đảm nhận
+        """
+        self.messages_broadcast += 1
+        for conn in self._recipients(topics):
+            self._enqueue(conn, text)
+
+    def _recipients(self, topics: Optional[Iterable[str]]):
+        if topics is None:
+            return list(self.connections.values())
+        topics = list(topics)
+        recipients = set()
+        # Sự kiện chỉ gửi tới user:{id} là bản rút gọn của sự kiện đã gửi tới project, "*" không nhận lại
+        if not topics or not all(topic.startswith("user:") for topic in topics):
+            recipients.update(self.subscriptions.get(WILDCARD_TOPIC, ()))
+        for topic in topics:
+            recipients.update(self.subscriptions.get(topic, ()))
+        return recipients
+
+    def _enqueue(self, conn: _Connection, text: str):
+        try:
+            conn.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == "disconnect":
+            self._reap(conn)
+            return
+
+        if self.slow_consumer_policy == "coalesce":
+            # Bỏ toàn bộ sự kiện đang chờ, thay bằng một tin nhắn resync
+            dropped = conn.queue.qsize() + 1
+            while not conn.queue.empty():
+                conn.queue.get_nowait()
+            conn.queue.put_nowait(RESYNC_MESSAGE)
+        else:
+            # drop_oldest: bỏ sự kiện cũ nhất để nhường chỗ cho sự kiện mới
+            conn.queue.get_nowait()
+            conn.queue.put_nowait(text)
+            dropped = 1
+
+        conn.dropped += dropped
+        self.messages_dropped += dropped
+
+    async def _writer(self, conn: _Connection):
+        try:
+            while True:
+                text = await conn.queue.get()
+                started = time.perf_counter()
+                await asyncio.wait_for(conn.websocket.send_text(text), timeout=self.send_timeout)
+                self._send_latencies.append(time.perf_counter() - started)
+                self.messages_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket đã chết hoặc gửi quá lâu: loại bỏ connection
+            self._reap(conn)
+
+    def _reap(self, conn: _Connection):
+        if self.connections.get(conn.websocket) is not conn:
+            return
+        self.disconnect(conn.websocket)
+        self.connections_reaped += 1
+        asyncio.ensure_future(self._close_quietly(conn.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """
+        Metrics của broadcaster: số connection, độ sâu hàng đợi, độ trễ gửi
+        """
+        depths = [conn.queue.qsize() for conn in self.connections.values()]
+        latencies = sorted(self._send_latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                pass
+        return {
+            "connections": len(depths),
+            "topics": len(self.subscriptions),
+            "queue_size": self.queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "messages_broadcast": self.messages_broadcast,
+            "messages_sent": self.messages_sent,
+            "messages_dropped": self.messages_dropped,
+            "connections_reaped": self.connections_reaped,
+            "event_bus": self.bus.stats(),
+            "send_latency_ms": {
+                "avg": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from app.models.models import Issue, Project
 from app.schemas.schemas import IssueCreate, IssueUpdate
+from app.core.issue_counters import snapshot_issue, apply_issue_change, apply_issue_changes
 from datetime import datetime
 
 class CRUDIssue:
@@ -14,16 +15,20 @@ class CRUDIssue:
     def create(self, db: Session, *, obj_in: IssueCreate) -> Issue:
         db_obj = Issue(**obj_in.dict())
         db.add(db_obj)
+        db.flush()
+        apply_issue_change(db, None, snapshot_issue(db_obj))
         db.commit()
         db.refresh(db_obj)
         return db_obj
     
     def update(self, db: Session, *, db_obj: Issue, obj_in: IssueUpdate) -> Issue:
+        old_snapshot = snapshot_issue(db_obj)
         update_data = obj_in.dict(exclude_unset=True)
         for field in update_data:
             setattr(db_obj, field, update_data[field])
         
         db_obj.updated_at = datetime.utcnow()
+        apply_issue_change(db, old_snapshot, snapshot_issue(db_obj))
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
@@ -31,10 +36,46 @@ class CRUDIssue:
     
     def delete(self, db: Session, *, issue_id: int) -> Issue:
         obj = db.query(Issue).get(issue_id)
+        apply_issue_change(db, snapshot_issue(obj), None)
         db.delete(obj)
         db.commit()
         return obj
     
+    # -------- Thao tác hàng loạt --------
+    # Không commit: caller commit một lần để cả batch nằm trong một transaction
+    
+    def get_many(self, db: Session, issue_ids: List[int]) -> List[Issue]:
+        return db.query(Issue).filter(Issue.id.in_(issue_ids)).all()
+    
+    def create_many(self, db: Session, *, objs_in: List[IssueCreate], creator_id: Optional[int] = None) -> List[Issue]:
+        db_objs = [Issue(**obj_in.dict(), creator_id=creator_id) for obj_in in objs_in]
+        db.add_all(db_objs)
+        db.flush()
+        apply_issue_changes(db, [(None, snapshot_issue(db_obj)) for db_obj in db_objs])
+        return db_objs
+    
+    def update_many(self, db: Session, *, updates: List[Tuple[Issue, Dict[str, Any]]]) -> List[Issue]:
+        """
+        updates: danh sách (issue, các trường cần cập nhật)
+        """
+        now = datetime.utcnow()
+        changes = []
+        for db_obj, update_data in updates:
+            old_snapshot = snapshot_issue(db_obj)
+            for field, value in update_data.items():
+                setattr(db_obj, field, value)
+            db_obj.updated_at = now
+            changes.append((old_snapshot, snapshot_issue(db_obj)))
+        apply_issue_changes(db, changes)
+        db.flush()
+        return [db_obj for db_obj, _ in updates]
+    
+    def delete_many(self, db: Session, *, db_objs: List[Issue]) -> None:
+        apply_issue_changes(db, [(snapshot_issue(db_obj), None) for db_obj in db_objs])
+        for db_obj in db_objs:
+            db.delete(db_obj)
+        db.flush()
+    
     def get_by_project(self, db: Session, project_id: int) -> List[Issue]:
         return db.query(Issue).filter(Issue.project_id == project_id).all()
     
@@ -0,0 +1,27 @@
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from app.models.models import Issue
+
+# Loader options theo từng dạng response
+# - Quan hệ many-to-one (creator, assignee, project): joinedload trong cùng truy vấn
+# - Quan hệ collection (labels): selectinload, một truy vấn IN cho cả trang kết quả
+# - raiseload("*"): các quan hệ không khai báo sẽ báo lỗi ngay thay vì lazy load từng dòng (N+1)
+
+# Schema Issue: chỉ các cột của issue
+ISSUE_FLAT = (raiseload("*"),)
+
+# Schema IssueWithRelations
+ISSUE_WITH_RELATIONS = (
+    joinedload(Issue.creator),
+    joinedload(Issue.assignee),
+    joinedload(Issue.project),
+    raiseload("*"),
+)
+
+# Schema IssueWithLabels (board/danh sách có hiển thị labels)
+ISSUE_WITH_LABELS = (
+    selectinload(Issue.labels),
+    raiseload("*"),
+)
+
+# Comment, Label, Attachment: response chỉ gồm các cột của bảng
+FLAT = (raiseload("*"),)
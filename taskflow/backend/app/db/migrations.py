@@ -0,0 +1,108 @@
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có file lock, chỉ chạy một process
+    fcntl = None
+
+logger = logging.getLogger("taskflow.migrations")
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+ALEMBIC_INI = BACKEND_DIR / "alembic.ini"
+
+# Khóa advisory của PostgreSQL cho bước chuẩn bị database (số bất kỳ, cố định)
+MIGRATION_LOCK_KEY = 7_240_016
+
+def alembic_config(database_url: Optional[str] = None) -> Config:
+    """
+    Cấu hình Alembic dùng chung cho ứng dụng và script
+    """
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    # configparser coi "%" là cú pháp interpolation (vd. mật khẩu "p%40ss" đã percent-encode)
+    url = database_url or settings.DATABASE_URL
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    # Giữ nguyên cấu hình logging của ứng dụng
+    config.attributes["configure_logger"] = False
+    return config
+
+def run_migrations(database_url: Optional[str] = None, revision: str = "head"):
+    """
+    Nâng cấp schema lên revision (mặc định là mới nhất)
+    - Database tạo bằng create_all trước đây cũng được nâng cấp: baseline chỉ bổ sung phần còn thiếu
+    """
+    command.upgrade(alembic_config(database_url), revision)
+
+@contextmanager
+def _sqlite_file_lock(database: Optional[str]):
+    if fcntl is None or not database or database == ":memory:":
+        yield
+        return
+    with open(f"{database}.migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def migration_lock(database_url: Optional[str] = None):
+    """
+    Khóa giữa các process để chỉ một process chạy migration tại một thời điểm
+    - PostgreSQL: pg_advisory_lock; SQLite: file lock cạnh file database
+    """
+    url = make_url(database_url or settings.DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        with _sqlite_file_lock(url.database):
+            yield
+        return
+    if url.get_backend_name() != "postgresql":
+        yield
+        return
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+    finally:
+        engine.dispose()
+
+def prepare_database(database_url: Optional[str] = None):
+    """
+    Nâng cấp schema và khởi tạo bảng thống kê issues
+    - Bước deploy: chạy một lần (python -m app.db.migrations) trước khi khởi động các worker
+    - Có khóa nên nhiều worker cùng gọi (DB_MIGRATE_ON_STARTUP) thì các worker sau chỉ chờ
+      rồi thấy schema đã ở revision mới nhất
+    """
+    # Import tại đây: issue_counters import models, không cần khi chỉ dùng alembic_config
+    from app.core.issue_counters import ensure_issue_counters
+
+    url = database_url or settings.DATABASE_URL
+    with migration_lock(url):
+        run_migrations(url)
+        engine = create_engine(url)
+        try:
+            with Session(engine) as db:
+                ensure_issue_counters(db)
+        finally:
+            engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    prepare_database()
+    logger.info("Database đã sẵn sàng")
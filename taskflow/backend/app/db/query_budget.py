@@ -0,0 +1,104 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("taskflow.query_budget")
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Request chạy nhiều truy vấn hơn ngân sách đã khai báo (thường là dấu hiệu N+1)
+    """
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+def install_query_counter(*engines: Engine):
+    """
+    Gắn listener đếm truy vấn vào engine (với AsyncEngine thì truyền engine.sync_engine)
+    """
+    for db_engine in engines:
+        if not event.contains(db_engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+
+@contextmanager
+def count_queries():
+    """
+    Đếm số truy vấn chạy trong khối with (dùng trong test/script)
+    """
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+def query_budget(max_queries: int):
+    """
+    Dependency khai báo số truy vấn tối đa của một route
+    - VD: @router.get(..., dependencies=[Depends(query_budget(3))])
+    - Chỉ có hiệu lực khi bật QueryBudgetMiddleware
+    """
+    def set_budget(request: Request):
+        request.state.query_budget = max_queries
+    return set_budget
+
+class QueryBudgetMiddleware:
+    """
+    Đếm truy vấn của mỗi request và so với ngân sách của route
+    - Thêm header X-Query-Count vào response
+    - strict=True: vượt ngân sách thì raise QueryBudgetExceeded (dùng khi chạy test)
+    - strict=False: chỉ ghi log cảnh báo
+    """
+    def __init__(self, app: ASGIApp, strict: bool = False):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = QueryCounter()
+        token = _current_counter.set(counter)
+
+        async def send_with_check(message: Message):
+            if message["type"] == "http.response.start":
+                self._check(scope, counter)
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER.lower().encode(), str(counter.count).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_check)
+        finally:
+            _current_counter.reset(token)
+
+    def _check(self, scope: Scope, counter: QueryCounter):
+        budget = scope.get("state", {}).get("query_budget")
+        if budget is None or counter.count <= budget:
+            return
+        message = (
+            f"{scope['method']} {scope['path']} chạy {counter.count} truy vấn, "
+            f"vượt ngân sách {budget}"
+        )
+        if self.strict:
+            raise QueryBudgetExceeded(message + ":\n" + "\n".join(counter.statements))
+        logger.warning(message)
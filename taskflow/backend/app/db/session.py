@@ -1,15 +1,126 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
+from app.core.config import Settings, settings
 
-# Sử dụng SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./taskflow.db"
+def _is_sqlite_memory(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _sqlite_pragmas(config: Settings):
+    return [
+        f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}",
+        f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+
+def _engine_options(config: Settings, url: URL) -> dict:
+    """
+    Tham số pool/connect dùng chung cho engine sync và async
+    - PostgreSQL (và các DB khác): pool có giới hạn, pre-ping, recycle connection
+    - SQLite dạng file: QueuePool, connection rẻ nên không cần recycle
+    """
+    if url.get_backend_name() != "sqlite":
+        return dict(
+            echo=config.DB_ECHO,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+        )
+
+    options = dict(
+        echo=config.DB_ECHO,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+    )
+    if not _is_sqlite_memory(url):
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+    return options
+
+def _install_sqlite_pragmas(sync_engine: Engine, config: Settings):
+    """
+    Chạy các pragma WAL/synchronous/mmap/busy_timeout trên mỗi connection mới
+    """
+    pragmas = _sqlite_pragmas(config)
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def create_db_engine(config: Settings = settings) -> Engine:
+    """
+    Tạo engine (sync) theo cấu hình
+    """
+    url = make_url(config.DATABASE_URL)
+    db_engine = create_engine(url, **_engine_options(config, url))
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine, config)
+    return db_engine
+
+def async_database_url(database_url: str) -> URL:
+    """
+    Đổi URL sync sang driver async tương ứng (aiosqlite / asyncpg)
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    return url
+
+def create_async_db_engine(config: Settings = settings) -> AsyncEngine:
+    """
+    Tạo engine async dùng chung cấu hình pool/pragma với engine sync
+    """
+    url = async_database_url(config.DATABASE_URL)
+    options = _engine_options(config, url)
+    if url.get_backend_name() == "sqlite" and not _is_sqlite_memory(url):
+        # aiosqlite mặc định dùng NullPool (mở file lại ở mỗi request)
+        options["poolclass"] = AsyncAdaptedQueuePool
+    db_engine = create_async_engine(url, **options)
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine.sync_engine, config)
+    return db_engine
+
+def describe_engine(db_engine: Engine) -> dict:
+    """
+    Thông tin cấu hình pool đang áp dụng (dùng để log khi khởi động)
+    """
+    pool = db_engine.pool
+    info = {
+        "url": db_engine.url.render_as_string(hide_password=True),
+        "pool": type(pool).__name__,
+    }
+    for name, attr in (("pool_size", "size"), ("max_overflow", "_max_overflow"),
+                       ("pool_timeout", "_timeout"), ("pool_recycle", "_recycle"),
+                       ("pool_pre_ping", "_pre_ping")):
+        value = getattr(pool, attr, None)
+        if value is not None:
+            info[name] = value() if callable(value) else value
+    return info
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine()
+# expire_on_commit=False để đọc lại thuộc tính sau commit mà không cần lazy load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,4 +128,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,4 @@
-from app.models.models import Base, Project, Issue, User, Comment, Attachment, ActivityLog
+from app.models.models import Base, Project, Issue, User, Comment, Attachment, Blob, ActivityLog, IssueCounter, IssueVisibility
 from app.models.label import Label, issue_labels
 
 __all__ = [
@@ -8,7 +8,10 @@ __all__ = [
     "User",
     "Comment",
     "Attachment",
+    "Blob",
     "ActivityLog",
+    "IssueCounter",
+    "IssueVisibility",
     "Label",
     "issue_labels"
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Table, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Table, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 from datetime import datetime
@@ -9,7 +9,9 @@ issue_labels = Table(
     Base.metadata,
     Column('issue_id', Integer, ForeignKey('issues.id'), primary_key=True),
     Column('label_id', Integer, ForeignKey('labels.id'), primary_key=True),
-    Column('created_at', DateTime, default=datetime.utcnow)
+    Column('created_at', DateTime, default=datetime.utcnow),
+    # Khóa chính bắt đầu bằng issue_id, index này để tra issues theo label
+    Index('ix_issue_labels_label_id', 'label_id', 'issue_id')
 )
 
 class Label(Base):
@@ -17,12 +19,21 @@ class Label(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    # Tên chữ thường, bỏ dấu cho tìm kiếm typeahead (app.core.labeling cập nhật khi gán name)
+    name_normalized = Column(String, nullable=True)
     color = Column(String, default="#3498db")  # Màu mặc định blue
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Số issues đang gắn label, do trigger trên issue_labels cập nhật (migration 0006)
+    usage_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     issues = relationship("Issue", secondary=issue_labels, back_populates="labels")
-    creator = relationship("User", foreign_keys=[created_by])
\ No newline at end of file
+    creator = relationship("User", foreign_keys=[created_by])
+    
+    __table_args__ = (
+        Index("ix_labels_usage_count_id", "usage_count", "id"),
+        Index("ix_labels_name_normalized", "name_normalized"),
+    )
@@ -2,7 +2,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index
 
 
 # -------- USER --------
@@ -13,6 +13,8 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    full_name = Column(String, nullable=True)
+    role = Column(String, default="user")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     projects = relationship("Project", back_populates="owner")
@@ -53,14 +55,63 @@ class Issue(Base):
     project_id = Column(Integer, ForeignKey("projects.id"))
     owner_id = Column(Integer, ForeignKey("users.id"))
     assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    creator_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    updated_at = Column(DateTime, nullable=True)
 
     project = relationship("Project", back_populates="issues")
     owner = relationship("User", foreign_keys=[owner_id])
+    creator = relationship("User", foreign_keys=[creator_id])
     assignee = relationship("User", foreign_keys=[assignee_id])
     comments = relationship("Comment", back_populates="issue", cascade="all, delete-orphan")
     attachments = relationship("Attachment", back_populates="issue", cascade="all, delete-orphan")  
     labels = relationship("Label", secondary="issue_labels", back_populates="issues")
 
+    # Index cho phân trang keyset theo (created_at, id), toàn cục và theo project
+    # và cho các bộ lọc của read_issues (tạo bằng migration 0002)
+    __table_args__ = (
+        Index("ix_issues_created_at_id", "created_at", "id"),
+        Index("ix_issues_project_created_at_id", "project_id", "created_at", "id"),
+        Index("ix_issues_project_status_created_at_id", "project_id", "status", "created_at", "id"),
+        Index("ix_issues_assignee_created_at_id", "assignee_id", "created_at", "id"),
+        Index("ix_issues_creator_created_at_id", "creator_id", "created_at", "id"),
+        Index("ix_issues_status_priority", "status", "priority"),
+    )
+
+
+
+# -------- ISSUE COUNTERS --------
+class IssueCounter(Base):
+    """
+    Bảng tổng hợp số lượng issues theo (user, project, status, priority)
+    - user_id = 0 là thống kê toàn hệ thống
+    - user_id khác 0 là các issues mà user đó tạo ra hoặc được gán
+    """
+    __tablename__ = "issue_counters"
+
+    user_id = Column(Integer, primary_key=True, default=0)
+    project_id = Column(Integer, primary_key=True, default=0)
+    status = Column(String, primary_key=True)
+    priority = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# -------- ISSUE VISIBILITY --------
+class IssueVisibility(Base):
+    """
+    Bảng quyền xem issue đã tính sẵn: mỗi dòng là một (user, issue) user thường được xem
+    - Hiện gồm creator và assignee; admin/manager xem tất cả nên không cần dòng nào
+    - Đồng bộ bằng ORM event trong app.core.visibility (tạo migration 0004)
+    """
+    __tablename__ = "issue_visibility"
+
+    user_id = Column(Integer, primary_key=True)
+    issue_id = Column(Integer, ForeignKey("issues.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_issue_visibility_user_project", "user_id", "project_id"),
+        Index("ix_issue_visibility_issue_id", "issue_id"),
+    )
 
 
 class Comment(Base):
@@ -76,6 +127,10 @@ class Comment(Base):
     issue = relationship("Issue", back_populates="comments")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_comments_issue_created_at", "issue_id", "created_at"),
+    )
+
 
 
 
@@ -86,6 +141,8 @@ class Attachment(Base):
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer)
+    # SHA-256 của nội dung file, cũng là khóa của blob trong store (đếm tham chiếu theo cột này)
+    content_hash = Column(String(64), nullable=True, index=True)
     mime_type = Column(String)
     issue_id = Column(Integer, ForeignKey("issues.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -94,6 +151,22 @@ class Attachment(Base):
     issue = relationship("Issue", back_populates="attachments")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_attachments_issue_id", "issue_id"),
+    )
+
+
+class Blob(Base):
+    """
+    Số attachment tham chiếu tới mỗi blob (file lưu theo content_hash)
+    - Dòng này là khóa khi gắn/bỏ tham chiếu: chỉ xóa file khi refcount về 0 trong cùng transaction
+    - Đồng bộ bằng ORM event trong app.core.blobs (tạo migration 0008)
+    """
+    __tablename__ = "blobs"
+
+    content_hash = Column(String(64), primary_key=True)
+    refcount = Column(Integer, nullable=False, default=0)
+
 
 
 class ActivityLog(Base):
@@ -105,6 +178,15 @@ class ActivityLog(Base):
     entity_id = Column(Integer)
     details = Column(JSON, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Project của issue tại thời điểm ghi log, dùng cho timeline của project (migration 0005)
+    project_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_activity_logs_entity_created_at", "entity_type", "entity_id", "created_at"),
+        Index("ix_activity_logs_user_created_at", "user_id", "created_at"),
+        Index("ix_activity_logs_created_at", "created_at"),
+        Index("ix_activity_logs_project_created_at_id", "project_id", "created_at", "id"),
+    )
@@ -71,7 +71,8 @@ class IssueUpdate(BaseModel):
 
 class Issue(IssueBase):
     id: int
-    owner_id: int
+    owner_id: Optional[int] = None
+    creator_id: Optional[int] = None
     created_at: datetime
     class Config:
         from_attributes = True
@@ -88,11 +89,27 @@ class IssueWithRelations(IssueBase):
     class Config:
         from_attributes = True
 
+# -------- ISSUE BATCH --------
+class IssueBatchUpdate(IssueUpdate):
+    id: int
+
+class IssueBatchRequest(BaseModel):
+    create: List[IssueCreate] = []
+    update: List[IssueBatchUpdate] = []
+    delete: List[int] = []
+
+class IssueBatchResponse(BaseModel):
+    created: List[Issue]
+    updated: List[Issue]
+    deleted: List[int]
+
 # -------- STATS --------
 class StatsResponse(BaseModel):
     total_projects: int
     total_issues: int
     issues_by_status: Dict[str, int]
+    issues_by_priority: Dict[str, int] = {}
+    issues_by_project: Dict[int, int] = {}
     recent_issues: List[Issue]
 
 # -------- COMMENT --------
@@ -125,6 +142,7 @@ class AttachmentResponse(AttachmentBase):
     id: int
     file_path: str
     file_size: int
+    content_hash: Optional[str] = None
     mime_type: str
     issue_id: int
     user_id: int
@@ -142,6 +160,7 @@ class ActivityBase(BaseModel):
 class ActivityResponse(ActivityBase):
     id: int
     user_id: int
+    project_id: Optional[int] = None
     created_at: datetime
     class Config:
         from_attributes = True
@@ -195,4 +214,35 @@ class Label(LabelBase):
 class IssueWithLabels(Issue):
     labels: List[Label] = []
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class IssueLabelsBulkRequest(BaseModel):
+    issue_ids: List[int]
+    add: List[int] = []
+    remove: List[int] = []
+
+class IssueLabelsBulkResponse(BaseModel):
+    issues: int
+    added: int
+    removed: int
+
+# -------- SEARCH --------
+class IssueSearchHit(BaseModel):
+    id: int
+    title: Optional[str] = None
+    project_id: Optional[int] = None
+    status: Optional[str] = None
+    snippet: str
+    rank: float
+
+class CommentSearchHit(BaseModel):
+    id: int
+    issue_id: int
+    issue_title: Optional[str] = None
+    snippet: str
+    rank: float
+
+class SearchResponse(BaseModel):
+    query: str
+    issues: List[IssueSearchHit] = []
+    comments: List[CommentSearchHit] = []
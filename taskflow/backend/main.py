@@ -1,14 +1,28 @@
+import json
+import logging
+from typing import Optional
 import uvicorn
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.session import engine, Base
-from app.core.websocket_manager import manager
+from app.core.config import settings
+from app.db.session import engine, async_engine, AsyncSessionLocal, describe_engine
+from app.db.query_budget import QueryBudgetMiddleware, install_query_counter
+from app.core.websocket_manager import manager, parse_topic, user_topic, WILDCARD_TOPIC
+from app.core.event_bus import create_event_bus
+from app.core.activity_logger import activity_sink
+from app.core.thumbnails import thumbnail_worker
+from app.core.blobs import blob_cleaner
+from app.core.cache import response_cache
+from app.core.security import is_admin, authenticate_token, can_access_issue
+from app.core.auth_cache import CurrentUser
+from app.core.visibility import sees_all_issues
 
 # Import các module API
-from app.api.v1 import issues, projects, auth, comments, attachments, activities, issue_labels, labels
+from app.api.v1 import issues, projects, auth, comments, attachments, activities, issue_labels, labels, search
+from app.db.migrations import prepare_database
 
-# Khởi tạo bảng dữ liệu
-Base.metadata.create_all(bind=engine)
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger("taskflow")
 
 # Định nghĩa chú thích Tiếng Việt cho các nhóm API
 tags_metadata = [
@@ -17,6 +31,7 @@ tags_metadata = [
     {"name": "Quản lý Công việc", "description": "Quản lý các task (issues) trong dự án."},
     {"name": "Nhãn dán (Labels)", "description": "Quản lý nhãn và gắn nhãn cho công việc."},
     {"name": "Bình luận & Đính kèm", "description": "Trao đổi thảo luận và quản lý tệp tin đính kèm."},
+    {"name": "Tìm kiếm", "description": "Tìm kiếm toàn văn trong công việc và bình luận."},
 ]
 
 app = FastAPI(
@@ -40,28 +55,154 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Đếm truy vấn theo ngân sách của từng route (bật khi chạy test hoặc khi cần soi N+1)
+if settings.QUERY_BUDGET_ENABLED:
+    install_query_counter(engine, async_engine.sync_engine)
+    app.add_middleware(QueryBudgetMiddleware, strict=settings.QUERY_BUDGET_STRICT)
+
 # Đăng ký các Router với prefix thống nhất
 # Lưu ý: prefix="/api/v1" sẽ kết hợp với /login để tạo thành /api/v1/login
 app.include_router(auth.router, prefix="/api/v1", tags=["Hệ thống Xác thực"])
 app.include_router(projects.router, prefix="/api/v1", tags=["Quản lý Dự án"])
 app.include_router(issues.router, prefix="/api/v1", tags=["Quản lý Công việc"])
-app.include_router(labels.router, prefix="/api/v1", tags=["Nhãn dán (Labels)"])
+# issue_labels trước labels: /labels/search phải được khớp trước /labels/{label_id}
 app.include_router(issue_labels.router, prefix="/api/v1", tags=["Nhãn dán (Labels)"])
+app.include_router(labels.router, prefix="/api/v1", tags=["Nhãn dán (Labels)"])
 app.include_router(comments.router, prefix="/api/v1", tags=["Bình luận & Đính kèm"])
 app.include_router(attachments.router, prefix="/api/v1", tags=["Bình luận & Đính kèm"])
 app.include_router(activities.router, prefix="/api/v1", tags=["Lịch sử hoạt động"])
+app.include_router(search.router, prefix="/api/v1", tags=["Tìm kiếm"])
+
+@app.on_event("startup")
+def migrate_database():
+    # Nâng cấp schema + bảng thống kê issues; khóa giữa các process nên các worker không chạy chồng nhau
+    if settings.DB_MIGRATE_ON_STARTUP:
+        prepare_database()
+
+@app.on_event("startup")
+def log_database_config():
+    logger.info("Database engine: %s", describe_engine(engine))
+    logger.info("Async database engine: %s", describe_engine(async_engine.sync_engine))
+
+@app.on_event("startup")
+async def start_event_bus():
+    await manager.start_bus(create_event_bus())
+    logger.info("WebSocket event bus: %s", manager.bus.name)
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    await manager.stop_bus()
+
+@app.on_event("startup")
+def start_activity_sink():
+    activity_sink.start()
+
+@app.on_event("shutdown")
+def flush_activity_sink():
+    activity_sink.close()
+
+@app.on_event("shutdown")
+def stop_thumbnail_worker():
+    thumbnail_worker.shutdown()
+
+@app.on_event("shutdown")
+def stop_blob_cleaner():
+    # Chờ xóa nốt file của các blob đã commit xóa
+    blob_cleaner.shutdown()
+
+@app.on_event("startup")
+async def start_response_cache():
+    await response_cache.start()
+    logger.info("Response cache: %s", response_cache.backend.name)
+
+@app.on_event("shutdown")
+async def close_response_cache():
+    await response_cache.close()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
+async def handle_ws_message(websocket: WebSocket, user: CurrentUser, raw: str):
+    """
+    Xử lý tin nhắn từ client: {"action": "subscribe" | "unsubscribe", "topic": "project:1"}
+    """
+    try:
+        message = json.loads(raw)
+        action, topic = message.get("action"), message.get("topic")
+    except (ValueError, AttributeError):
+        await manager.send_personal(websocket, {"type": "error", "data": {"detail": "Tin nhắn không hợp lệ"}})
+        return
+
+    parsed = parse_topic(topic) if isinstance(topic, str) else None
+    if action not in ("subscribe", "unsubscribe") or parsed is None:
+        await manager.send_personal(websocket, {"type": "error", "data": {"detail": "Action hoặc topic không hợp lệ", "topic": topic}})
+        return
+
+    if action == "unsubscribe":
+        manager.unsubscribe(websocket, topic)
+        await manager.send_personal(websocket, {"type": "unsubscribed", "data": {"topic": topic}})
+        return
+
+    # Kiểm tra quyền trước khi đăng ký
+    # - "*" và project:{id} gửi mọi issue của project nên chỉ dành cho admin/manager;
+    #   user khác nhận sự kiện các issue của mình qua user:{id} (tự đăng ký khi kết nối)
+    kind, entity_id = parsed
+    if kind in (WILDCARD_TOPIC, "project"):
+        allowed = sees_all_issues(user)
+    elif kind == "user":
+        allowed = entity_id == user.id
+    else:
+        async with AsyncSessionLocal() as db:
+            allowed = await can_access_issue(db, user, entity_id)
+
+    if not allowed:
+        await manager.send_personal(websocket, {"type": "error", "data": {"detail": "Bạn không có quyền theo dõi topic này", "topic": topic}})
+        return
+
+    manager.subscribe(websocket, topic)
+    await manager.send_personal(websocket, {"type": "subscribed", "data": {"topic": topic}})
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = None):
+    """
+    WebSocket nhận sự kiện realtime, xác thực bằng query ?token=<JWT>
+    - Client gửi subscribe/unsubscribe các topic project:{id} (admin/manager), issue:{id}
+    - Mỗi connection tự đăng ký user:{id}: sự kiện của các issue user tạo hoặc được gán
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await authenticate_token(db, token)
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+
+    await manager.connect(websocket, user_id=user.id)
+    manager.subscribe(websocket, user_topic(user.id))
     try:
         while True:
-            await websocket.receive_text()
+            raw = await websocket.receive_text()
+            await handle_ws_message(websocket, user, raw)
     except:
         manager.disconnect(websocket)
 
+@app.get("/api/v1/ws/metrics", tags=["WebSocket"])
+def websocket_metrics(admin: CurrentUser = Depends(is_admin)):
+    """
+    Metrics của WebSocket broadcaster (chỉ admin)
+    """
+    return manager.stats()
+
+@app.get("/api/v1/cache/metrics", tags=["Cache"])
+def cache_metrics(admin: CurrentUser = Depends(is_admin)):
+    """
+    Metrics của cache các endpoint đọc nhiều (chỉ admin)
+    """
+    return response_cache.stats()
+
 if __name__ == "__main__":
     # Chạy server tại cổng 8000
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+So sánh query plan và thời gian của các truy vấn hay dùng trước/sau migration index (0001 -> head)
+
+Chạy từ thư mục backend:
+    python scripts/benchmark_query_plans.py --issues 50000 --activities 200000
+
+Mặc định dùng một file SQLite tạm. Truyền --url để chạy trên database khác
+(database phải trống, script sẽ tạo schema và dữ liệu mẫu).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, text  # noqa: E402
+from app.db.migrations import run_migrations  # noqa: E402
+from app.models.models import ActivityLog, Attachment, Comment, Issue, Project, User  # noqa: E402
+from app.models.label import Label, issue_labels  # noqa: E402
+
+STATUSES = ["To Do", "In Progress", "Done"]
+PRIORITIES = ["Low", "Medium", "High"]
+ENTITY_TYPES = ["issue", "label", "attachment"]
+
+def hot_queries():
+    """
+    Các truy vấn tương ứng với endpoint: (tên, câu lệnh)
+    """
+    by_created = (Issue.created_at.desc(), Issue.id.desc())
+    return [
+        ("board: project + status", select(Issue).where(Issue.project_id == 7, Issue.status == "In Progress").order_by(*by_created).limit(100)),
+        ("issues theo assignee", select(Issue).where(Issue.assignee_id == 42).order_by(*by_created).limit(100)),
+        ("issues theo creator", select(Issue).where(Issue.creator_id == 42).order_by(*by_created).limit(100)),
+        ("my issues (creator OR assignee)", select(Issue).where((Issue.creator_id == 42) | (Issue.assignee_id == 42)).order_by(*by_created).limit(100)),
+        ("issues theo status + priority", select(Issue).where(Issue.status == "Done", Issue.priority == "High").limit(100)),
+        ("activity của một issue", select(ActivityLog).where(ActivityLog.entity_type == "issue", ActivityLog.entity_id == 123).order_by(ActivityLog.created_at.desc()).limit(20)),
+        ("activity của một user", select(ActivityLog).where(ActivityLog.user_id == 42).order_by(ActivityLog.created_at.desc()).limit(30)),
+        ("activity gần đây", select(ActivityLog).order_by(ActivityLog.created_at.desc()).limit(50)),
+        ("comments của issue", select(Comment).where(Comment.issue_id == 123).limit(100)),
+        ("attachments của issue", select(Attachment).where(Attachment.issue_id == 123)),
+        ("issues theo label", select(Issue).join(issue_labels, issue_labels.c.issue_id == Issue.id).where(issue_labels.c.label_id == 3).limit(50)),
+    ]
+
+def seed(engine, n_users, n_projects, n_issues, n_activities, n_comments):
+    rnd = random.Random(0)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x", "role": "member", "created_at": start}
+            for i in range(n_users)
+        ])
+        conn.execute(insert(Project), [{"name": f"project {i}", "created_at": start} for i in range(n_projects)])
+        conn.execute(insert(Label), [{"name": f"label {i}", "created_at": start} for i in range(20)])
+        conn.execute(insert(Issue), [
+            {
+                "title": f"issue {i}",
+                "status": rnd.choice(STATUSES),
+                "priority": rnd.choice(PRIORITIES),
+                "project_id": rnd.randint(1, n_projects),
+                "assignee_id": rnd.randint(1, n_users),
+                "creator_id": rnd.randint(1, n_users),
+                "created_at": start + timedelta(minutes=i),
+            }
+            for i in range(n_issues)
+        ])
+        conn.execute(insert(issue_labels), [
+            {"issue_id": issue_id, "label_id": label_id}
+            for issue_id in range(1, n_issues + 1)
+            for label_id in rnd.sample(range(1, 21), 2)
+        ])
+        conn.execute(insert(Comment), [
+            {"content": "comment", "issue_id": rnd.randint(1, n_issues), "user_id": rnd.randint(1, n_users), "created_at": start + timedelta(minutes=i)}
+            for i in range(n_comments)
+        ])
+        conn.execute(insert(Attachment), [
+            {"filename": "a.txt", "file_path": "uploads/a", "file_size": 1, "mime_type": "text/plain", "issue_id": rnd.randint(1, n_issues), "user_id": 1, "created_at": start}
+            for _ in range(n_comments // 4)
+        ])
+        conn.execute(insert(ActivityLog), [
+            {
+                "action": "updated",
+                "entity_type": rnd.choice(ENTITY_TYPES),
+                "entity_id": rnd.randint(1, n_issues),
+                "user_id": rnd.randint(1, n_users),
+                "created_at": start + timedelta(seconds=i * 30),
+            }
+            for i in range(n_activities)
+        ])
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text("EXPLAIN " + sql)).all()
+    return [row[0] for row in rows]
+
+def measure(engine, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in hot_queries():
+            plan = explain(conn, stmt)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(stmt).all()
+            elapsed_ms = (time.perf_counter() - started) / repeat * 1000
+            results[name] = (plan, elapsed_ms)
+    return results
+
+def analyze(engine):
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database trống để chạy benchmark (mặc định: SQLite tạm)")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--issues", type=int, default=50000)
+    parser.add_argument("--activities", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    url = args.url
+    if url is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp_dir.name, 'benchmark.db')}"
+
+    engine = create_engine(url)
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+
+    run_migrations(url, "0001")
+    print("Tạo dữ liệu mẫu...")
+    seed(engine, args.users, args.projects, args.issues, args.activities, args.comments)
+    analyze(engine)
+    before = measure(engine, args.repeat)
+
+    run_migrations(url, "head")
+    analyze(engine)
+    after = measure(engine, args.repeat)
+
+    for name, (plan_before, ms_before) in before.items():
+        plan_after, ms_after = after[name]
+        print(f"\n== {name}: {ms_before:.2f} ms -> {ms_after:.2f} ms")
+        print("   trước:")
+        for line in plan_before:
+            print(f"     {line}")
+        print("   sau:")
+        for line in plan_after:
+            print(f"     {line}")
+
+    engine.dispose()
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Database và thư mục uploads/ riêng cho mỗi lần chạy test
+# Đặt biến môi trường trước khi import app: settings được đọc lúc import
+TEST_DIR = tempfile.mkdtemp(prefix="taskflow-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.db"
+# Route vượt ngân sách truy vấn thì request lỗi (phát hiện N+1)
+os.environ["QUERY_BUDGET_ENABLED"] = "true"
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+os.chdir(TEST_DIR)
+
+_user_ids = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+def create_user(role: str = "member"):
+    """
+    Tạo user với role cho trước, trả về (user_id, headers có Bearer token)
+    """
+    from app.core.security import create_access_token
+    from app.db.session import SessionLocal
+    from app.models.models import User
+
+    username = f"{role}{next(_user_ids)}"
+    with SessionLocal() as db:
+        user = User(username=username, email=f"{username}@example.com", hashed_password="x", role=role)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    token = create_access_token({"sub": username, "user_id": user_id, "role": role})
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def make_user(client):
+    return create_user
+
+@pytest.fixture
+def admin(make_user):
+    return make_user("admin")
+
+@pytest.fixture
+def member(make_user):
+    return make_user("member")
+
+def create_project(name: str = "Test project", owner_id: int = None) -> int:
+    """
+    Tạo project trực tiếp trong database (kèm owner)
+    """
+    from app.db.session import SessionLocal
+    from app.models.models import Project
+
+    with SessionLocal() as db:
+        project = Project(name=name, owner_id=owner_id)
+        db.add(project)
+        db.commit()
+        return project.id
+
+@pytest.fixture
+def project(client, admin):
+    return create_project(owner_id=admin[0])
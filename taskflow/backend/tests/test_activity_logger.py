@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import select
+from app.core.activity_logger import ActivitySink
+from app.db.session import SessionLocal, engine
+from app.models.models import ActivityLog
+
+def record(entity_id, details=None):
+    return dict(
+        user_id=None, action="test_sink", entity_type="issue", entity_id=entity_id,
+        details=details, project_id=None, created_at=datetime.utcnow()
+    )
+
+def logged_ids():
+    with SessionLocal() as db:
+        return set(db.scalars(select(ActivityLog.entity_id).where(ActivityLog.action == "test_sink")))
+
+def test_bad_record_only_drops_itself(client):
+    sink = ActivitySink(engine, batch_size=50, flush_interval_ms=10)
+    for i in range(20):
+        # details không serialize được thành JSON: chỉ bản ghi này lỗi
+        sink.enqueue(record(i, {"bad": object()} if i == 7 else None))
+    sink.close()
+
+    assert sink.stats() == {"pending": 0, "written": 19, "failed": 1}
+    assert logged_ids() == set(range(20)) - {7}
+
+def test_transient_error_is_retried(client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    sink = ActivitySink(engine, batch_size=50, flush_interval_ms=10)
+    monkeypatch.setattr(ActivitySink, "RETRY_BACKOFF", 0)
+    calls = []
+    insert = ActivitySink._insert
+
+    def flaky_insert(self, rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        insert(self, rows)
+
+    monkeypatch.setattr(ActivitySink, "_insert", flaky_insert)
+    for i in range(100, 105):
+        sink.enqueue(record(i))
+    sink.close()
+
+    # Lần thử lại ghi cả lô, không phải từng bản ghi
+    assert calls == [5, 5]
+    assert sink.stats()["written"] == 5
+    assert set(range(100, 105)) <= logged_ids()
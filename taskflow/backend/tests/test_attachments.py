@@ -0,0 +1,80 @@
+import os
+from sqlalchemy import select
+from tests.conftest import create_project
+from app.core.blobs import blob_cleaner
+from app.db.session import SessionLocal
+from app.models.models import Attachment, Blob
+
+def refcount(content_hash):
+    with SessionLocal() as db:
+        return db.scalar(select(Blob.refcount).where(Blob.content_hash == content_hash))
+
+def upload(client, issue_id, headers, data=b"same bytes"):
+    response = client.post(
+        f"/api/v1/issues/{issue_id}/attachments",
+        files={"file": ("note.txt", data, "text/plain")},
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def create_issue(client, admin):
+    admin_id, headers = admin
+    project_id = create_project(owner_id=admin_id)
+    return client.post("/api/v1/issues", json={"title": "Blob", "project_id": project_id}, headers=headers).json()["id"]
+
+def test_shared_blob_survives_until_last_reference(client, admin):
+    headers = admin[1]
+    issue_id = create_issue(client, admin)
+
+    first = upload(client, issue_id, headers)
+    second = upload(client, issue_id, headers)
+    # Cùng nội dung thì dùng chung một file
+    assert first["file_path"] == second["file_path"]
+    assert refcount(first["content_hash"]) == 2
+
+    assert client.delete(f"/api/v1/attachments/{first['id']}", headers=headers).status_code == 200
+    blob_cleaner.flush()
+    assert os.path.exists(second["file_path"])
+    assert refcount(first["content_hash"]) == 1
+    assert client.get(f"/api/v1/attachments/{second['id']}/download", headers=headers).content == b"same bytes"
+
+    assert client.delete(f"/api/v1/attachments/{second['id']}", headers=headers).status_code == 200
+    blob_cleaner.flush()
+    assert not os.path.exists(second["file_path"])
+    assert refcount(first["content_hash"]) is None
+
+def test_deleting_issue_releases_blobs(client, admin):
+    headers = admin[1]
+    issue_id = create_issue(client, admin)
+    attachment = upload(client, issue_id, headers, data=b"issue bytes")
+
+    assert client.delete(f"/api/v1/issues/{issue_id}", headers=headers).status_code == 200
+    blob_cleaner.flush()
+    assert not os.path.exists(attachment["file_path"])
+    assert refcount(attachment["content_hash"]) is None
+
+def test_rollback_keeps_file(client, admin):
+    headers = admin[1]
+    attachment = upload(client, create_issue(client, admin), headers, data=b"rollback bytes")
+
+    with SessionLocal() as db:
+        db.delete(db.get(Attachment, attachment["id"]))
+        db.flush()
+        # Refcount về 0 trong transaction, nhưng file chỉ bị xóa sau commit
+        db.rollback()
+    blob_cleaner.flush()
+
+    assert os.path.exists(attachment["file_path"])
+    assert refcount(attachment["content_hash"]) == 1
+    assert client.get(f"/api/v1/attachments/{attachment['id']}/download", headers=headers).content == b"rollback bytes"
+
+def test_cleanup_skips_blob_used_again(client, admin):
+    headers = admin[1]
+    attachment = upload(client, create_issue(client, admin), headers, data=b"reused bytes")
+
+    # Giống lúc một upload cùng nội dung commit trước khi thread nền kịp xóa file
+    blob_cleaner.submit({attachment["content_hash"]: (attachment["file_path"], "text/plain")}).result()
+
+    assert os.path.exists(attachment["file_path"])
+    assert refcount(attachment["content_hash"]) == 1
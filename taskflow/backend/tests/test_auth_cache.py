@@ -0,0 +1,43 @@
+from app.core.auth_cache import CurrentUser, user_cache
+from app.db.session import SessionLocal
+from app.models.models import User
+
+def set_role(user_id, role, commit=True):
+    with SessionLocal() as db:
+        db.get(User, user_id).role = role
+        db.flush()
+        if commit:
+            db.commit()
+        else:
+            db.rollback()
+
+def test_role_change_applies_to_next_request(client, make_user):
+    user_id, headers = make_user("admin")
+    # Lần đầu nạp user (role admin) vào cache
+    assert client.get("/api/v1/admin/issues", headers=headers).status_code == 200
+
+    set_role(user_id, "member")
+    assert client.get("/api/v1/admin/issues", headers=headers).status_code == 403
+
+    set_role(user_id, "admin")
+    assert client.get("/api/v1/admin/issues", headers=headers).status_code == 200
+
+def test_rolled_back_change_keeps_cache(client, make_user):
+    user_id, headers = make_user("admin")
+    client.get("/api/v1/admin/issues", headers=headers)
+
+    set_role(user_id, "member", commit=False)
+    assert user_cache.get(user_id).role == "admin"
+
+def test_stale_read_is_not_cached(client, make_user):
+    user_id, _ = make_user("admin")
+    user_cache.pop(user_id)
+
+    # Request đọc user trước khi transaction đổi role commit, rồi mới ghi vào cache
+    generation = user_cache.generation
+    with SessionLocal() as db:
+        stale = CurrentUser.from_user(db.get(User, user_id))
+    set_role(user_id, "member")
+    user_cache.set(user_id, stale, generation=generation)
+
+    assert user_cache.get(user_id) is None
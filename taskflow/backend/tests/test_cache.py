@@ -0,0 +1,94 @@
+import asyncio
+import fakeredis
+import pytest
+from tests.conftest import create_project
+from app.core.cache import InMemoryCacheBackend, RedisCacheBackend, ResponseCache, response_cache
+
+def test_statistics_cache_is_invalidated_by_issue_writes(client, admin):
+    admin_id, headers = admin
+    project_id = create_project(owner_id=admin_id)
+
+    def statistics():
+        response = client.get("/api/v1/statistics", headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    before = statistics()
+    hits = response_cache.hits
+    assert statistics() == before
+    assert response_cache.hits == hits + 1
+
+    response = client.post("/api/v1/issues", json={"title": "Cached", "project_id": project_id}, headers=headers)
+    issue_id = response.json()["id"]
+    created = statistics()
+    assert created["total_issues"] == before["total_issues"] + 1
+    assert created["issues_by_project"][str(project_id)] == 1
+    assert created["recent_issues"][0]["id"] == issue_id
+
+    assert client.put(f"/api/v1/issues/{issue_id}", json={"status": "Done"}, headers=headers).status_code == 200
+    updated = statistics()
+    assert updated["issues_by_status"]["Done"] == created["issues_by_status"]["Done"] + 1
+    assert updated["issues_by_status"]["To Do"] == created["issues_by_status"]["To Do"] - 1
+
+    assert client.delete(f"/api/v1/issues/{issue_id}", headers=headers).status_code == 200
+    deleted = statistics()
+    assert deleted["total_issues"] == before["total_issues"]
+    assert str(project_id) not in deleted["issues_by_project"]
+    assert issue_id not in [issue["id"] for issue in deleted["recent_issues"]]
+
+def memory_backend():
+    return InMemoryCacheBackend(maxsize=100)
+
+def redis_backend():
+    return RedisCacheBackend(url="redis://fake", prefix="taskflow:test:", client=fakeredis.aioredis.FakeRedis())
+
+@pytest.mark.parametrize("make_backend", [memory_backend, redis_backend])
+def test_concurrent_misses_load_once(make_backend):
+    async def scenario():
+        cache = ResponseCache(make_backend(), default_ttl=60)
+        calls = 0
+        release = asyncio.Event()
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"total": calls}
+
+        waiters = [asyncio.create_task(cache.get_or_load("stats", load, tags=["issues"])) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        # Một request chạy loader, bốn request còn lại chờ chung kết quả
+        assert calls == 1
+        assert results == [{"total": 1}] * 5
+        assert cache.coalesced == 4
+        assert await cache.get_or_load("stats", load, tags=["issues"]) == {"total": 1}
+
+        # Sau invalidate, lần trượt tiếp theo lại chỉ nạp một lần
+        await cache.invalidate("issues")
+        results = await asyncio.gather(*[cache.get_or_load("stats", load, tags=["issues"]) for _ in range(3)])
+        assert calls == 2
+        assert results == [{"total": 2}] * 3
+        await cache.close()
+    asyncio.run(scenario())
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        cache = ResponseCache(memory_backend(), default_ttl=60)
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            if calls == 1:
+                raise RuntimeError("database lỗi")
+            return "ok"
+
+        results = await asyncio.gather(*[cache.get_or_load("stats", load) for _ in range(3)], return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await cache.get_or_load("stats", load) == "ok"
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import asyncio
+import fakeredis
+from app.core.event_bus import RedisEventBus
+
+async def wait_until(predicate, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "hết thời gian chờ sự kiện"
+        await asyncio.sleep(0.01)
+
+async def start_buses(count: int, **options):
+    """
+    Các bus dùng chung một Redis giả lập (giống nhiều worker/replica), mỗi bus một danh sách sự kiện nhận được
+    """
+    server = fakeredis.FakeServer()
+    buses, received = [], []
+    for _ in range(count):
+        delivered = []
+        bus = RedisEventBus(
+            url="redis://fake", channel="taskflow:test",
+            client=fakeredis.aioredis.FakeRedis(server=server), **options
+        )
+        await bus.start(lambda text, topics, delivered=delivered: delivered.append((text, topics)))
+        buses.append(bus)
+        received.append(delivered)
+    return buses, received
+
+def test_events_reach_every_instance_in_one_batch():
+    async def scenario():
+        (first, second), (first_received, second_received) = await start_buses(2, batch_size=100, batch_interval_ms=20)
+        events = [(f"event {i}", [f"project:{i}"]) for i in range(5)]
+        for text, topics in events:
+            await first.publish(text, topics)
+        await wait_until(lambda: len(first_received) == 5 and len(second_received) == 5)
+
+        # Cả worker phát lẫn worker khác nhận đủ, đúng thứ tự, kèm topics
+        assert first_received == events
+        assert second_received == events
+        # Các sự kiện đến liền nhau được gom vào một lần PUBLISH
+        assert first.stats()["batches"] == 1
+        assert second.stats()["received"] == 5
+        for bus in (first, second):
+            await bus.stop()
+    asyncio.run(scenario())
+
+def test_batches_are_capped_at_batch_size():
+    async def scenario():
+        (first, second), (_, second_received) = await start_buses(2, batch_size=2, batch_interval_ms=20)
+        for i in range(5):
+            await first.publish(f"event {i}", None)
+        await wait_until(lambda: len(second_received) == 5)
+
+        assert first.stats()["batches"] == 3
+        assert [text for text, _ in second_received] == [f"event {i}" for i in range(5)]
+        assert second_received[0][1] is None
+        for bus in (first, second):
+            await bus.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+from collections import Counter
+from sqlalchemy import func, select
+from tests.conftest import create_project
+from app.core.issue_counters import GLOBAL_SCOPE, DEFAULT_STATUSES
+from app.db.session import SessionLocal
+from app.models.models import Issue, IssueCounter
+
+def live_counts():
+    """
+    Đếm lại trực tiếp từ bảng issues (GROUP BY), mỗi issue tính cho toàn hệ thống, creator và assignee
+    """
+    expected = Counter()
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Issue.creator_id, Issue.assignee_id, Issue.project_id, Issue.status, Issue.priority, func.count(Issue.id))
+            .group_by(Issue.creator_id, Issue.assignee_id, Issue.project_id, Issue.status, Issue.priority)
+        ).all()
+    for creator_id, assignee_id, project_id, status, priority, count in rows:
+        for user_id in {GLOBAL_SCOPE, creator_id, assignee_id} - {None}:
+            expected[(user_id, project_id or 0, status or "", priority or "")] += count
+    return expected
+
+def stored_counts():
+    with SessionLocal() as db:
+        rows = db.execute(select(
+            IssueCounter.user_id, IssueCounter.project_id, IssueCounter.status, IssueCounter.priority, IssueCounter.count
+        ).where(IssueCounter.count != 0)).all()
+    return Counter({tuple(row[:4]): row[4] for row in rows})
+
+def expected_statistics(expected: Counter, user_id: int):
+    by_status = {status: 0 for status in DEFAULT_STATUSES}
+    by_priority, by_project = Counter(), Counter()
+    for (scope, project_id, status, priority), count in expected.items():
+        if scope != user_id:
+            continue
+        by_status[status] = by_status.get(status, 0) + count
+        by_priority[priority] += count
+        by_project[str(project_id)] += count
+    return {
+        "total_issues": sum(by_priority.values()),
+        "issues_by_status": by_status,
+        "issues_by_priority": dict(by_priority),
+        "issues_by_project": dict(by_project),
+    }
+
+def assert_counters_match(client, users):
+    expected = live_counts()
+    assert stored_counts() == expected
+    # /statistics (kể cả bản đã cache) khớp với số đếm trực tiếp, cho admin và từng member
+    for scope, headers in users:
+        body = client.get("/api/v1/statistics", headers=headers).json()
+        assert {key: body[key] for key in expected_statistics(expected, scope)} == expected_statistics(expected, scope)
+
+def test_counters_follow_every_issue_change(client, admin, make_user):
+    admin_id, admin_headers = admin
+    alice_id, alice_headers = make_user("member")
+    bob_id, bob_headers = make_user("member")
+    users = [(GLOBAL_SCOPE, admin_headers), (alice_id, alice_headers), (bob_id, bob_headers)]
+    first, second = create_project(owner_id=admin_id), create_project("Second", owner_id=admin_id)
+
+    def create(**fields):
+        response = client.post("/api/v1/issues", json={"title": "Issue", "project_id": first, **fields}, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    one = create(assignee_id=alice_id)
+    two = create(priority="High", assignee_id=bob_id)
+    three = create(project_id=second, status="In Progress")
+    # Issue của member tự tạo và tự gán: chỉ tính một lần trong phạm vi của member
+    own = client.post("/api/v1/issues", json={"title": "Own", "project_id": first, "assignee_id": alice_id}, headers=alice_headers)
+    assert own.status_code == 200, own.text
+    assert_counters_match(client, users)
+
+    assert client.put(f"/api/v1/issues/{one}", json={"status": "Done", "priority": "Low"}, headers=admin_headers).status_code == 200
+    assert client.put(f"/api/v1/issues/{three}", json={"project_id": first}, headers=admin_headers).status_code == 200
+    assert_counters_match(client, users)
+
+    assert client.patch(f"/api/v1/issues/{two}/assign", params={"assignee_id": alice_id}, headers=admin_headers).status_code == 200
+    assert client.put(f"/api/v1/issues/{one}", json={"assignee_id": bob_id}, headers=admin_headers).status_code == 200
+    assert_counters_match(client, users)
+
+    assert client.delete(f"/api/v1/issues/{three}", headers=admin_headers).status_code == 200
+    assert_counters_match(client, users)
+
+    response = client.post("/api/v1/issues/batch", json={
+        "create": [
+            {"title": "Batch 1", "project_id": second, "assignee_id": bob_id},
+            {"title": "Batch 2", "project_id": second, "status": "Done", "priority": "High"},
+        ],
+        "update": [{"id": two, "status": "In Progress", "assignee_id": bob_id}],
+        "delete": [one],
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert_counters_match(client, users)
@@ -0,0 +1,37 @@
+from sqlalchemy import select
+from tests.conftest import create_project
+from app.crud.crud_issue import crud_issue
+from app.db.session import SessionLocal
+from app.models.models import ActivityLog
+
+def activity_projects(issue_ids, action):
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(ActivityLog.entity_id, ActivityLog.project_id)
+            .where(ActivityLog.action == action, ActivityLog.entity_id.in_(issue_ids))
+        ).all()
+    return dict(rows)
+
+def test_batch_update_logs_project_after_move(client, admin, monkeypatch):
+    admin_id, headers = admin
+    source = create_project("Nguồn", owner_id=admin_id)
+    target = create_project("Đích", owner_id=admin_id)
+    response = client.post("/api/v1/issues/batch", json={"create": [
+        {"title": f"Move {i}", "project_id": source} for i in range(4)
+    ]}, headers=headers)
+    moved, kept, _, removed = [issue["id"] for issue in response.json()["created"]]
+
+    # Activity phải ghép với issue theo id, kể cả khi update_many trả về theo thứ tự khác
+    update_many = crud_issue.update_many
+    monkeypatch.setattr(
+        type(crud_issue), "update_many",
+        lambda self, db, *, updates: list(reversed(update_many(db, updates=updates)))
+    )
+    response = client.post("/api/v1/issues/batch", json={
+        "update": [{"id": moved, "project_id": target}, {"id": kept, "status": "done"}],
+        "delete": [removed],
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+
+    assert activity_projects([moved, kept], "updated") == {moved: target, kept: source}
+    assert activity_projects([removed], "deleted") == {removed: source}
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import event, func, select
+from tests.conftest import create_project
+from app.core.labeling import LINK_INSERT_BATCH
+from app.db.session import SessionLocal, async_engine
+from app.models.label import Label, issue_labels
+
+@pytest.fixture
+def label_inserts():
+    """
+    Các câu INSERT vào issue_labels: (số dòng VALUES, có phải executemany)
+    """
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO issue_labels"):
+            inserts.append((statement.partition("VALUES")[2].count("("), executemany))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield inserts
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+def create_issues(client, headers, project_id, n):
+    response = client.post("/api/v1/issues/batch", json={"create": [
+        {"title": f"Label {i}", "project_id": project_id} for i in range(n)
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [issue["id"] for issue in response.json()["created"]]
+
+def create_labels(client, headers, prefix, n):
+    return [
+        client.post("/api/v1/labels", json={"name": f"{prefix}-{i}"}, headers=headers).json()["id"]
+        for i in range(n)
+    ]
+
+def test_bulk_add_uses_one_multi_row_insert(client, admin, label_inserts):
+    admin_id, headers = admin
+    issue_ids = create_issues(client, headers, create_project(owner_id=admin_id), 5)
+    label_ids = create_labels(client, headers, "multi", 3)
+
+    response = client.post("/api/v1/issues/labels/bulk", json={"issue_ids": issue_ids, "add": label_ids}, headers=headers)
+    assert response.json()["added"] == 15
+    assert label_inserts == [(15, False)]
+
+    # Cặp đã có được bỏ qua
+    response = client.post("/api/v1/issues/labels/bulk", json={"issue_ids": issue_ids, "add": label_ids}, headers=headers)
+    assert response.json()["added"] == 0
+    assert len(label_inserts) == 1
+
+def test_bulk_add_splits_large_inserts(client, admin, label_inserts):
+    admin_id, headers = admin
+    issue_ids = create_issues(client, headers, create_project(owner_id=admin_id), LINK_INSERT_BATCH // 2 + 1)
+    label_ids = create_labels(client, headers, "split", 2)
+
+    response = client.post("/api/v1/issues/labels/bulk", json={"issue_ids": issue_ids, "add": label_ids}, headers=headers)
+    assert response.json()["added"] == len(issue_ids) * 2
+    assert label_inserts == [(LINK_INSERT_BATCH, False), (2, False)]
+
+    with SessionLocal() as db:
+        linked = db.scalar(select(func.count()).select_from(issue_labels).where(issue_labels.c.label_id.in_(label_ids)))
+        usage = db.scalars(select(Label.usage_count).where(Label.id.in_(label_ids))).all()
+    assert linked == len(issue_ids) * 2
+    assert usage == [len(issue_ids), len(issue_ids)]
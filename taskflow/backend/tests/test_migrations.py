@@ -0,0 +1,70 @@
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core import labeling
+from app.db.migrations import alembic_config, prepare_database, run_migrations
+
+def test_percent_encoded_url_survives_configparser():
+    url = "postgresql://taskflow:p%40ss%25word@db:5432/taskflow"
+    assert alembic_config(url).get_main_option("sqlalchemy.url") == url
+
+def test_prepare_database_is_idempotent(tmp_path):
+    url = f"sqlite:///{tmp_path}/fresh.db"
+    prepare_database(url)
+    # Lần chạy thứ hai (worker khác, lần deploy sau) không làm gì thêm
+    prepare_database(url)
+
+def usage_counts(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(text("SELECT id, usage_count FROM labels ORDER BY id")).all())
+
+def link_count(engine, label_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT COUNT(*) FROM issue_labels WHERE label_id = :label_id"), {"label_id": label_id}
+        ).scalar()
+
+def test_usage_count_triggers_follow_links(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path}/labels.db"
+    run_migrations(url, "0005")
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, username) VALUES (1, 'admin')"))
+        connection.execute(text("INSERT INTO projects (id, name, owner_id) VALUES (1, 'P', 1)"))
+        for issue_id in range(1, 5):
+            connection.execute(text("INSERT INTO issues (id, title, project_id) VALUES (:id, 'I', 1)"), {"id": issue_id})
+        for label_id in range(1, 4):
+            connection.execute(text("INSERT INTO labels (id, name) VALUES (:id, :name)"), {"id": label_id, "name": f"L{label_id}"})
+        connection.execute(text("INSERT INTO issue_labels (issue_id, label_id) VALUES (1, 1), (2, 1), (1, 2)"))
+
+    # 0006 tính usage_count cho dữ liệu đã có
+    run_migrations(url, "0006")
+    assert usage_counts(engine) == {1: 2, 2: 1, 3: 0}
+
+    # INSERT nhiều dòng của bulk labeling; batch nhỏ để có nhiều câu INSERT
+    monkeypatch.setattr(labeling, "LINK_INSERT_BATCH", 2)
+    async def bulk():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/labels.db")
+        try:
+            async with AsyncSession(async_engine) as db:
+                added = await labeling.link_labels(db, [1, 2, 3, 4], [1, 2, 3])
+                removed = await labeling.unlink_labels(db, [1, 2], [3])
+                await db.commit()
+        finally:
+            await async_engine.dispose()
+        return added, removed
+    added, removed = asyncio.run(bulk())
+    assert len(added) == 9 and len(removed) == 2
+    assert usage_counts(engine) == {1: 4, 2: 4, 3: 2}
+
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM issue_labels WHERE issue_id = 4"))
+        connection.execute(text("UPDATE issue_labels SET label_id = 3 WHERE issue_id = 1 AND label_id = 2"))
+    assert usage_counts(engine) == {1: 3, 2: 2, 3: 2}
+
+    # Các migration sau không làm mất trigger
+    run_migrations(url)
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM issue_labels WHERE issue_id = 3"))
+    assert usage_counts(engine) == {label_id: link_count(engine, label_id) for label_id in (1, 2, 3)}
+    engine.dispose()
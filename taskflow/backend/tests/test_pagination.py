@@ -0,0 +1,31 @@
+import pytest
+from tests.conftest import create_project
+from app.core.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+
+def test_cursor_walks_every_issue_once(client, admin, member):
+    admin_id, headers = admin
+    member_id, member_headers = member
+    project_id = create_project(owner_id=admin_id)
+    response = client.post("/api/v1/issues/batch", json={"create": [
+        {"title": f"Page {i}", "project_id": project_id, "assignee_id": member_id} for i in range(5)
+    ]}, headers=headers)
+    expected = {issue["id"] for issue in response.json()["created"]}
+
+    seen, params = [], {"limit": 2}
+    while True:
+        response = client.get("/api/v1/my/issues", params=params, headers=member_headers)
+        assert response.status_code == 200, response.text
+        seen += [issue["id"] for issue in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    # Trang cuối không có cursor; không trùng, không sót
+    assert len(seen) == len(set(seen)) == 5
+    assert set(seen) == expected
+
+@pytest.mark.parametrize("path", ["/api/v1/issues", "/api/v1/my/issues", "/api/v1/admin/issues"])
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": MAX_PAGE_SIZE + 1}, {"skip": -1}])
+def test_page_parameters_are_bounded(client, admin, path, params):
+    assert client.get(path, params=params, headers=admin[1]).status_code == 422
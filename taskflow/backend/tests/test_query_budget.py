@@ -0,0 +1,88 @@
+import pytest
+from tests.conftest import create_project, create_user
+from app.core.cache import response_cache, ACTIVITY_TAG, ISSUES_TAG, LABELS_TAG, LABEL_USAGE_TAG, PROJECTS_TAG
+from app.db.query_budget import QUERY_COUNT_HEADER
+
+# Số truy vấn của các route có query_budget không được tăng theo số issues/labels/comments
+SIZES = (3, 30)
+
+def seed(client, admin, member_id, n):
+    """
+    Một project với n issues (gán cho member), mỗi issue có 2 labels;
+    issue đầu tiên có thêm n labels, n comments và n attachments
+    """
+    admin_id, admin_headers = admin
+    project_id = create_project(f"Budget {n}", owner_id=admin_id)
+    response = client.post("/api/v1/issues/batch", json={"create": [
+        {"title": f"Issue {i}", "project_id": project_id, "assignee_id": member_id} for i in range(n)
+    ]}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    issue_ids = [issue["id"] for issue in response.json()["created"]]
+    first = issue_ids[0]
+
+    label_ids = [
+        client.post("/api/v1/labels", json={"name": f"budget-{n}-{i}"}, headers=admin_headers).json()["id"]
+        for i in range(n)
+    ]
+    responses = [
+        client.post("/api/v1/issues/labels/bulk", json={"issue_ids": issue_ids, "add": label_ids[:2]}, headers=admin_headers),
+        client.post("/api/v1/issues/labels/bulk", json={"issue_ids": [first], "add": label_ids}, headers=admin_headers),
+    ]
+    for i in range(n):
+        responses.append(client.post(f"/api/v1/issues/{first}/comments", json={"content": f"Comment {i}"}, headers=admin_headers))
+        responses.append(client.post(
+            f"/api/v1/issues/{first}/attachments",
+            files={"file": (f"note{i}.txt", f"note {n} {i}".encode(), "text/plain")},
+            headers=admin_headers
+        ))
+    assert all(r.status_code in (200, 201) for r in responses), [r.text for r in responses if r.status_code >= 300]
+
+    return {
+        "project_id": project_id,
+        "issue_id": first,
+        "label_id": label_ids[0],
+    }
+
+# (route, chỉ admin gọi được)
+ROUTES = [
+    ("/api/v1/issues?project_id={project_id}", False),
+    ("/api/v1/issues/{issue_id}", False),
+    ("/api/v1/my/issues", False),
+    ("/api/v1/admin/issues", True),
+    ("/api/v1/issues/{issue_id}/labels", False),
+    ("/api/v1/issues/{issue_id}/comments", False),
+    ("/api/v1/issues/{issue_id}/attachments", False),
+    ("/api/v1/labels", False),
+    ("/api/v1/labels/{label_id}/issues", False),
+    ("/api/v1/projects/{project_id}/labels", False),
+]
+
+def query_count(client, path, headers):
+    # Bỏ qua cache kết quả để đếm đúng số truy vấn của route
+    response_cache.backend.bump_now([PROJECTS_TAG, ISSUES_TAG, LABELS_TAG, LABEL_USAGE_TAG, ACTIVITY_TAG])
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return int(response.headers[QUERY_COUNT_HEADER])
+
+@pytest.fixture(scope="module")
+def datasets(client):
+    """
+    Seed một lần cho cả module: admin, member và một bộ dữ liệu cho mỗi kích thước
+    """
+    admin = create_user("admin")
+    member = create_user("member")
+    return admin, member, [seed(client, admin, member[0], n) for n in SIZES]
+
+@pytest.mark.parametrize("route, admin_only", ROUTES)
+@pytest.mark.parametrize("role", ["admin", "member"])
+def test_query_count_constant_as_data_grows(client, datasets, route, admin_only, role):
+    if admin_only and role == "member":
+        pytest.skip("route chỉ dành cho admin")
+    admin, member, seeded = datasets
+    headers = admin[1] if role == "admin" else member[1]
+
+    # Lần gọi đầu nạp user vào cache xác thực, không tính
+    client.get("/api/v1/my/issues", headers=headers)
+
+    counts = [query_count(client, route.format(**ids), headers) for ids in seeded]
+    assert counts[0] == counts[-1], f"{route}: {counts} truy vấn với {SIZES} bản ghi"
@@ -0,0 +1,50 @@
+import pytest
+from tests.conftest import create_project
+from app.db.session import async_engine
+
+@pytest.fixture
+def like_dialect(monkeypatch):
+    """
+    Giả lập database không có full-text search: search.py rẽ nhánh theo tên dialect
+    """
+    monkeypatch.setattr(async_engine.sync_engine.dialect, "name", "mysql")
+
+@pytest.fixture
+def searchable(client, admin, member):
+    admin_id, headers = admin
+    member_id, _ = member
+    project_id = create_project(owner_id=admin_id)
+    hidden = client.post("/api/v1/issues", json={
+        "title": "Lỗi đăng nhập", "description": "Không đăng nhập được bằng snake_case", "project_id": project_id
+    }, headers=headers).json()["id"]
+    assigned = client.post("/api/v1/issues", json={
+        "title": "Trang chủ", "description": "lỗi hiển thị", "project_id": project_id, "assignee_id": member_id
+    }, headers=headers).json()["id"]
+    client.post(f"/api/v1/issues/{hidden}/comments", json={"content": "đã sửa lỗi <b>đăng nhập</b>"}, headers=headers)
+    return project_id, hidden, assigned
+
+def search(client, headers, q, project_id):
+    response = client.get("/api/v1/search", params={"q": q, "project_id": project_id}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.mark.parametrize("fallback", [False, True], ids=["fts", "like"])
+def test_search_respects_visibility(client, admin, member, searchable, fallback, request):
+    if fallback:
+        request.getfixturevalue("like_dialect")
+    project_id, hidden, assigned = searchable
+
+    result = search(client, admin[1], "lỗi", project_id)
+    assert {issue["id"] for issue in result["issues"]} == {hidden, assigned}
+    assert len(result["comments"]) == 1
+    assert "<mark>" in result["comments"][0]["snippet"]
+    assert "&lt;b&gt;" in result["comments"][0]["snippet"]
+
+    result = search(client, member[1], "lỗi", project_id)
+    assert [issue["id"] for issue in result["issues"]] == [assigned]
+    assert result["comments"] == []
+
+def test_like_fallback_treats_underscore_literally(client, admin, searchable, like_dialect):
+    project_id, hidden, _ = searchable
+    assert [issue["id"] for issue in search(client, admin[1], "snake_case", project_id)["issues"]] == [hidden]
+    assert search(client, admin[1], "snakexcase", project_id)["issues"] == []
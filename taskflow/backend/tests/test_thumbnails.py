@@ -0,0 +1,52 @@
+import io
+import pytest
+from PIL import Image
+from tests.conftest import create_project
+from app.core.thumbnails import generate_thumbnail, thumbnail_path
+from app.db.session import SessionLocal
+from app.models.models import Attachment
+
+def png_bytes(size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_failed_write_leaves_no_part_file(tmp_path, monkeypatch):
+    source = tmp_path / "photo.png"
+    source.write_bytes(png_bytes((256, 256)))
+    target = thumbnail_path(str(source), "image/png")
+
+    def failing_save(self, fp, *args, **kwargs):
+        # Giống lỗi giữa chừng khi đang ghi (ảnh hỏng, hết dung lượng): file .part đã có một phần
+        with open(fp, "wb") as out:
+            out.write(b"partial")
+        raise OSError("image file is truncated")
+
+    monkeypatch.setattr(Image.Image, "save", failing_save)
+    with pytest.raises(OSError):
+        generate_thumbnail(str(source), target, 32)
+    assert [path.name for path in tmp_path.iterdir()] == ["photo.png"]
+
+def test_deleting_legacy_attachment_removes_thumbnail(client, admin, tmp_path):
+    admin_id, headers = admin
+    project_id = create_project(owner_id=admin_id)
+    issue_id = client.post("/api/v1/issues", json={"title": "Legacy", "project_id": project_id}, headers=headers).json()["id"]
+
+    # Attachment trước khi có blob store: file riêng theo uuid, không có content_hash
+    file_path = tmp_path / "legacy-uuid.png"
+    file_path.write_bytes(png_bytes())
+    with SessionLocal() as db:
+        attachment = Attachment(
+            filename="legacy.png", file_path=str(file_path), file_size=file_path.stat().st_size,
+            mime_type="image/png", issue_id=issue_id, user_id=admin_id
+        )
+        db.add(attachment)
+        db.commit()
+        attachment_id = attachment.id
+
+    response = client.get(f"/api/v1/attachments/{attachment_id}/thumbnail", headers=headers)
+    assert response.status_code == 200
+    assert (tmp_path / "legacy-uuid.png.thumb.png").exists()
+
+    assert client.delete(f"/api/v1/attachments/{attachment_id}", headers=headers).status_code == 200
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,55 @@
+from sqlalchemy import select
+from tests.conftest import create_project
+from app.db.session import SessionLocal
+from app.models.models import IssueVisibility
+
+def visibility_rows(issue_id):
+    with SessionLocal() as db:
+        return set(db.execute(
+            select(IssueVisibility.user_id, IssueVisibility.project_id).where(IssueVisibility.issue_id == issue_id)
+        ).all())
+
+def sees(client, headers, issue_id, project_id):
+    """
+    Issue có xuất hiện trong /issues, /my/issues và xem chi tiết được không (phải nhất quán)
+    """
+    listed = issue_id in [issue["id"] for issue in client.get("/api/v1/issues", params={"project_id": project_id}, headers=headers).json()]
+    mine = issue_id in [issue["id"] for issue in client.get("/api/v1/my/issues", headers=headers).json()]
+    detail = client.get(f"/api/v1/issues/{issue_id}", headers=headers).status_code == 200
+    assert listed == mine == detail
+    return listed
+
+def test_reassign_moves_visibility(client, admin, make_user):
+    admin_id, admin_headers = admin
+    alice_id, alice_headers = make_user("member")
+    bob_id, bob_headers = make_user("member")
+    project_id, other_project_id = create_project(owner_id=admin_id), create_project("Other", owner_id=admin_id)
+
+    response = client.post("/api/v1/issues", json={"title": "Moving", "project_id": project_id, "assignee_id": alice_id}, headers=admin_headers)
+    issue_id = response.json()["id"]
+    assert visibility_rows(issue_id) == {(admin_id, project_id), (alice_id, project_id)}
+    assert sees(client, alice_headers, issue_id, project_id)
+    assert not sees(client, bob_headers, issue_id, project_id)
+
+    # Gán lại qua /assign: dòng của Alice chuyển sang Bob
+    assert client.patch(f"/api/v1/issues/{issue_id}/assign", params={"assignee_id": bob_id}, headers=admin_headers).status_code == 200
+    assert visibility_rows(issue_id) == {(admin_id, project_id), (bob_id, project_id)}
+    assert not sees(client, alice_headers, issue_id, project_id)
+    assert sees(client, bob_headers, issue_id, project_id)
+
+    # Gán lại và chuyển project qua PUT
+    response = client.put(f"/api/v1/issues/{issue_id}", json={"assignee_id": alice_id, "project_id": other_project_id}, headers=admin_headers)
+    assert response.status_code == 200
+    assert visibility_rows(issue_id) == {(admin_id, other_project_id), (alice_id, other_project_id)}
+    assert sees(client, alice_headers, issue_id, other_project_id)
+    assert not sees(client, bob_headers, issue_id, other_project_id)
+
+    # Gán lại qua batch
+    response = client.post("/api/v1/issues/batch", json={"update": [{"id": issue_id, "assignee_id": bob_id}]}, headers=admin_headers)
+    assert response.status_code == 200
+    assert visibility_rows(issue_id) == {(admin_id, other_project_id), (bob_id, other_project_id)}
+    assert not sees(client, alice_headers, issue_id, other_project_id)
+    assert sees(client, bob_headers, issue_id, other_project_id)
+
+    assert client.delete(f"/api/v1/issues/{issue_id}", headers=admin_headers).status_code == 200
+    assert visibility_rows(issue_id) == set()
@@ -0,0 +1,56 @@
+from tests.conftest import create_project
+
+def token_of(headers):
+    return headers["Authorization"].split(" ", 1)[1]
+
+def create_issue(client, headers, project_id, assignee_id, title):
+    response = client.post("/api/v1/issues", json={
+        "title": title, "project_id": project_id, "assignee_id": assignee_id
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def test_member_only_receives_own_issue_events(client, admin, make_user):
+    admin_id, admin_headers = admin
+    alice_id, alice_headers = make_user("member")
+    bob_id, _ = make_user("member")
+    project_id = create_project(owner_id=admin_id)
+    # Alice liên quan tới một issue trong project: trước đây đủ để đăng ký project:{id}
+    create_issue(client, admin_headers, project_id, alice_id, "Của Alice")
+
+    with client.websocket_connect(f"/ws?token={token_of(alice_headers)}") as ws:
+        ws.send_json({"action": "subscribe", "topic": f"project:{project_id}"})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"action": "subscribe", "topic": f"user:{bob_id}"})
+        assert ws.receive_json()["type"] == "error"
+
+        create_issue(client, admin_headers, project_id, bob_id, "Bí mật của Bob")
+        mine = create_issue(client, admin_headers, project_id, alice_id, "Việc của Alice")
+        # Sự kiện đầu tiên Alice nhận là issue của mình, không phải issue của Bob
+        event = ws.receive_json()
+        assert event["type"] == "issue_created"
+        assert event["data"]["id"] == mine
+
+        response = client.post("/api/v1/issues/batch", json={"create": [
+            {"title": "Batch Bob", "project_id": project_id, "assignee_id": bob_id},
+            {"title": "Batch Alice", "project_id": project_id, "assignee_id": alice_id},
+        ]}, headers=admin_headers)
+        created = {issue["assignee_id"]: issue["id"] for issue in response.json()["created"]}
+        event = ws.receive_json()
+        assert event["type"] == "issues_batch"
+        assert [issue["id"] for issue in event["data"]["created"]] == [created[alice_id]]
+
+def test_admin_receives_project_events(client, admin, member):
+    admin_id, admin_headers = admin
+    project_id = create_project(owner_id=admin_id)
+
+    with client.websocket_connect(f"/ws?token={token_of(admin_headers)}") as ws:
+        ws.send_json({"action": "subscribe", "topic": f"project:{project_id}"})
+        assert ws.receive_json()["type"] == "subscribed"
+
+        response = client.post("/api/v1/issues/batch", json={"create": [
+            {"title": f"Batch {i}", "project_id": project_id, "assignee_id": member[0]} for i in range(2)
+        ]}, headers=admin_headers)
+        event = ws.receive_json()
+        assert event["type"] == "issues_batch"
+        assert {issue["id"] for issue in event["data"]["created"]} == {issue["id"] for issue in response.json()["created"]}